@@ -1,23 +1,142 @@
+import asyncio
+import json
+import math
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_openai import ChatOpenAI
-from langchain_pinecone import PineconeVectorStore
-from src.config import OPENAI_API_KEY, PINECONE_API_KEY
-from src.helper import get_embeddings
-from src.logger import setup_logger
-from src.prompt import sys_prompt
+from langchain_core.messages import AIMessage, HumanMessage
+from src.cache import get_semantic_cache
+from src.components import ComponentRegistry
+from src.concurrency import (
+    ConcurrencyLimiter,
+    QueueFullError,
+    RateLimitedError,
+    RateLimiter,
+    SingleFlight,
+    check_rate_limits,
+)
+from src.config import (
+    APP_WARMUP,
+    CHAT_COALESCE_ENABLED,
+    CHAT_DEADLINE,
+    CHAT_EXECUTOR_WORKERS,
+    CHAT_MAX_CONCURRENCY,
+    CHAT_MAX_QUEUE,
+    BM25_INDEX_PATH,
+    CHAT_QUEUE_TIMEOUT,
+    CHAT_IP_BURST,
+    CHAT_IP_RATE_LIMIT,
+    CHAT_SESSION_BURST,
+    CHAT_SESSION_RATE_LIMIT,
+    CONTEXT_HISTORY_TOKENS,
+    CONTEXT_TOKEN_BUDGET,
+    DEGRADED_CACHE_THRESHOLD,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_POOL_SIZE,
+    HTTP_READ_TIMEOUT,
+    HYBRID_CANDIDATES,
+    LLM_FIRST_TOKEN_TIMEOUT,
+    LLM_MAX_RETRIES,
+    LOCAL_INDEX_DIR,
+    LOCAL_INDEX_HNSW,
+    OPENAI_API_KEY,
+    PINECONE_API_KEY,
+    PINECONE_HOST,
+    MODEL_CONFIG_PATH,
+    MODEL_TIERING_ENABLED,
+    QUERY_REWRITE_ENABLED,
+    QUERY_REWRITE_MODEL,
+    REDIS_URL,
+    RETRIEVAL_HEDGE_AFTER,
+    RETRIEVAL_TIMEOUT,
+    RETRIEVER_MODE,
+    ROUTER_CONFIG_PATH,
+    ROUTER_ENABLED,
+    ROUTER_MARGIN,
+    ROUTER_RAILS_PATH,
+    ROUTER_THRESHOLD,
+    SEMANTIC_CACHE_BACKEND,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_PATH,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+    SESSION_BACKEND,
+    SESSION_IDLE_TTL,
+    SESSION_MAX_SESSIONS,
+    SESSION_MAX_TOKENS,
+    SESSION_MAX_TURNS,
+    SESSION_SQLITE_PATH,
+    TRUST_FORWARDED_FOR,
+    RATE_LIMIT_MAX_KEYS,
+    VECTOR_STORE,
+)
+from src.embeddings import normalize_query
+from src.helper import get_embeddings, load_bm25_index
+from src.logger import log_stats, setup_logger
+from src.metrics import (
+    ADMISSION_REJECTIONS,
+    DEADLINE_EXCEEDED,
+    CACHE_REQUESTS,
+    CHAT_COALESCED,
+    CHAT_IN_FLIGHT,
+    CHAT_QUEUED,
+    CHAT_REQUESTS,
+    REGISTRY,
+    SESSION_BYTES,
+    SESSIONS,
+    RequestIdMiddleware,
+    StageTimingHandler,
+    cached_stats,
+    trace_request,
+)
+from src.resilience import (
+    DeadlineExceeded,
+    deadline_scope,
+    get_http_clients,
+    is_upstream_error,
+    stage_budget,
+    stage_deadline,
+)
+from src.router import CANNED_ROUTE, build_intent_router
+from src.session_store import get_session_store
+from src.vector_store import ScoredVectorStoreRetriever, get_vector_store
 
 logger = setup_logger(__name__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sync-only work (Pinecone queries, MiniLM embedding) is offloaded by
+    # LangChain to the loop's default executor, so size it explicitly.
+    executor = ThreadPoolExecutor(
+        max_workers=CHAT_EXECUTOR_WORKERS, thread_name_prefix="chat-io"
+    )
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(executor)
+    if APP_WARMUP == "eager":
+        await loop.run_in_executor(None, components.warm_up)
+    elif APP_WARMUP == "background":
+        components.start_background_warm_up()
+    yield
+    executor.shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -28,6 +147,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(RequestIdMiddleware)
+
 # Serve static files (like style.css)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -35,48 +156,376 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
 
-embeddings = get_embeddings()
 index_name = "nne-medical-chatbot-system"
-search = PineconeVectorStore.from_existing_index(
-    index_name=index_name, embedding=embeddings
-)
 
-doc_retriever = search.as_retriever(search_type="similarity", search_kwargs={"k": 3})
-llm_model = ChatOpenAI(model_name="gpt-4o")
 
-prompt = ChatPromptTemplate.from_messages(
-    [("system", sys_prompt), ("placeholder", "{chat_history}"), ("human", "{input}")]
+def build_vector_store():
+    return get_vector_store(
+        components.get("embeddings"),
+        backend=VECTOR_STORE,
+        index_name=index_name,
+        local_dir=LOCAL_INDEX_DIR,
+        use_hnsw=LOCAL_INDEX_HNSW,
+        pool_size=HTTP_POOL_SIZE,
+        host=PINECONE_HOST,
+    )
+
+
+def build_doc_retriever():
+    from src.resilience import HedgedRetriever
+
+    search = components.get("vector_store")
+    if RETRIEVER_MODE == "hybrid":
+        from src.bm25 import HybridRetriever
+
+        retriever = HybridRetriever(
+            vector_retriever=ScoredVectorStoreRetriever(
+                vectorstore=search, search_kwargs={"k": HYBRID_CANDIDATES}
+            ),
+            bm25_index=load_bm25_index(BM25_INDEX_PATH),
+            k=3,
+            candidates=HYBRID_CANDIDATES,
+        )
+    else:
+        # Chunks keep their similarity, for the model tier decision
+        retriever = ScoredVectorStoreRetriever(
+            vectorstore=search, search_kwargs={"k": 3}
+        )
+    # Slow queries past the recent p95 are sent again; see RETRIEVAL_TIMEOUT
+    return HedgedRetriever(
+        retriever=retriever,
+        timeout=RETRIEVAL_TIMEOUT,
+        hedge_after=RETRIEVAL_HEDGE_AFTER,
+    )
+
+
+def openai_client_options():
+    # One keep-alive pool for every OpenAI model, explicit timeouts, and few
+    # retries: a retried call rarely fits in what's left of CHAT_DEADLINE
+    import httpx
+
+    http_client, http_async_client = get_http_clients(
+        HTTP_POOL_SIZE, HTTP_KEEPALIVE_EXPIRY, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+    )
+    return {
+        "http_client": http_client,
+        "http_async_client": http_async_client,
+        "request_timeout": httpx.Timeout(
+            HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT
+        ),
+        "max_retries": LLM_MAX_RETRIES,
+    }
+
+
+# LangChain's model and chain modules import transformers (for a fallback
+# tokenizer), which takes seconds; import them in the builders instead.
+@lru_cache(maxsize=1)
+def configured_model_tiers():
+    from src.tiering import load_model_tiers
+
+    return load_model_tiers(MODEL_CONFIG_PATH)
+
+
+def build_tier_llm(model: str):
+    from langchain_openai import ChatOpenAI
+
+    # stream_usage reports token counts for streamed turns too (see /metrics)
+    return ChatOpenAI(model_name=model, stream_usage=True, **openai_client_options())
+
+
+def build_llm():
+    from src.tiering import MAIN_TIER
+
+    main = [t.model for t in configured_model_tiers() if t.name == MAIN_TIER]
+    return build_tier_llm(main[0] if main else "gpt-4o")
+
+
+def build_model_router():
+    if not MODEL_TIERING_ENABLED:
+        return None
+    from src.tiering import MAIN_TIER, ModelRouter
+
+    tiers = configured_model_tiers()
+    llms = {MAIN_TIER: components.get("llm")}
+    for tier in tiers:
+        if tier.name != MAIN_TIER:
+            llms[tier.name] = build_tier_llm(tier.model)
+    if len(llms) == 1:
+        return None  # nothing smaller than the main model configured
+    return ModelRouter(tiers, llms)
+
+
+def build_rewrite_llm():
+    if not QUERY_REWRITE_ENABLED:
+        return None
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model_name=QUERY_REWRITE_MODEL, temperature=0, **openai_client_options()
+    )
+
+
+def build_chat_chain():
+    from src.chain import build_concurrent_chain
+    from src.context import ContextPacker
+    from src.prompt import sys_prompt
+
+    # History is fetched while the query is embedded and searched
+    return build_concurrent_chain(
+        components.get("retriever"),
+        components.get("llm"),
+        get_session_memory,
+        context_packer=ContextPacker(
+            sys_prompt,
+            token_budget=CONTEXT_TOKEN_BUDGET,
+            history_budget=CONTEXT_HISTORY_TOKENS,
+        ),
+        rewrite_llm=components.get("rewrite_llm"),
+        model_router=components.get("model_router"),
+    )
+
+
+def build_router():
+    if not ROUTER_ENABLED:
+        return None
+    return build_intent_router(
+        components.get("embeddings"),
+        config_path=ROUTER_CONFIG_PATH,
+        rails_path=ROUTER_RAILS_PATH,
+        threshold=ROUTER_THRESHOLD,
+        margin=ROUTER_MARGIN,
+    )
+
+
+def build_answer_cache():
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    return get_semantic_cache(
+        components.get("embeddings"),
+        backend=SEMANTIC_CACHE_BACKEND,
+        path=SEMANTIC_CACHE_PATH,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        ttl=SEMANTIC_CACHE_TTL,
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    )
+
+
+# Nothing slow runs at import time; see APP_WARMUP and /healthz
+components = ComponentRegistry()
+components.register("embeddings", get_embeddings)
+components.register("router", build_router)
+components.register("vector_store", build_vector_store)
+components.register("retriever", build_doc_retriever)
+components.register("llm", build_llm)
+components.register("rewrite_llm", build_rewrite_llm)
+components.register("model_router", build_model_router)
+components.register("chain", build_chat_chain)
+components.register("answer_cache", build_answer_cache)
+
+session_store = get_session_store(
+    SESSION_BACKEND,
+    max_sessions=SESSION_MAX_SESSIONS,
+    idle_ttl=SESSION_IDLE_TTL,
+    max_turns=SESSION_MAX_TURNS,
+    max_tokens=SESSION_MAX_TOKENS,
+    sqlite_path=SESSION_SQLITE_PATH,
+    redis_url=REDIS_URL,
 )
 
-query_answer_chain = create_stuff_documents_chain(llm=llm_model, prompt=prompt)
-retrieval_chain = create_retrieval_chain(
-    retriever=doc_retriever, combine_docs_chain=query_answer_chain
+
+def get_session_memory(session_id: str):
+    return session_store.get(session_id)
+
+
+chat_limiter = ConcurrencyLimiter(
+    max_concurrency=CHAT_MAX_CONCURRENCY,
+    max_queue=CHAT_MAX_QUEUE,
+    queue_timeout=CHAT_QUEUE_TIMEOUT,
+)
+# The remote session backends count by scanning, so read them once per scrape
+session_stats = cached_stats(lambda: session_store.stats())
+SESSIONS.set_function(lambda: session_stats().get("sessions", float("nan")))
+SESSION_BYTES.set_function(lambda: session_stats().get("bytes", float("nan")))
+CHAT_IN_FLIGHT.set_function(lambda: chat_limiter.in_flight)
+CHAT_QUEUED.set_function(lambda: chat_limiter.waiting)
+
+# Token buckets per session and per client IP, so a few clients hammering
+# /chat (often with the shared "default_session") can't crowd out the rest
+session_rate_limiter = (
+    RateLimiter(CHAT_SESSION_RATE_LIMIT, CHAT_SESSION_BURST, RATE_LIMIT_MAX_KEYS)
+    if CHAT_SESSION_RATE_LIMIT > 0
+    else None
+)
+ip_rate_limiter = (
+    RateLimiter(CHAT_IP_RATE_LIMIT, CHAT_IP_BURST, RATE_LIMIT_MAX_KEYS)
+    if CHAT_IP_RATE_LIMIT > 0
+    else None
 )
 
-# chain_with_context = (
-#     RunnablePassthrough.assign(chat_history=lambda x: x.get("chat_history", []))
-#     | retrieval_chain
-# )
 
+def client_ip(request: Request) -> str:
+    if TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
 
-store = {}
 
+def admit(request: Request, session_id: typing.Optional[str]):
+    """
+    Apply the per-session and per-IP rate limits; raises RateLimitedError.
 
-def get_session_memory(session_id: str):
-    if session_id not in store:
-        store[session_id] = ChatMessageHistory()
-    return store[session_id]
+    Requests without a session ID (the web page's) all share the fallback
+    session, so only their IP is limited.
+    """
+    check_rate_limits(
+        [
+            ("session", session_rate_limiter, session_id),
+            ("ip", ip_rate_limiter, client_ip(request)),
+        ]
+    )
+
+
+def rejection_message(e: QueueFullError) -> str:
+    if isinstance(e, RateLimitedError):
+        return "Too many requests, please slow down"
+    return "Server is busy, please try again shortly"
+
+
+def rejection_response(endpoint: str, e: QueueFullError) -> JSONResponse:
+    if isinstance(e, RateLimitedError):
+        # Expected from abusive clients; the metric counts them, the log needn't
+        logger.debug(f"Chat request rate limited: {e}")
+    else:
+        logger.warning(f"Chat request rejected: {e} ({chat_limiter.stats()})")
+    CHAT_REQUESTS.inc(endpoint=endpoint, status="rejected")
+    ADMISSION_REJECTIONS.inc(endpoint=endpoint, reason=e.reason)
+    retry_after = max(1, math.ceil(e.retry_after))
+    return JSONResponse(
+        content={"error": rejection_message(e), "retry_after": retry_after},
+        # A client over its quota gets 429; a full queue is server overload
+        status_code=429 if isinstance(e, RateLimitedError) else 503,
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+# Identical first-turn questions already being answered share that answer
+coalescer = SingleFlight()
+
+
+def is_first_turn(session_id: str) -> bool:
+    # Follow-up answers depend on the conversation, so only first turns can
+    # be cached or shared between sessions
+    return not get_session_memory(session_id).messages
+
+
+def coalesce_key(message: str, first_turn: bool):
+    return normalize_query(message) if first_turn and CHAT_COALESCE_ENABLED else None
+
+
+def add_shared_turn(session_id: str, message: str, answer: str):
+    # Answers that didn't run this session's chain still belong in its history
+    get_session_memory(session_id).add_messages(
+        [HumanMessage(content=message), AIMessage(content=answer)]
+    )
+
+
+async def lookup_cached_answer(answer_cache, message: str, session_id: str):
+    answer = await answer_cache.alookup(message)
+    CACHE_REQUESTS.inc(cache="semantic", result="miss" if answer is None else "hit")
+    if answer is not None:
+        add_shared_turn(session_id, message, answer)
+    return answer
 
 
-chain_with_memory = RunnableWithMessageHistory(
-    retrieval_chain,
-    get_session_memory,
-    input_messages_key="input",
-    history_messages_key="chat_history",
-    output_messages_key="answer",
+async def route_message(message: str):
+    """The router's decision for `message`, or None to go straight to RAG."""
+    try:
+        router = await components.aget("router")
+        if router is None:
+            return None
+        decision = await router.aroute(message)
+    except Exception as e:
+        logger.error(f"Intent routing failed, using RAG: {e}")
+        return None
+    logger.info(
+        f"Route: {decision.route} (intent={decision.intent} "
+        f"score={decision.score:.3f}) in {decision.elapsed_ms:.1f}ms"
+    )
+    # Canned turns are left out of the session history: they carry nothing
+    # the chain needs, and a greeting shouldn't stop the question after it
+    # from being treated as a first turn
+    return decision
+
+
+async def chat_components():
+    """
+    The answer cache and chain, built or waited for before the request's
+    deadline starts: a cold worker's lazy warm-up isn't the turn's fault and
+    shouldn't use up its budget.
+    """
+    try:
+        await components.aget("router")
+    except Exception:
+        pass  # route_message logs it and falls back to RAG
+    return await components.aget("answer_cache"), await components.aget("chain")
+
+
+@asynccontextmanager
+async def chat_slot():
+    """
+    Hold a concurrency slot, waiting at most CHAT_QUEUE_TIMEOUT or what the
+    request has left. Running out of request time raises DeadlineExceeded;
+    QueueFullError is only for a full or slow queue.
+    """
+    budget = stage_budget(CHAT_QUEUE_TIMEOUT)
+    deadline_bound = budget is not None and budget < CHAT_QUEUE_TIMEOUT
+    if deadline_bound and budget <= 0:
+        DEADLINE_EXCEEDED.inc(stage="queue")
+        raise DeadlineExceeded("queue")
+    try:
+        await chat_limiter.acquire(timeout=budget)
+    except QueueFullError as e:
+        if e.reason != "queue_timeout" or not deadline_bound:
+            raise
+        DEADLINE_EXCEEDED.inc(stage="queue")
+        raise DeadlineExceeded("queue") from None
+    try:
+        yield
+    finally:
+        chat_limiter.release()
+
+
+TRY_AGAIN_REPLY = (
+    "Sorry, I'm taking longer than usual to answer. Please try again in a moment."
 )
 
 
+async def degraded_answer(answer_cache, message: str, session_id: str, error):
+    """
+    Best effort for a turn whose retrieval or LLM call timed out or failed:
+    a semantic cache match, or None for a fast try-again reply.
+    """
+    answer = None
+    if answer_cache is not None and message:
+        try:
+            answer = await answer_cache.alookup(
+                message, threshold=DEGRADED_CACHE_THRESHOLD
+            )
+        except Exception as e:
+            logger.error(f"Degraded cache lookup failed: {e}")
+    if answer is not None:
+        add_shared_turn(session_id, message, answer)
+    logger.warning(
+        f"Degraded reply ({'cached answer' if answer else 'try again'}) after: {error}"
+    )
+    return answer
+
+
+def degraded_reason(error) -> str:
+    return f"timeout:{error.stage}" if hasattr(error, "stage") else "upstream_error"
+
+
 @app.get("/", response_class=HTMLResponse)
 def landing_page(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
@@ -87,37 +536,353 @@ async def chat_page(request: Request):
     return templates.TemplateResponse("chatbot.html", {"request": request})
 
 
+@app.get("/healthz")
+async def healthz_endpoint():
+    status = components.status()
+    if components.ready:
+        overall = "ready"
+    elif any(c["state"] == "failed" for c in status.values()):
+        overall = "failed"
+    else:
+        overall = "starting"
+    return JSONResponse(
+        content={"status": overall, "components": status},
+        status_code=200 if overall == "ready" else 503,
+    )
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    # Plain def: FastAPI runs it in a thread, since the session gauges may
+    # query SQLite or Redis
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/stats")
+async def stats_endpoint():
+    embeddings = components.peek("embeddings")
+    answer_cache = components.peek("answer_cache")
+    model_router = components.peek("model_router")
+    return JSONResponse(
+        content={
+            "chat": chat_limiter.stats(),
+            "rate_limits": {
+                "session": session_rate_limiter and session_rate_limiter.stats(),
+                "ip": ip_rate_limiter and ip_rate_limiter.stats(),
+            },
+            "sessions": session_store.stats(),
+            "coalescing": coalescer.stats(),
+            "embeddings": embeddings.stats() if embeddings else None,
+            "semantic_cache": answer_cache.stats() if answer_cache else None,
+            "model_tiers": model_router.stats() if model_router else None,
+            "logging": log_stats(),
+        }
+    )
+
+
 @app.post("/chat")
 async def chat_endpoint(request: Request):
+    message = session_id = answer_cache = None
     try:
         payload = await request.json()
         message = payload.get("message", "").strip()
 
         if not message:
+            CHAT_REQUESTS.inc(endpoint="chat", status="bad_request")
             return JSONResponse(
                 content={"error": "Message cannot be empty"}, status_code=400
             )
 
         session_id = payload.get("session_id", "default_session")
+        admit(request, payload.get("session_id"))
         logger.info(f"Input: {message}")
 
-        response = chain_with_memory.invoke(
-            {
-                "input": message,
-            },
-            config={"configurable": {"session_id": session_id}},
+        answer_cache, chain_with_memory = await chat_components()
+        with trace_request() as trace, deadline_scope(CHAT_DEADLINE):
+            decision = await route_message(message)
+            route = decision.as_dict() if decision else None
+            if decision is not None and decision.route == CANNED_ROUTE:
+                logger.info(f"Canned Response: {decision.reply}")
+                CHAT_REQUESTS.inc(endpoint="chat", status="canned")
+                return JSONResponse(content={"reply": decision.reply, "route": route})
+
+            first_turn = is_first_turn(session_id)
+            cacheable = answer_cache is not None and first_turn
+            if cacheable:
+                cached_answer = await lookup_cached_answer(
+                    answer_cache, message, session_id
+                )
+                if cached_answer is not None:
+                    logger.info(f"Cached Response: {cached_answer}")
+                    CHAT_REQUESTS.inc(endpoint="chat", status="cached")
+                    return JSONResponse(
+                        content={"reply": cached_answer, "route": route}
+                    )
+
+            async def answer_turn():
+                async with chat_slot():
+                    async with stage_deadline("answer"):
+                        return await chain_with_memory.ainvoke(
+                            {
+                                "input": message,
+                            },
+                            config={
+                                "configurable": {"session_id": session_id},
+                                "callbacks": [StageTimingHandler()],
+                            },
+                        )
+
+            key = coalesce_key(message, first_turn)
+            if key is None:
+                response, shared = await answer_turn(), False
+            else:
+                response, shared = await coalescer.run(key, answer_turn)
+
+            rag_response = response["answer"]
+            if shared:
+                CHAT_COALESCED.inc(endpoint="chat")
+                add_shared_turn(session_id, message, rag_response)
+                logger.info(f"Coalesced Response: {rag_response}")
+            else:
+                logger.info(f"RAG Response: {rag_response}")
+
+            if cacheable and not shared:
+                await answer_cache.astore(message, rag_response)
+
+        logger.info(f"Stage timings: {trace.summary()}")
+        CHAT_REQUESTS.inc(endpoint="chat", status="ok")
+        return JSONResponse(
+            content={
+                "reply": rag_response,
+                "prompt_tokens": response.get("prompt_tokens"),
+                "model_tier": response.get("model_tier"),
+                "route": route,
+            }
         )
 
-        rag_response = response["answer"]
-        logger.info(f"RAG Response: {rag_response}")
-
-        return JSONResponse(content={"reply": rag_response})
+    except QueueFullError as e:
+        return rejection_response("chat", e)
 
     except Exception as e:
+        if is_upstream_error(e):
+            # A timed-out or failed Pinecone/OpenAI call gets a fast fallback
+            # instead of a slow 500
+            CHAT_REQUESTS.inc(endpoint="chat", status="degraded")
+            reason = degraded_reason(e)
+            answer = await degraded_answer(answer_cache, message, session_id, e)
+            if answer is not None:
+                return JSONResponse(content={"reply": answer, "degraded": reason})
+            return JSONResponse(
+                content={
+                    "error": TRY_AGAIN_REPLY,
+                    "reply": TRY_AGAIN_REPLY,
+                    "degraded": reason,
+                },
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+
         logger.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
+        CHAT_REQUESTS.inc(endpoint="chat", status="error")
         return JSONResponse(content={"error": "Internal server error"}, status_code=500)
 
 
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: Request):
+    try:
+        payload = await request.json()
+    except Exception:
+        return JSONResponse(content={"error": "Invalid JSON body"}, status_code=400)
+
+    message = payload.get("message", "").strip()
+    if not message:
+        CHAT_REQUESTS.inc(endpoint="stream", status="bad_request")
+        return JSONResponse(
+            content={"error": "Message cannot be empty"}, status_code=400
+        )
+
+    session_id = payload.get("session_id", "default_session")
+    try:
+        admit(request, payload.get("session_id"))
+    except RateLimitedError as e:
+        return rejection_response("stream", e)
+    logger.info(f"Input (stream): {message}")
+
+    async def event_stream():
+        start = time.perf_counter()
+        ttft_ms = None
+        prompt_tokens = None
+        model_tier = None
+        answer_parts = []
+        leader_key = None
+        route = None
+        answer_cache = None
+        try:
+            answer_cache, chain_with_memory = await chat_components()
+            with trace_request() as trace, deadline_scope(CHAT_DEADLINE):
+                decision = await route_message(message)
+                route = decision.as_dict() if decision else None
+                if decision is not None and decision.route == CANNED_ROUTE:
+                    logger.info(f"Canned Response (stream): {decision.reply}")
+                    CHAT_REQUESTS.inc(endpoint="stream", status="canned")
+                    total_ms = (time.perf_counter() - start) * 1000
+                    yield format_sse("token", {"text": decision.reply})
+                    yield format_sse(
+                        "done",
+                        {
+                            "ttft_ms": round(total_ms, 1),
+                            "total_ms": round(total_ms, 1),
+                            "route": route,
+                        },
+                    )
+                    return
+
+                first_turn = is_first_turn(session_id)
+                cacheable = answer_cache is not None and first_turn
+                shared_answer = None
+                if cacheable:
+                    shared_answer = await lookup_cached_answer(
+                        answer_cache, message, session_id
+                    )
+                    if shared_answer is not None:
+                        logger.info(f"Cached Response (stream): {shared_answer}")
+                        CHAT_REQUESTS.inc(endpoint="stream", status="cached")
+
+                key = coalesce_key(message, first_turn)
+                if shared_answer is None and key is not None:
+                    flight, leader = coalescer.join(key)
+                    if leader:
+                        leader_key = key
+                    else:
+                        # Another request is answering the same question
+                        shared = await coalescer.follow(flight)
+                        if shared is not None:
+                            shared_answer = shared["answer"]
+                            prompt_tokens = shared.get("prompt_tokens")
+                            add_shared_turn(session_id, message, shared_answer)
+                            logger.info(f"Coalesced Response (stream): {shared_answer}")
+                            CHAT_COALESCED.inc(endpoint="stream")
+                            CHAT_REQUESTS.inc(endpoint="stream", status="ok")
+
+                if shared_answer is not None:
+                    total_ms = (time.perf_counter() - start) * 1000
+                    yield format_sse("token", {"text": shared_answer})
+                    yield format_sse(
+                        "done",
+                        {
+                            "ttft_ms": round(total_ms, 1),
+                            "total_ms": round(total_ms, 1),
+                            "prompt_tokens": prompt_tokens,
+                            "route": route,
+                        },
+                    )
+                    return
+
+                async with chat_slot():
+                    # The chain aggregates the streamed chunks and writes the
+                    # finished answer into the session once we're done.
+                    # Only the first token has a deadline; after that a
+                    # stalled stream is caught by the HTTP read timeout.
+                    async with stage_deadline(
+                        "first_token", LLM_FIRST_TOKEN_TIMEOUT
+                    ) as first_token_deadline:
+                        async for chunk in chain_with_memory.astream(
+                            {"input": message},
+                            config={
+                                "configurable": {"session_id": session_id},
+                                "callbacks": [StageTimingHandler()],
+                            },
+                        ):
+                            prompt_tokens = chunk.get("prompt_tokens", prompt_tokens)
+                            model_tier = chunk.get("model_tier", model_tier)
+                            token = chunk.get("answer")
+                            if not token:
+                                continue
+                            if ttft_ms is None:
+                                ttft_ms = (time.perf_counter() - start) * 1000
+                                first_token_deadline.reschedule(None)
+                            answer_parts.append(token)
+                            yield format_sse("token", {"text": token})
+
+                total_ms = (time.perf_counter() - start) * 1000
+                rag_response = "".join(answer_parts)
+                logger.info(f"RAG Response (stream): {rag_response}")
+                if leader_key is not None:
+                    coalescer.finish(
+                        leader_key,
+                        result={"answer": rag_response, "prompt_tokens": prompt_tokens},
+                    )
+                if cacheable and rag_response:
+                    await answer_cache.astore(message, rag_response)
+
+            logger.info(
+                f"Stream latency: ttft={ttft_ms or 0:.0f}ms total={total_ms:.0f}ms "
+                f"({trace.summary()})"
+            )
+            CHAT_REQUESTS.inc(endpoint="stream", status="ok")
+            yield format_sse(
+                "done",
+                {
+                    "ttft_ms": round(ttft_ms or 0, 1),
+                    "total_ms": round(total_ms, 1),
+                    "prompt_tokens": prompt_tokens,
+                    "route": route,
+                    "model_tier": model_tier,
+                },
+            )
+
+        except QueueFullError as e:
+            logger.warning(f"Chat stream rejected: {e} ({chat_limiter.stats()})")
+            CHAT_REQUESTS.inc(endpoint="stream", status="rejected")
+            ADMISSION_REJECTIONS.inc(endpoint="stream", reason=e.reason)
+            yield format_sse(
+                "error",
+                {
+                    "error": rejection_message(e),
+                    "retry_after": max(1, math.ceil(e.retry_after)),
+                },
+            )
+        except Exception as e:
+            if is_upstream_error(e) and not answer_parts:
+                CHAT_REQUESTS.inc(endpoint="stream", status="degraded")
+                answer = await degraded_answer(answer_cache, message, session_id, e)
+                total_ms = (time.perf_counter() - start) * 1000
+                yield format_sse("token", {"text": answer or TRY_AGAIN_REPLY})
+                yield format_sse(
+                    "done",
+                    {
+                        "ttft_ms": round(total_ms, 1),
+                        "total_ms": round(total_ms, 1),
+                        "route": route,
+                        "degraded": degraded_reason(e),
+                    },
+                )
+                return
+
+            logger.error(f"Error in chat stream endpoint: {str(e)}", exc_info=True)
+            CHAT_REQUESTS.inc(endpoint="stream", status="error")
+            yield format_sse("error", {"error": "Internal server error"})
+        finally:
+            if leader_key is not None:
+                # Leader stopped early (error or client gone): release followers;
+                # a no-op once the answer has been shared
+                coalescer.finish(
+                    leader_key, error=RuntimeError("Streaming answer failed")
+                )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # if __name__ == "__main__":
 #     import uvicorn
 
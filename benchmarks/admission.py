@@ -0,0 +1,159 @@
+"""
+Overload check for admission control: rate limits and the bounded queue.
+
+Drives the real FastAPI app in-process (httpx ASGITransport) with the
+retriever and GPT-4o replaced by local stubs. Well-behaved users each send
+a turn every five seconds or so from their own address, while a few abusive
+clients hammer /chat with the shared "default_session" and retry 0.1s
+after being turned away, ignoring Retry-After (in process, their side
+shares the CPU with the app). The run is repeated with the session and IP
+limits switched off. Users start once the abusers' opening burst (which
+the buckets allow) is past, to measure sustained abuse. Exits non-zero if, with the limits on, well-behaved
+users see errors or a worse p99 than without, or the abusers aren't
+turned away.
+
+    python -m benchmarks.admission --users 40 --abusers 3 --duration 20
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+os.environ["APP_WARMUP"] = "lazy"
+os.environ["ROUTER_ENABLED"] = "false"
+os.environ.setdefault("CHAT_MAX_CONCURRENCY", "4")
+os.environ.setdefault("CHAT_MAX_QUEUE", "16")
+os.environ.setdefault("CHAT_IP_RATE_LIMIT", "1")  # off by default
+
+import httpx  # noqa: E402
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+
+import app as chat_app  # noqa: E402
+from benchmarks.stubs import StubChatModel, StubRetriever  # noqa: E402
+from src.embeddings import EmbeddingService  # noqa: E402
+
+
+def install_stubs(llm_latency):
+    components = chat_app.components
+    components.register(
+        "embeddings", lambda: EmbeddingService(DeterministicFakeEmbedding(size=16))
+    )
+    components.register("retriever", lambda: StubRetriever(latency=0.02))
+    components.register("llm", lambda: StubChatModel(latency=llm_latency))
+    components.register("chain", chat_app.build_chat_chain)
+    components.register("answer_cache", lambda: None)
+    components.register("model_router", lambda: None)  # one stub model only
+
+
+def client_for(address):
+    transport = httpx.ASGITransport(app=chat_app.app, client=(address, 40000))
+    return httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60)
+
+
+async def user(address, session_id, stop, results, delay):
+    await asyncio.sleep(delay + random.uniform(0, 5))  # spread the users out
+    async with client_for(address) as client:
+        turn = 0
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            response = await client.post(
+                "/chat",
+                json={
+                    "message": f"Question {turn} about asthma?",
+                    "session_id": session_id,
+                },
+            )
+            results.append((response.status_code, time.perf_counter() - start))
+            turn += 1
+            await asyncio.sleep(random.uniform(4, 6))
+
+
+async def abuser(address, stop, statuses):
+    async with client_for(address) as client:
+        while time.monotonic() < stop:
+            # No session_id, so the app falls back to "default_session"
+            response = await client.post("/chat", json={"message": "Hello again?"})
+            statuses[response.status_code] += 1
+            await asyncio.sleep(0.1 if response.status_code in (429, 503) else 0)
+
+
+async def run(args, name, limited):
+    session_limiter = chat_app.session_rate_limiter
+    ip_limiter = chat_app.ip_rate_limiter
+    if not limited:
+        chat_app.session_rate_limiter = chat_app.ip_rate_limiter = None
+
+    stop = time.monotonic() + args.duration
+    results, abuse = [], Counter()
+    tasks = [
+        user(f"10.0.1.{i}", f"{name}-user-{i}", stop, results, args.user_delay)
+        for i in range(args.users)
+    ]
+    tasks += [
+        abuser(f"10.0.2.{i}", stop, abuse)
+        for i in range(args.abusers)
+        for _ in range(args.abuser_concurrency)
+    ]
+    await asyncio.gather(*tasks)
+    chat_app.session_rate_limiter, chat_app.ip_rate_limiter = (
+        session_limiter,
+        ip_limiter,
+    )
+
+    latencies = sorted(seconds * 1000 for status, seconds in results if status == 200)
+    statuses = Counter(status for status, _ in results)
+    errors = len(results) - statuses[200]
+    p50 = latencies[len(latencies) // 2] if latencies else float("inf")
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else float("inf")
+    print(
+        f"{name:>10}: users {len(results)} requests, p50={p50:.0f}ms p99={p99:.0f}ms, "
+        f"{dict(sorted(statuses.items()))}; abusers {sum(abuse.values())} requests "
+        f"{dict(sorted(abuse.items()))}"
+    )
+    return p99, errors, abuse
+
+
+async def main(args):
+    install_stubs(args.llm_latency)
+    await chat_app.components.aget("chain")
+
+    print(
+        f"{args.users} users, {args.abusers} abusers x {args.abuser_concurrency}, "
+        f"{args.duration:.0f}s, concurrency {chat_app.chat_limiter.max_concurrency}, "
+        f"queue {chat_app.chat_limiter.max_queue}"
+    )
+    p99, errors, abuse = await run(args, "limited", limited=True)
+    await asyncio.sleep(args.duration / 2)  # let the buckets refill
+    unlimited_p99, unlimited_errors, _ = await run(args, "unlimited", limited=False)
+
+    turned_away = abuse[429] / max(1, sum(abuse.values()))
+    passed = errors == 0 and p99 < unlimited_p99 and turned_away > 0.5
+    print(
+        f"{'PASS' if passed else 'FAIL'}: users p99 {p99:.0f}ms with limits vs "
+        f"{unlimited_p99:.0f}ms without, {errors} vs {unlimited_errors} user "
+        f"errors; {turned_away:.0%} of abuser requests got 429"
+    )
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--abusers", type=int, default=3)
+    parser.add_argument("--abuser-concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument(
+        "--user-delay",
+        type=float,
+        default=2,
+        help="seconds before users start, so the abusers' first burst is past",
+    )
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    sys.exit(0 if asyncio.run(main(args)) else 1)
@@ -0,0 +1,167 @@
+"""
+Per-stage timings of the sequential and concurrent chat chains.
+
+The sequential chain is RunnableWithMessageHistory around the retrieval
+chain: history load, then retrieval, then the LLM. The concurrent chain
+(src.chain.build_concurrent_chain) loads the history while the query is
+embedded and searched. Both run against stubs with a Redis-like history
+round trip, a sync Pinecone-like retriever and a fixed-latency LLM. Every
+session already has one turn, so the follow-up question also exercises
+the optional query rewrite. First checks which labelled questions take
+the history-dependent rewrite path: standalone questions must not.
+
+    python -m benchmarks.chain_parallelism --history-latency 0.03 --retriever-latency 0.08
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks.stubs import StubChatMessageHistory, StubChatModel, StubRetriever
+from src.chain import (
+    build_chain_with_memory,
+    build_concurrent_chain,
+    build_retrieval_chain,
+    refers_back,
+)
+from src.context import ContextPacker
+from src.metrics import StageTimingHandler, trace_request
+from src.prompt import sys_prompt
+
+# (question, whether it needs the earlier turns)
+REFERS_BACK_LABELLED = [
+    ("How is it treated?", True),
+    ("Is it contagious?", True),
+    ("What are its side effects?", True),
+    ("Is that serious?", True),
+    ("What does that mean?", True),
+    ("What causes this?", True),
+    ("What about children?", True),
+    ("Can you explain what you said about insulin?", True),
+    ("What is the treatment for this rash?", False),
+    ("Is it normal to feel tired after a flu shot?", False),
+    ("What is asthma and how is it diagnosed?", False),
+    ("My son has a fever, should he see a doctor?", False),
+    ("What are the symptoms of diabetes?", False),
+    ("Which drugs lower blood pressure and how do they work?", False),
+    ("What is the difference between these two conditions: gout and arthritis?", False),
+]
+
+STAGES = ["history_load", "retrieve", "rewrite", "prepare", "llm_total", "total"]
+
+
+def check_refers_back():
+    ok = True
+    for question, expected in REFERS_BACK_LABELLED:
+        passed = refers_back(question) == expected
+        ok &= passed
+        print(
+            f"{'PASS' if passed else 'FAIL'} "
+            f"{'rewrite' if expected else 'standalone':>10}: {question}"
+        )
+    return ok
+
+
+def make_chains(args):
+    histories = {}
+
+    def get_history(session_id):
+        if session_id not in histories:
+            history = histories[session_id] = StubChatMessageHistory(latency=0)
+            history.add_messages(
+                [
+                    HumanMessage(content="What is asthma?"),
+                    AIMessage(content="Asthma narrows the airways."),
+                ]
+            )
+            history.latency = args.history_latency
+        return histories[session_id]
+
+    retriever = StubRetriever(latency=args.retriever_latency)
+    llm = StubChatModel(latency=args.llm_latency)
+    packer = ContextPacker(sys_prompt, token_budget=3000, history_budget=800)
+    rewrite_llm = StubChatModel(
+        latency=args.rewrite_latency, reply="How is asthma treated?"
+    )
+    chains = {
+        "sequential": build_chain_with_memory(
+            build_retrieval_chain(retriever, llm, context_packer=packer), get_history
+        ),
+        "concurrent": build_concurrent_chain(retriever, llm, get_history, packer),
+        "concurrent+rewrite": build_concurrent_chain(
+            retriever, llm, get_history, packer, rewrite_llm=rewrite_llm
+        ),
+    }
+    return chains, histories
+
+
+async def run(chain, name, question, requests):
+    stages = defaultdict(list)
+    for i in range(requests):
+        start = time.perf_counter()
+        with trace_request() as trace:
+            await chain.ainvoke(
+                {"input": question},
+                config={
+                    "configurable": {"session_id": f"{name}-{i}"},
+                    "callbacks": [StageTimingHandler()],
+                },
+            )
+        stages["total"].append((time.perf_counter() - start) * 1000)
+        for stage, seconds in trace.stages.items():
+            stages[stage].append(seconds * 1000)
+    return {stage: statistics.median(values) for stage, values in stages.items()}
+
+
+async def main(args):
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=8))
+    chains, histories = make_chains(args)
+    ok = check_refers_back()
+    print()
+
+    print(f"median ms over {args.requests} requests, question: {args.question!r}")
+    print(f"{'chain':>20} " + " ".join(f"{s:>12}" for s in STAGES))
+    results = {}
+    for name, chain in chains.items():
+        results[name] = await run(chain, name, args.question, args.requests)
+        row = " ".join(
+            f"{results[name][s]:>12.1f}" if s in results[name] else f"{'-':>12}"
+            for s in STAGES
+        )
+        print(f"{name:>20} {row}")
+        # The turn must be saved exactly once, like RunnableWithMessageHistory
+        saved = len(histories[f"{name}-0"]._messages)
+        if saved != 4:
+            print(f"FAIL {name}: session has {saved} messages, expected 4")
+            ok = False
+
+    seq, conc = results["sequential"], results["concurrent"]
+    critical_path = seq["history_load"] + seq["retrieve"]
+    print(
+        f"history + retrieve: {critical_path:.1f}ms sequential vs "
+        f"{conc['prepare']:.1f}ms concurrent "
+        f"(saved {critical_path - conc['prepare']:.1f}ms, total "
+        f"{seq['total']:.1f} -> {conc['total']:.1f}ms)"
+    )
+    return ok and conc["total"] < seq["total"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--question", default="How is it treated?")
+    parser.add_argument("--history-latency", type=float, default=0.03)
+    parser.add_argument("--retriever-latency", type=float, default=0.08)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--rewrite-latency", type=float, default=0.1)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    sys.exit(0 if asyncio.run(main(args)) else 1)
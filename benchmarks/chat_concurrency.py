@@ -0,0 +1,76 @@
+"""
+Requests-per-second of the /chat chain as concurrency grows.
+
+Compares the old blocking path (sync `invoke` on the event loop) against the
+async path used by `chat_endpoint` (`ainvoke` behind ConcurrencyLimiter),
+with stubbed retriever/LLM backends so no network or API keys are needed.
+
+    python -m benchmarks.chat_concurrency --requests 64 --levels 1 2 4 8 16 32
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_community.chat_message_histories import ChatMessageHistory
+
+from benchmarks.stubs import StubChatModel, StubRetriever
+from src.chain import build_chain_with_memory, build_retrieval_chain
+from src.concurrency import ConcurrencyLimiter
+
+
+def make_chain(retriever_latency, llm_latency):
+    store = {}
+
+    def get_session_memory(session_id: str):
+        if session_id not in store:
+            store[session_id] = ChatMessageHistory()
+        return store[session_id]
+
+    retrieval_chain = build_retrieval_chain(
+        StubRetriever(latency=retriever_latency), StubChatModel(latency=llm_latency)
+    )
+    return build_chain_with_memory(retrieval_chain, get_session_memory)
+
+
+async def run_level(chain, mode, concurrency, total):
+    limiter = ConcurrencyLimiter(
+        max_concurrency=concurrency, max_queue=total, queue_timeout=60
+    )
+
+    async def one(i):
+        config = {"configurable": {"session_id": f"bench-{i}"}}
+        async with limiter.slot():
+            if mode == "blocking":
+                return chain.invoke({"input": "What is diabetes?"}, config=config)
+            return await chain.ainvoke({"input": "What is diabetes?"}, config=config)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(args):
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=args.workers))
+    chain = make_chain(args.retriever_latency, args.llm_latency)
+
+    print(f"{'concurrency':>11} {'blocking rps':>13} {'async rps':>10} {'speedup':>8}")
+    for level in args.levels:
+        blocking = await run_level(chain, "blocking", level, args.requests)
+        non_blocking = await run_level(chain, "async", level, args.requests)
+        print(
+            f"{level:>11} {blocking:>13.1f} {non_blocking:>10.1f} "
+            f"{non_blocking / blocking:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--retriever-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
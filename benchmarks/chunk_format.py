@@ -0,0 +1,104 @@
+"""
+Size, load time and peak RSS of the legacy and compact chunk formats.
+
+Writes a synthetic corpus as processed_document.json (one JSON array) and as
+processed_document.jsonl.gz (with and without 384-d vectors), then loads
+each in a fresh process: the legacy way (parse everything into Documents)
+and lazily (iterate chunks without keeping them). Peak RSS is reported
+above the process baseline after imports.
+
+    python -m benchmarks.chunk_format --chunks 20000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+
+from langchain.schema import Document
+
+from src.chunk_format import iter_chunks, write_chunks
+
+WORDS = (
+    "blood pressure heart diabetes insulin glucose asthma airway lungs fever "
+    "infection immune system kidney liver symptom treatment chronic acute"
+).split()
+
+
+def synthetic_documents(count, rng):
+    for i in range(count):
+        text = " ".join(rng.choice(WORDS) for _ in range(150))[:1000]
+        yield Document(
+            page_content=text,
+            metadata={"source": "medical_book.pdf", "page": i // 4},
+        )
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load(path, mode):
+    baseline = max_rss_mb()  # interpreter + imports, before any chunk is read
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        if mode == "documents":
+            docs = [
+                Document(page_content=c["page_content"], metadata=c["metadata"])
+                for c in iter_chunks(f, path)
+            ]
+            count = len(docs)
+        else:
+            count = sum(1 for _ in iter_chunks(f, path))
+    elapsed = time.perf_counter() - start
+    return count, elapsed, max_rss_mb() - baseline
+
+
+def run_isolated(path, mode):
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(load, (path, mode))
+
+
+def main(args):
+    rng = random.Random(0)
+    directory = tempfile.mkdtemp()
+    docs = list(synthetic_documents(args.chunks, rng))
+
+    legacy = os.path.join(directory, "processed_document.json")
+    with open(legacy, "w") as f:
+        json.dump(
+            [{"page_content": d.page_content, "metadata": d.metadata} for d in docs], f
+        )
+
+    compact = os.path.join(directory, "processed_document.jsonl.gz")
+    write_chunks(compact, docs)
+
+    with_vectors = os.path.join(directory, "vectors", "processed_document.jsonl.gz")
+    os.makedirs(os.path.dirname(with_vectors))
+    vectors = ([rng.uniform(-0.2, 0.2) for _ in range(384)] for _ in docs)
+    write_chunks(with_vectors, docs, vectors)
+
+    print(f"{'file':>22} {'MB':>7} {'mode':>10} {'seconds':>8} {'peak RSS +MB':>13}")
+    for name, path in (
+        ("json", legacy),
+        ("jsonl.gz", compact),
+        ("jsonl.gz + vectors", with_vectors),
+    ):
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        for mode in ("documents", "lazy"):
+            count, elapsed, peak = run_isolated(path, mode)
+            assert count == args.chunks
+            print(
+                f"{name:>22} {size_mb:>7.1f} {mode:>10} {elapsed:>8.2f} {peak:>13.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,147 @@
+"""
+Concurrency check for single-flight coalescing of identical first-turn questions.
+
+Drives the real FastAPI app in-process (httpx ASGITransport) with the
+retriever and GPT-4o replaced by local stubs, the LLM made slow enough for
+requests to overlap, and the semantic cache disabled so only coalescing
+can save LLM calls. Exits non-zero if any check fails.
+
+    python -m benchmarks.coalescing --sessions 50 --llm-latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+os.environ["APP_WARMUP"] = "lazy"
+os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+os.environ["CHAT_IP_RATE_LIMIT"] = "0"  # every simulated client shares one address
+
+import httpx  # noqa: E402
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+
+import app as chat_app  # noqa: E402
+from benchmarks.stubs import StubChatModel, StubRetriever  # noqa: E402
+from src.embeddings import EmbeddingService  # noqa: E402
+from src.metrics import CHAT_COALESCED  # noqa: E402
+
+
+def install_stubs(llm):
+    components = chat_app.components
+    components.register(
+        "embeddings", lambda: EmbeddingService(DeterministicFakeEmbedding(size=16))
+    )
+    components.register("retriever", lambda: StubRetriever(latency=0.05))
+    components.register("llm", lambda: llm)
+    components.register("chain", chat_app.build_chat_chain)
+    components.register("answer_cache", lambda: None)
+    components.register("model_router", lambda: None)  # one stub model only
+
+
+def coalesced():
+    return CHAT_COALESCED.value(endpoint="chat") + CHAT_COALESCED.value(
+        endpoint="stream"
+    )
+
+
+async def ask(client, session_id, message, stream=False):
+    body = {"message": message, "session_id": session_id}
+    if not stream:
+        response = await client.post("/chat", json=body)
+        return response.json()["reply"]
+    response = await client.post("/chat/stream", json=body)
+    return "".join(
+        json.loads(block.split("data: ", 1)[1])["text"]
+        for block in response.text.split("\n\n")
+        if block.startswith("event: token")
+    )
+
+
+async def scenario(client, llm, name, requests, expected_calls):
+    calls_before, coalesced_before = llm.calls, coalesced()
+    start = time.perf_counter()
+    replies = await asyncio.gather(*(ask(client, *r) for r in requests))
+    elapsed = time.perf_counter() - start
+    calls = llm.calls - calls_before
+    shared = coalesced() - coalesced_before
+
+    histories_ok = all(
+        len(chat_app.get_session_memory(session_id).messages) >= 2
+        for session_id, *_ in requests
+    )
+    passed = calls == expected_calls and histories_ok and all(replies)
+    print(
+        f"{'PASS' if passed else 'FAIL'} {name}: {len(requests)} requests, "
+        f"{calls} LLM calls (expected {expected_calls}), {shared} coalesced, "
+        f"histories {'ok' if histories_ok else 'MISSING'}, {elapsed:.2f}s"
+    )
+    return passed
+
+
+async def main(args):
+    llm = StubChatModel(latency=args.llm_latency)
+    install_stubs(llm)
+    transport = httpx.ASGITransport(app=chat_app.app)
+    n = args.sessions
+    results = []
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test", timeout=60
+    ) as client:
+        variants = ["What is malaria?", "what is  MALARIA?", " What is malaria? "]
+        results.append(
+            await scenario(
+                client,
+                llm,
+                "identical first turns",
+                [(f"a{i}", variants[i % len(variants)]) for i in range(n)],
+                expected_calls=1,
+            )
+        )
+        results.append(
+            await scenario(
+                client,
+                llm,
+                "two distinct questions",
+                [
+                    (f"b{i}", "What causes acne?" if i % 2 else "What is asthma?")
+                    for i in range(n)
+                ],
+                expected_calls=2,
+            )
+        )
+        results.append(
+            await scenario(
+                client,
+                llm,
+                "mixed /chat and /chat/stream",
+                [(f"c{i}", "What is anemia?", i % 2 == 1) for i in range(n)],
+                expected_calls=1,
+            )
+        )
+        # Sessions from the first scenario now have history: no sharing
+        follow_ups = min(n, 5)
+        results.append(
+            await scenario(
+                client,
+                llm,
+                "follow-up turns are not coalesced",
+                [(f"a{i}", "How is it treated?") for i in range(follow_ups)],
+                expected_calls=follow_ups,
+            )
+        )
+
+    print(f"coalescer stats: {chat_app.coalescer.stats()}")
+    return all(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    sys.exit(0 if asyncio.run(main(args)) else 1)
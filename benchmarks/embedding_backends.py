@@ -0,0 +1,94 @@
+"""
+Compare MiniLM embedding backends on CPU.
+
+For each backend (torch, onnx, onnx-int8) reports ingestion throughput
+(docs/sec through embed_documents), p50/p99 single-query latency, and
+cosine parity against the torch vectors (must be >= --min-cosine).
+
+    python -m benchmarks.embedding_backends --docs 512 --queries 200
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from src.embeddings import check_embedding_parity
+from src.helper import load_embedding_model
+
+SAMPLE_SENTENCES = [
+    "Diabetes mellitus is a chronic condition in which blood glucose is too high.",
+    "Hypertension often has no symptoms but raises the risk of stroke.",
+    "Asthma causes inflammation and narrowing of the airways.",
+    "Acne occurs when hair follicles become plugged with oil and dead skin cells.",
+    "Heart failure means the heart cannot pump blood as well as it should.",
+    "A fever is a temporary increase in body temperature, often due to infection.",
+    "Migraine headaches can cause throbbing pain and sensitivity to light.",
+    "Anemia is a lack of healthy red blood cells to carry oxygen.",
+]
+
+
+def load_texts(path, count):
+    if path:
+        with open(path) as f:
+            chunks = json.load(f)
+        texts = [chunk["page_content"] for chunk in chunks]
+    else:
+        texts = SAMPLE_SENTENCES
+    return [texts[i % len(texts)] + f" ({i})" for i in range(count)]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main(args):
+    docs = load_texts(args.chunks, args.docs)
+    queries = [f"What is condition number {i}?" for i in range(args.queries)]
+    reference = load_embedding_model("torch")
+    failed = False
+
+    print(
+        f"{'backend':>10} {'docs/sec':>9} {'p50 ms':>7} {'p99 ms':>7} "
+        f"{'min cos':>8} {'mean cos':>9}"
+    )
+    for backend in args.backends:
+        model = reference if backend == "torch" else load_embedding_model(backend)
+        model.embed_documents(docs[:8])  # warm up
+
+        start = time.perf_counter()
+        for i in range(0, len(docs), args.batch_size):
+            model.embed_documents(docs[i : i + args.batch_size])
+        docs_per_sec = len(docs) / (time.perf_counter() - start)
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            model.embed_query(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        passed, worst, mean = check_embedding_parity(
+            model, reference, docs[: args.parity_docs], args.min_cosine
+        )
+        failed = failed or not passed
+        print(
+            f"{backend:>10} {docs_per_sec:>9.1f} {statistics.median(latencies):>7.2f} "
+            f"{percentile(latencies, 99):>7.2f} {worst:>8.4f} {mean:>9.4f}"
+            + ("" if passed else "  PARITY FAILED")
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--chunks", help="local processed_document.json to sample")
+    parser.add_argument("--docs", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--parity-docs", type=int, default=128)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    main(parser.parse_args())
@@ -0,0 +1,151 @@
+"""
+Retrieval quality and latency of vector, BM25 and hybrid (RRF) retrieval.
+
+Queries are derived from the corpus itself: each one pairs a few of a
+chunk's rarest terms (drug names, codes, acronyms) with generic question
+words, and the chunk it was drawn from is the gold answer. This is the
+exact-term lookup pure dense retrieval tends to miss.
+
+    python -m benchmarks.hybrid_retrieval --chunks data/processed_document.jsonl.gz
+    python -m benchmarks.hybrid_retrieval --fake-embeddings   # synthetic smoke run
+"""
+
+import argparse
+import hashlib
+import math
+import random
+import statistics
+import time
+from collections import Counter
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+from src.bm25 import BM25Index, HybridRetriever, tokenize
+from src.vector_store import LocalVectorStore
+
+FILLER = (
+    "what is the recommended treatment dose for patients with symptoms of "
+    "chronic acute disease infection pain blood heart liver kidney therapy"
+).split()
+
+
+class HashedTrigramEmbeddings(Embeddings):
+    """Character-trigram hashing; a cheap stand-in for a sentence encoder."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        text = f" {text.lower()} "
+        for i in range(len(text) - 2):
+            digest = hashlib.md5(text[i : i + 3].encode()).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dim] += 1.0
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def synthetic_corpus(n, rng):
+    codes = [
+        f"{rng.choice(['zol', 'mab', 'pril', 'statin', 'cillin'])}{i:04d}"
+        for i in range(n // 4)
+    ]
+    documents = []
+    for i in range(n):
+        words = [rng.choice(FILLER) for _ in range(120)]
+        for _ in range(3):
+            words.insert(rng.randrange(len(words)), rng.choice(codes))
+        documents.append(Document(page_content=" ".join(words), metadata={"i": i}))
+    return documents
+
+
+def make_queries(documents, count, rng):
+    df = Counter(term for d in documents for term in set(tokenize(d.page_content)))
+    queries = []
+    for gold in rng.sample(range(len(documents)), min(count, len(documents))):
+        terms = sorted(set(tokenize(documents[gold].page_content)), key=df.get)[:2]
+        query = " ".join(rng.sample(FILLER, 4) + terms)
+        queries.append((query, documents[gold].page_content))
+    return queries
+
+
+def evaluate(name, retrieve, queries, k):
+    hits, reciprocal_ranks, latencies = 0, [], []
+    for query, gold in queries:
+        start = time.perf_counter()
+        results = retrieve(query)[:k]
+        latencies.append((time.perf_counter() - start) * 1000)
+        contents = [d.page_content for d in results]
+        rank = contents.index(gold) + 1 if gold in contents else math.inf
+        hits += rank <= k
+        reciprocal_ranks.append(0.0 if rank == math.inf else 1.0 / rank)
+    latencies.sort()
+    print(
+        f"{name:>7}: hit@{k}={hits / len(queries):.3f}  "
+        f"MRR={statistics.mean(reciprocal_ranks):.3f}  "
+        f"p50={statistics.median(latencies):.2f}ms  "
+        f"p95={latencies[int(len(latencies) * 0.95)]:.2f}ms"
+    )
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    if args.chunks:
+        from src.helper import load_doc_from_file
+
+        documents = load_doc_from_file(args.chunks)
+    else:
+        documents = synthetic_corpus(args.size, rng)
+
+    if args.fake_embeddings:
+        embeddings = HashedTrigramEmbeddings()
+    else:
+        from src.helper import get_embeddings
+
+        embeddings = get_embeddings()
+
+    start = time.perf_counter()
+    bm25 = BM25Index.build(documents)
+    print(f"BM25 build: {time.perf_counter() - start:.2f}s for {len(documents)} chunks")
+    store = LocalVectorStore.from_texts(
+        [d.page_content for d in documents],
+        embeddings,
+        metadatas=[d.metadata for d in documents],
+    )
+
+    vector_retriever = store.as_retriever(search_kwargs={"k": args.candidates})
+    hybrid = HybridRetriever(
+        vector_retriever=vector_retriever,
+        bm25_index=bm25,
+        k=args.k,
+        candidates=args.candidates,
+    )
+    queries = make_queries(documents, args.queries, rng)
+
+    evaluate("vector", vector_retriever.invoke, queries, args.k)
+    evaluate(
+        "bm25",
+        lambda q: [bm25.documents[i] for i, _ in bm25.search(q, args.k)],
+        queries,
+        args.k,
+    )
+    evaluate("hybrid", hybrid.invoke, queries, args.k)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", help="processed_document.json(l.gz) to index")
+    parser.add_argument("--size", type=int, default=2000, help="synthetic chunks")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--candidates", type=int, default=10)
+    parser.add_argument("--fake-embeddings", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,98 @@
+"""
+Throughput and resume behaviour of the batched ingestion pipeline.
+
+Ingests a synthetic corpus into a local stand-in for the Pinecone index
+(with injected latency and upsert failures), then runs again to show that
+already-indexed chunks are skipped. A last, manifest-driven sync with a few
+edited chunks checks that only those are upserted, without looking up the
+IDs already in the index. Exits non-zero if it does.
+
+    python -m benchmarks.ingest_throughput --chunks 5000 --workers 1 4 8
+"""
+
+import argparse
+import sys
+
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from benchmarks.stubs import StubVectorIndex
+from src.ingest import build_manifest, ingest_documents, sync_documents
+
+
+def synthetic_chunks(count):
+    for i in range(count):
+        yield Document(
+            page_content=f"Synthetic medical chunk {i} about condition {i % 97}.",
+            metadata={"source": "medical_book.pdf", "page": i // 4},
+        )
+
+
+def check_sync(embeddings, count, edited=10):
+    documents = list(synthetic_chunks(count))
+    index = StubVectorIndex(latency=0)
+    ingest_documents(documents, embeddings, index)
+    manifest = build_manifest(documents)
+    lookups = index.existing_ids_calls
+
+    for doc in documents[:edited]:
+        doc.page_content += " (revised)"
+    report, _ = sync_documents(documents, embeddings, index, manifest)
+    lookups = index.existing_ids_calls - lookups
+    passed = lookups == 0 and report["upserted"] == edited
+    print(
+        f"{'PASS' if passed else 'FAIL'}: manifest sync of {count} chunks upserted "
+        f"{report['upserted']} (expected {edited}), {lookups} existing-ID lookups"
+    )
+    return passed
+
+
+def main(args):
+    if args.real_embeddings:
+        from src.helper import get_embeddings
+
+        embeddings = get_embeddings()
+    else:
+        embeddings = DeterministicFakeEmbedding(size=384)
+
+    print(
+        f"{'workers':>7} {'chunks/sec':>11} {'upserted':>9} {'failed':>7} {'rerun skipped':>14}"
+    )
+    for workers in args.workers:
+        index = StubVectorIndex(latency=args.latency, failure_rate=args.failure_rate)
+        first = ingest_documents(
+            synthetic_chunks(args.chunks),
+            embeddings,
+            index,
+            batch_size=args.batch_size,
+            upsert_batch_size=args.upsert_batch_size,
+            max_workers=workers,
+            max_retries=args.retries,
+        )
+        rerun = ingest_documents(
+            synthetic_chunks(args.chunks),
+            embeddings,
+            index,
+            batch_size=args.batch_size,
+            max_workers=workers,
+        )
+        print(
+            f"{workers:>7} {first['chunks_per_sec']:>11.1f} {first['upserted']:>9} "
+            f"{first['failed']:>7} {rerun['skipped']:>14}"
+        )
+    return check_sync(embeddings, args.chunks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--upsert-batch-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument(
+        "--real-embeddings", action="store_true", help="embed with MiniLM"
+    )
+    sys.exit(0 if main(parser.parse_args()) else 1)
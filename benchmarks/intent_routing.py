@@ -0,0 +1,124 @@
+"""
+Accuracy and latency of the local intent router.
+
+Routes a labelled set of greetings, off-topic and medical messages
+through IntentRouter (built from config/config.yml and safety_rails.co)
+and reports the decision for each, accuracy per expected route and the
+p50/p99 routing time with uncached and cached query embeddings.
+
+    python -m benchmarks.intent_routing --backend torch
+    python -m benchmarks.intent_routing --backend fake   # latency only
+
+The fake backend embeds text as random vectors, so only exact example
+matches route correctly; use it to time the matrix scoring on its own.
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+import time
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.config import (
+    EMBEDDING_BATCH_WINDOW_MS,
+    ROUTER_CONFIG_PATH,
+    ROUTER_MARGIN,
+    ROUTER_RAILS_PATH,
+    ROUTER_THRESHOLD,
+)
+from src.embeddings import EmbeddingService
+from src.router import CANNED_ROUTE, RAG_ROUTE, build_intent_router
+
+LABELLED = [
+    ("Hi", CANNED_ROUTE),
+    ("hello!", CANNED_ROUTE),
+    ("Hey, good evening", CANNED_ROUTE),
+    ("Good morning Nne", CANNED_ROUTE),
+    ("How do I make spaghetti carbonara?", CANNED_ROUTE),
+    ("What's the forecast for tomorrow?", CANNED_ROUTE),
+    ("Is ethereum a good investment?", CANNED_ROUTE),
+    ("Who is the richest actor in Hollywood?", CANNED_ROUTE),
+    ("Write me a Python function to sort a list", CANNED_ROUTE),
+    ("What are the symptoms of diabetes?", RAG_ROUTE),
+    ("acne", RAG_ROUTE),
+    ("fever", RAG_ROUTE),
+    ("Hi, what causes migraines?", RAG_ROUTE),
+    ("Hello, how is asthma treated?", RAG_ROUTE),
+    ("What foods should I avoid with high blood pressure?", RAG_ROUTE),
+    ("Is it safe to exercise with a heart condition?", RAG_ROUTE),
+    ("What is anemia?", RAG_ROUTE),
+    ("Why do I feel dizzy when I stand up?", RAG_ROUTE),
+]
+
+
+def load_base(backend):
+    if backend == "fake":
+        return DeterministicFakeEmbedding(size=384)
+    from src.helper import load_embedding_model
+
+    return load_embedding_model(backend)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main(args):
+    embeddings = EmbeddingService(
+        load_base(args.backend), batch_window_ms=EMBEDDING_BATCH_WINDOW_MS
+    )
+    start = time.perf_counter()
+    router = build_intent_router(
+        embeddings,
+        config_path=ROUTER_CONFIG_PATH,
+        rails_path=ROUTER_RAILS_PATH,
+        threshold=args.threshold,
+        margin=args.margin,
+    )
+    print(f"router built in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    correct = {CANNED_ROUTE: [0, 0], RAG_ROUTE: [0, 0]}
+    uncached = []
+    for message, expected in LABELLED:
+        decision = router.route(message)
+        uncached.append(decision.elapsed_ms)
+        correct[expected][0] += decision.route == expected
+        correct[expected][1] += 1
+        mark = "ok " if decision.route == expected else "BAD"
+        print(
+            f"{mark} {decision.route:>6} {decision.intent:<28} "
+            f"{decision.score:.3f} {decision.elapsed_ms:6.2f}ms  {message}"
+        )
+
+    cached = [
+        router.route(message).elapsed_ms
+        for _ in range(args.repeat)
+        for message, _ in LABELLED
+    ]
+    for route, (ok, total) in correct.items():
+        print(f"{route:>6} accuracy: {ok}/{total}")
+    print(
+        f"routing ms, uncached: p50={statistics.median(uncached):.2f} "
+        f"p99={percentile(uncached, 99):.2f}; cached: "
+        f"p50={statistics.median(cached):.3f} p99={percentile(cached, 99):.3f}"
+    )
+
+    accuracy = sum(ok for ok, _ in correct.values()) / len(LABELLED)
+    return args.backend == "fake" or accuracy >= args.min_accuracy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--backend", default="torch", choices=["torch", "onnx", "onnx-int8", "fake"]
+    )
+    parser.add_argument("--threshold", type=float, default=ROUTER_THRESHOLD)
+    parser.add_argument("--margin", type=float, default=ROUTER_MARGIN)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--min-accuracy", type=float, default=0.9)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    sys.exit(0 if main(args) else 1)
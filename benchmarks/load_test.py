@@ -0,0 +1,300 @@
+"""
+Replay chat traffic from a JSONL file at a target QPS and report latency.
+
+Each line is {"session_id": ..., "message": ...}. Requests are sent open
+loop (on schedule, whether or not earlier ones finished), except that a
+session's turns are sent in order. The file is replayed as often as
+needed to fill --duration, with session IDs suffixed per pass so every
+pass starts fresh conversations.
+
+Without --url the app is started under uvicorn with local stubs for the
+LLM, vector store and embeddings (benchmarks/stub_app.py), so no API keys
+are needed and results are deterministic. Reports p50/p95/p99 latency,
+achieved RPS, errors and the server's RSS over time. --max-p95-ms,
+--min-rps and --max-error-rate turn it into a regression gate (exit 1).
+
+    python -m benchmarks.load_test --qps 20 --duration 30
+    python -m benchmarks.load_test --stream --qps 50 --llm-latency 0.5 --max-p95-ms 3000
+    python -m benchmarks.load_test --url http://localhost:8000 --qps 5 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+DEFAULT_TRAFFIC = os.path.join(os.path.dirname(__file__), "traffic", "sample.jsonl")
+
+
+def load_traffic(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def schedule(traffic, qps, duration, poisson, seed):
+    """[(send offset in seconds, session_id, message)] for the whole run."""
+    rng = random.Random(seed)
+    total = max(1, int(qps * duration))
+    plan, offset = [], 0.0
+    for i in range(total):
+        entry = traffic[i % len(traffic)]
+        session_id = f"{entry.get('session_id', f'line-{i % len(traffic)}')}-p{i // len(traffic)}"
+        plan.append((offset, session_id, entry["message"]))
+        offset += rng.expovariate(qps) if poisson else 1 / qps
+    return plan
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub_server(args):
+    port = free_port()
+    env = {
+        **os.environ,
+        "STUB_LLM_LATENCY": str(args.llm_latency),
+        "STUB_LLM_TOKENS_PER_SEC": str(args.tokens_per_sec),
+        "STUB_VECTOR_LATENCY": str(args.vector_latency),
+        # Every replayed session comes from this one address
+        "CHAT_IP_RATE_LIMIT": "0",
+    }
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "benchmarks.stub_app:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/healthz").status_code == 200:
+                return server, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise SystemExit("stub server did not become ready")
+
+
+async def send(client, session_id, message, stream):
+    """Returns (status, time to first token or None)."""
+    body = {"message": message, "session_id": session_id}
+    if not stream:
+        response = await client.post("/chat", json=body)
+        return response.status_code, None
+
+    start = time.perf_counter()
+    ttft, status = None, None
+    async with client.stream("POST", "/chat/stream", json=body) as response:
+        status = response.status_code
+        async for line in response.aiter_lines():
+            if line.startswith("event: token") and ttft is None:
+                ttft = time.perf_counter() - start
+            elif line.startswith("event: error"):
+                status = 503 if status == 200 else status
+    return status, ttft
+
+
+async def replay(url, plan, args, server_pid):
+    results = []  # (status, latency, ttft)
+    memory = []  # (elapsed, rss_mb, in_flight)
+    session_locks = defaultdict(asyncio.Lock)
+    in_flight = 0
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+    async with httpx.AsyncClient(
+        base_url=url, timeout=args.timeout, limits=limits
+    ) as client:
+        t0 = time.perf_counter()
+
+        async def one(offset, session_id, message):
+            nonlocal in_flight
+            async with session_locks[session_id]:
+                start = max(t0 + offset, time.perf_counter())
+                in_flight += 1
+                try:
+                    status, ttft = await send(client, session_id, message, args.stream)
+                except httpx.HTTPError as e:
+                    status, ttft = type(e).__name__, None
+                finally:
+                    in_flight -= 1
+                results.append((status, time.perf_counter() - start, ttft))
+
+        async def sample_memory():
+            while True:
+                memory.append(
+                    (
+                        time.perf_counter() - t0,
+                        rss_mb(server_pid) if server_pid else None,
+                        in_flight,
+                    )
+                )
+                await asyncio.sleep(args.sample_interval)
+
+        sampler = asyncio.create_task(sample_memory())
+        tasks = []
+        for offset, session_id, message in plan:
+            delay = t0 + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(offset, session_id, message)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - t0
+        sampler.cancel()
+    return results, memory, elapsed
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def summarize(results, memory, elapsed, args):
+    statuses = Counter(status for status, _, _ in results)
+    ok = [r for r in results if r[0] == 200]
+    latencies = [latency * 1000 for _, latency, _ in ok]
+    ttfts = [ttft * 1000 for _, _, ttft in ok if ttft is not None]
+    rss = [m[1] for m in memory if m[1] is not None]
+    return {
+        "target_qps": args.qps,
+        "sent": len(results),
+        "ok": len(ok),
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "rps": round(len(ok) / elapsed, 2),
+        "elapsed_s": round(elapsed, 2),
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "mean": statistics.mean(latencies) if latencies else None,
+        },
+        "ttft_ms": (
+            {"p50": percentile(ttfts, 0.50), "p95": percentile(ttfts, 0.95)}
+            if ttfts
+            else None
+        ),
+        "rss_mb": {"start": rss[0], "peak": max(rss), "end": rss[-1]} if rss else None,
+        "timeline": [
+            {"t": round(t, 1), "rss_mb": m, "in_flight": n} for t, m, n in memory
+        ],
+    }
+
+
+def report(summary):
+    fmt = lambda v: "-" if v is None else f"{v:.0f}"  # noqa: E731
+    lat = summary["latency_ms"]
+    print(
+        f"sent {summary['sent']} at {summary['target_qps']} qps in "
+        f"{summary['elapsed_s']}s: {summary['rps']} ok rps, "
+        f"error rate {summary['error_rate']:.2%} {summary['statuses']}"
+    )
+    print(
+        f"latency ms: p50={fmt(lat['p50'])} p95={fmt(lat['p95'])} "
+        f"p99={fmt(lat['p99'])} mean={fmt(lat['mean'])}"
+    )
+    if summary["ttft_ms"]:
+        ttft = summary["ttft_ms"]
+        print(f"time to first token ms: p50={fmt(ttft['p50'])} p95={fmt(ttft['p95'])}")
+    if summary["rss_mb"]:
+        rss = summary["rss_mb"]
+        print(
+            f"server RSS MB: start={rss['start']:.0f} peak={rss['peak']:.0f} "
+            f"end={rss['end']:.0f}"
+        )
+    for point in summary["timeline"]:
+        rss = "-" if point["rss_mb"] is None else f"{point['rss_mb']:.0f}MB"
+        print(f"  t={point['t']:>6.1f}s rss={rss:>7} in_flight={point['in_flight']}")
+
+
+def gate(summary, args):
+    failures = []
+    p95 = summary["latency_ms"]["p95"]
+    if args.max_p95_ms is not None and (p95 is None or p95 > args.max_p95_ms):
+        failures.append(f"p95 {p95}ms > {args.max_p95_ms}ms")
+    if args.min_rps is not None and summary["rps"] < args.min_rps:
+        failures.append(f"rps {summary['rps']} < {args.min_rps}")
+    if args.max_error_rate is not None and summary["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {summary['error_rate']} > {args.max_error_rate}")
+    return failures
+
+
+def main(args):
+    plan = schedule(
+        load_traffic(args.traffic), args.qps, args.duration, args.poisson, args.seed
+    )
+    server, url, pid = None, args.url, args.pid
+    if url is None:
+        server, url = start_stub_server(args)
+        pid = server.pid
+    try:
+        results, memory, elapsed = asyncio.run(replay(url, plan, args, pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    summary = summarize(results, memory, elapsed, args)
+    report(summary)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    failures = gate(summary, args)
+    for failure in failures:
+        print(f"GATE FAILED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--traffic", default=DEFAULT_TRAFFIC, help="JSONL traffic")
+    parser.add_argument("--qps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--poisson", action="store_true", help="random arrivals")
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream")
+    parser.add_argument("--url", help="target a running server instead of stubs")
+    parser.add_argument("--pid", type=int, help="server PID to sample RSS with --url")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-sec", type=float, default=50)
+    parser.add_argument("--vector-latency", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the summary as JSON")
+    parser.add_argument("--max-p95-ms", type=float)
+    parser.add_argument("--min-rps", type=float)
+    parser.add_argument("--max-error-rate", type=float)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,141 @@
+"""
+Per-request logging overhead: synchronous stdout handler vs the async pipeline.
+
+Each simulated chat request logs its input (~100 chars) and a RAG answer
+(~2 KB), like chat_endpoint does. The sink sleeps on every write to mimic a
+stdout pipe that is slow to drain under load. Reports the time the request
+spends inside logging calls and how late a 1 ms event-loop ticker fires
+while requests run concurrently.
+
+    python -m benchmarks.logging_overhead --requests 2000 --write-latency-us 200
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import statistics
+import time
+
+from src.logger import (
+    AsyncLogPipeline,
+    RequestIdFilter,
+    build_formatter,
+)
+
+
+class SlowStream(io.TextIOBase):
+    def __init__(self, write_latency):
+        self.write_latency = write_latency
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        time.sleep(self.write_latency)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def sync_logger(stream):
+    # The previous setup: StreamHandler(sys.stdout) with a text formatter
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(build_formatter("text", use_color=False))
+    handler.addFilter(RequestIdFilter())
+    logger = logging.getLogger("bench.sync")
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger, None
+
+
+def async_logger(stream, args):
+    pipeline = AsyncLogPipeline(
+        stream=stream,
+        log_format="json",
+        queue_size=args.queue_size,
+        max_chars=args.max_chars,
+        sample_rate=args.sample_rate,
+    )
+    pipeline.start()
+    logger = logging.getLogger("bench.async")
+    logger.handlers = [pipeline.handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger, pipeline
+
+
+async def run(logger, args):
+    message = "What are the common side effects of metformin in elderly patients?"
+    answer = "Metformin commonly causes gastrointestinal upset. " * 40
+    per_request, lags = [], []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - start - 0.001) * 1000)
+
+    async def request():
+        start = time.perf_counter()
+        logger.info(f"Input: {message}")
+        spent = time.perf_counter() - start
+        await asyncio.sleep(0)  # the chain would run here
+        start = time.perf_counter()
+        logger.info(f"RAG Response: {answer}")
+        per_request.append((spent + time.perf_counter() - start) * 1e6)
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    for i in range(0, args.requests, args.concurrency):
+        batch = min(args.concurrency, args.requests - i)
+        await asyncio.gather(*(request() for _ in range(batch)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+    return per_request, lags, elapsed
+
+
+def report(name, per_request, lags, elapsed, extra=""):
+    per_request.sort()
+    print(
+        f"{name:>6}: per-request logging p50={statistics.median(per_request):.0f}us "
+        f"p99={per_request[int(len(per_request) * 0.99)]:.0f}us  "
+        f"loop lag max={max(lags or [0]):.1f}ms  "
+        f"wall={elapsed:.2f}s {extra}"
+    )
+
+
+def main(args):
+    write_latency = args.write_latency_us / 1e6
+
+    logger, _ = sync_logger(SlowStream(write_latency))
+    report("sync", *asyncio.run(run(logger, args)))
+
+    stream = SlowStream(write_latency)
+    logger, pipeline = async_logger(stream, args)
+    per_request, lags, elapsed = asyncio.run(run(logger, args))
+    stats = pipeline.stats()
+    flush_start = time.perf_counter()
+    pipeline.stop()
+    report(
+        "async",
+        per_request,
+        lags,
+        elapsed,
+        f"(dropped={stats['dropped']} truncated={stats['truncated']} "
+        f"written={stream.writes} flush={time.perf_counter() - flush_start:.2f}s)",
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--write-latency-us", type=float, default=200)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--max-chars", type=int, default=1000)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    main(parser.parse_args())
@@ -0,0 +1,129 @@
+"""
+Model tier decisions and the per-tier latency and cost they lead to.
+
+First checks ModelRouter's choice for labelled questions (retrieval score
+and history length given), using the tiers in config/config.yml. Then
+replays the sample traffic through the real app in-process with the stubs
+of benchmarks/stub_app.py, whose "fast" model is twice as quick as the
+main one, and reports each tier's share of turns, latency and token cost,
+against the cost of answering everything with the main model. Exits
+non-zero if a labelled decision is wrong.
+
+    python -m benchmarks.model_tiering --requests 80
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+os.environ["APP_WARMUP"] = "lazy"
+os.environ["ROUTER_ENABLED"] = "false"
+os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+os.environ["CHAT_IP_RATE_LIMIT"] = "0"
+os.environ.setdefault("STUB_LLM_LATENCY", "0.1")
+os.environ.setdefault("STUB_LLM_TOKENS_PER_SEC", "200")
+
+import httpx  # noqa: E402
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+import benchmarks.stub_app as stub_app  # noqa: E402
+from src.metrics import MODEL_TIER_TOKENS  # noqa: E402
+from src.tiering import MAIN_TIER  # noqa: E402
+
+# (question, top retrieval score, history messages, expected tier)
+LABELLED = [
+    ("What is asthma?", 0.72, 0, "fast"),
+    ("Define hypertension", 0.65, 0, "fast"),
+    ("What are the symptoms of anemia?", 0.68, 2, "fast"),
+    ("What is the difference between type 1 and type 2 diabetes?", 0.7, 0, "main"),
+    ("Why does blood pressure rise in the morning?", 0.7, 0, "main"),
+    ("What dose of ibuprofen is usual for adults?", 0.7, 0, "main"),
+    ("Can I take aspirin while pregnant?", 0.7, 0, "main"),
+    ("What is gout? And is it hereditary?", 0.7, 0, "main"),
+    ("What is gout?", 0.3, 0, "main"),
+    ("What is acne?", 0.7, 10, "main"),
+    (
+        "I have had headaches on and off for three weeks, mostly in the "
+        "evening after work, what could be behind them?",
+        0.7,
+        0,
+        "main",
+    ),
+]
+
+
+def check_decisions(router):
+    ok = True
+    for question, score, history, expected in LABELLED:
+        decision = router.select(
+            question,
+            [Document(page_content="chunk", metadata={"score": score})],
+            [HumanMessage(content="earlier")] * history,
+        )
+        passed = decision.tier.name == expected
+        ok &= passed
+        print(
+            f"{'PASS' if passed else 'FAIL'} {decision.tier.name:>5} "
+            f"({decision.reason}, score {score}, history {history}): {question}"
+        )
+    return ok
+
+
+async def replay(requests):
+    with open("benchmarks/traffic/sample.jsonl") as f:
+        traffic = [json.loads(line) for line in f]
+    transport = httpx.ASGITransport(app=stub_app.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test", timeout=60
+    ) as client:
+        for i in range(requests):
+            entry = traffic[i % len(traffic)]
+            await client.post(
+                "/chat",
+                json={
+                    "message": entry["message"],
+                    "session_id": f"{entry['session_id']}-{i // len(traffic)}",
+                },
+            )
+
+
+async def main(args):
+    router = await stub_app.components.aget("model_router")
+    if router is None:
+        print("FAIL no smaller model tier configured")
+        return False
+    ok = check_decisions(router)
+
+    await replay(args.requests)
+    stats = router.stats()
+    tiers = {t.name: t for t in [router.main, *router.smaller]}
+    total_calls = sum(s["calls"] for s in stats.values())
+    cost = sum(s["cost_usd"]["total"] for s in stats.values())
+    main_cost = sum(
+        tiers[MAIN_TIER].cost(
+            MODEL_TIER_TOKENS.value(tier=name, kind="prompt"),
+            MODEL_TIER_TOKENS.value(tier=name, kind="completion"),
+        )
+        for name in stats
+    )
+    print(f"\n{args.requests} turns of benchmarks/traffic/sample.jsonl:")
+    for name, s in stats.items():
+        print(
+            f"{name:>5} {s['model']:<12} {s['calls'] / max(1, total_calls):>5.0%} of "
+            f"calls, p50={s['latency_ms']['p50']}ms p95={s['latency_ms']['p95']}ms, "
+            f"cost p50=${s['cost_usd']['p50'] or 0:.5f} total=${s['cost_usd']['total']:.4f}"
+        )
+    print(f"total ${cost:.4f} vs ${main_cost:.4f} with the main model only")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=80)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    sys.exit(0 if asyncio.run(main(args)) else 1)
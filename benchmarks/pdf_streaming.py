@@ -0,0 +1,175 @@
+"""
+Peak memory and time of PDF extraction: buffered vs streaming.
+
+Generates a large synthetic PDF, serves it from a local HTTP server and uses
+moto as a stand-in for S3. The buffered path reproduces the original
+`get_pdf_file` / `get_object_from_s3` behaviour (whole file in memory,
+PyPDFLoader.load()); the streaming path uses the chunked download,
+multipart upload and page-by-page parsing in etl/. Peak Python heap is
+measured with tracemalloc.
+
+    python -m benchmarks.pdf_streaming --pages 1000
+"""
+
+import argparse
+import functools
+import http.server
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from io import BytesIO
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+BUCKET = "benchmark-bucket"
+PAGE_TEXT = (
+    "Hypertension is a condition in which the force of the blood against the "
+    "artery walls is too high. "
+)
+
+
+def make_synthetic_pdf(path, pages, lines_per_page=40):
+    """Write a plain-text PDF with `pages` pages, one object at a time."""
+    offsets = []
+    with open(path, "wb") as f:
+
+        def obj(number, body):
+            offsets.append(f.tell())
+            f.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        font_id = 3
+        first_page_id = 4
+        kids = " ".join(f"{first_page_id + 2 * i} 0 R" for i in range(pages))
+        obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        obj(2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+        obj(font_id, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+        for i in range(pages):
+            page_id = first_page_id + 2 * i
+            lines = "".join(
+                f"({PAGE_TEXT[:80]} page {i} line {n}) Tj T* "
+                for n in range(lines_per_page)
+            )
+            stream = f"BT /F1 9 Tf 11 TL 36 800 Td {lines}ET".encode()
+            obj(
+                page_id,
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                f"/Resources << /Font << /F1 {font_id} 0 R >> >> "
+                f"/Contents {page_id + 1} 0 R >>".encode(),
+            )
+            obj(
+                page_id + 1,
+                f"<< /Length {len(stream)} >>\nstream\n".encode()
+                + stream
+                + b"\nendstream",
+            )
+
+        xref = f.tell()
+        f.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+        for offset in offsets:
+            f.write(f"{offset:010d} 00000 n \n".encode())
+        f.write(
+            f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\n"
+            f"startxref\n{xref}\n%%EOF\n".encode()
+        )
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_directory(directory):
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def buffered_pipeline(url, s3):
+    # Mirrors the original etl/load.get_pdf_file + etl/etl.get_object_from_s3
+    import requests
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_community.document_loaders import PyPDFLoader
+
+    from etl.etl import process_relevant_doc
+
+    response = requests.get(url)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp:
+        temp.write(response.content)
+    docs = PyPDFLoader(temp.name).load()
+    os.remove(temp.name)
+    s3.put_object(Bucket=BUCKET, Key="buffered.pdf", Body=BytesIO(response.content))
+    del docs, response
+
+    pdf_bytes = s3.get_object(Bucket=BUCKET, Key="buffered.pdf")["Body"].read()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp:
+        temp.write(pdf_bytes)
+    document = PyPDFLoader(temp.name).load()
+    os.remove(temp.name)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=50)
+    return len(process_relevant_doc(splitter.split_documents(document)))
+
+
+def streaming_pipeline(url, s3):
+    from etl.etl import get_object_from_s3, process_relevant_doc, split_docs
+    from etl.load import get_pdf_file, upload_file_to_s3
+
+    pdf_path, docs = get_pdf_file(url)
+    docs.close()
+    upload_file_to_s3(BUCKET, "streaming.pdf", pdf_path)
+    os.remove(pdf_path)
+
+    chunks = split_docs(get_object_from_s3(BUCKET, "streaming.pdf"))
+    return len(process_relevant_doc(chunks))
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return chunks, elapsed, peak / (1024 * 1024)
+
+
+def main(args):
+    import boto3
+    from moto import mock_aws
+
+    directory = tempfile.mkdtemp()
+    pdf_path = os.path.join(directory, "synthetic_book.pdf")
+    make_synthetic_pdf(pdf_path, args.pages)
+    size_mb = os.path.getsize(pdf_path) / (1024 * 1024)
+    server = serve_directory(directory)
+    url = f"http://127.0.0.1:{server.server_port}/synthetic_book.pdf"
+
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket=BUCKET)
+        import etl.etl
+
+        etl.etl.s3 = s3  # module-level client was created before the mock
+
+        print(f"pdf: {args.pages} pages, {size_mb:.1f} MB")
+        print(f"{'pipeline':>10} {'chunks':>7} {'seconds':>8} {'peak MB':>8}")
+        for name, fn in (
+            ("buffered", buffered_pipeline),
+            ("streaming", streaming_pipeline),
+        ):
+            chunks, elapsed, peak = measure(fn, url, s3)
+            print(f"{name:>10} {chunks:>7} {elapsed:>8.2f} {peak:>8.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=1000)
+    main(parser.parse_args())
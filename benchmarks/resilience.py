@@ -0,0 +1,207 @@
+"""
+Deadlines, hedged retrieval and graceful degradation against stub servers.
+
+Starts local OpenAI and Pinecone stand-ins (benchmarks/stub_servers.py),
+points the real ChatOpenAI and Pinecone clients at them and drives the
+app in-process while the servers inject latency:
+
+  1. no faults: every request succeeds over a few pooled connections
+  2. 10% of Pinecone queries stall: hedging keeps p99 close to normal,
+     compared with the same faults and hedging turned off
+  3. GPT-4o stalls: /chat answers within CHAT_DEADLINE, from the cache when
+     a close answer exists, otherwise with a fast try-again reply
+  4. GPT-4o stalls on /chat/stream: a reply arrives within the first-token
+     deadline
+
+Exits non-zero if any check fails.
+
+    python -m benchmarks.resilience --requests 40 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from benchmarks.stub_servers import openai_server, pinecone_server
+
+DEADLINE = 3.0
+
+openai_stub = openai_server().start()
+pinecone_stub = pinecone_server().start()
+os.environ.update(
+    {
+        "APP_WARMUP": "lazy",
+        "ROUTER_ENABLED": "false",
+        "VECTOR_STORE": "pinecone",
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_API_BASE": f"{openai_stub.url}/v1",
+        "PINECONE_API_KEY": "stub",
+        "PINECONE_HOST": pinecone_stub.url,
+        "CHAT_DEADLINE": str(DEADLINE),
+        "RETRIEVAL_TIMEOUT": "1",
+        "RETRIEVAL_HEDGE_AFTER": "0.2",
+        "LLM_FIRST_TOKEN_TIMEOUT": "2",
+        "HTTP_POOL_SIZE": "16",
+        "CHAT_IP_RATE_LIMIT": "0",
+    }
+)
+
+import httpx  # noqa: E402
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+
+import app as chat_app  # noqa: E402
+from src.embeddings import EmbeddingService  # noqa: E402
+from src.metrics import RETRIEVAL_HEDGES  # noqa: E402
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def drive(client, requests, concurrency, prefix):
+    """Send distinct first-turn questions; returns [(status, seconds)]."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(
+                "/chat",
+                json={
+                    "message": f"What is condition {prefix}-{i}?",
+                    "session_id": f"{prefix}-{i}",
+                },
+            )
+            return response.status_code, time.perf_counter() - start
+
+    return await asyncio.gather(*(one(i) for i in range(requests)))
+
+
+def report(name, passed, detail):
+    print(f"{'PASS' if passed else 'FAIL'} {name}: {detail}")
+    return passed
+
+
+def summary(results):
+    latencies = [seconds * 1000 for _, seconds in results]
+    errors = sum(status != 200 for status, _ in results)
+    return (
+        (
+            f"p50={percentile(latencies, 0.5):.0f}ms p99={percentile(latencies, 0.99):.0f}ms "
+            f"non-200={errors}/{len(results)}"
+        ),
+        errors,
+        percentile(latencies, 0.99),
+    )
+
+
+async def main(args):
+    chat_app.components.register(
+        "embeddings", lambda: EmbeddingService(DeterministicFakeEmbedding(size=384))
+    )
+    checks = []
+    transport = httpx.ASGITransport(app=chat_app.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test", timeout=60
+    ) as client:
+        # Seed a cached answer and the hedging latency window
+        await client.post(
+            "/chat", json={"message": "What is diabetes?", "session_id": "cached"}
+        )
+
+        results = await drive(client, args.requests, args.concurrency, "pool")
+        detail, errors, _ = summary(results)
+        checks.append(
+            report(
+                "no faults, pooled clients",
+                errors == 0
+                and openai_stub.connections <= args.concurrency + 1
+                and pinecone_stub.connections <= args.concurrency + 1,
+                f"{detail}; OpenAI {openai_stub.requests} requests over "
+                f"{openai_stub.connections} connections, Pinecone "
+                f"{pinecone_stub.requests} over {pinecone_stub.connections}",
+            )
+        )
+
+        pinecone_stub.faults.update(slow_rate=0.1, slow_latency=5.0)
+        retriever = await chat_app.components.aget("retriever")
+        hedge_delay = retriever.hedge_delay()
+        hedges_before = RETRIEVAL_HEDGES.value(result="sent")
+        hedged, hedged_errors, hedged_p99 = summary(
+            await drive(client, args.requests, args.concurrency, "hedged")
+        )
+        hedges = RETRIEVAL_HEDGES.value(result="sent") - hedges_before
+
+        hedge_after, min_samples = retriever.hedge_after, retriever.min_samples
+        retriever.hedge_after, retriever.min_samples = 1e9, 10**9
+        unhedged, unhedged_errors, unhedged_p99 = summary(
+            await drive(client, args.requests, args.concurrency, "unhedged")
+        )
+        retriever.hedge_after, retriever.min_samples = hedge_after, min_samples
+        pinecone_stub.faults.update(slow_rate=0.0)
+        checks.append(
+            report(
+                "10% slow Pinecone queries",
+                hedged_p99 < unhedged_p99 and hedged_errors <= unhedged_errors,
+                f"hedged {hedged} ({hedges:.0f} hedges after {hedge_delay * 1000:.0f}ms); "
+                f"unhedged {unhedged}",
+            )
+        )
+
+        openai_stub.faults.update(latency=30.0)
+        start = time.perf_counter()
+        cached = await client.post(
+            "/chat", json={"message": "What is diabetes?", "session_id": "cached"}
+        )
+        cached_s = time.perf_counter() - start
+        start = time.perf_counter()
+        fresh = await client.post(
+            "/chat", json={"message": "What is gout?", "session_id": "stalled"}
+        )
+        fresh_s = time.perf_counter() - start
+        checks.append(
+            report(
+                "stalled GPT-4o, /chat",
+                cached.status_code == 200
+                and cached.json().get("degraded")
+                and fresh.status_code == 503
+                and max(cached_s, fresh_s) < DEADLINE + 0.5,
+                f"known question {cached.status_code} {cached.json().get('degraded')} "
+                f"in {cached_s:.2f}s, new question {fresh.status_code} "
+                f"in {fresh_s:.2f}s (deadline {DEADLINE}s)",
+            )
+        )
+
+        start = time.perf_counter()
+        stream = await client.post(
+            "/chat/stream", json={"message": "What is lupus?", "session_id": "s"}
+        )
+        stream_s = time.perf_counter() - start
+        degraded = '"degraded"' in stream.text and "try again" in stream.text
+        checks.append(
+            report(
+                "stalled GPT-4o, /chat/stream",
+                degraded and stream_s < 2.5,
+                f"try-again reply {'sent' if degraded else 'MISSING'} "
+                f"in {stream_s:.2f}s (first-token deadline 2s)",
+            )
+        )
+        openai_stub.faults.update(latency=0.0)
+
+    return all(checks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    ok = asyncio.run(main(args))
+    openai_stub.stop()
+    pinecone_stub.stop()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,112 @@
+"""
+Check that a session's history follows it across worker processes.
+
+Each turn of every session is handled by a different process (round-robin,
+like requests spread over `uvicorn --workers N`). A worker asserts that it
+sees every earlier turn before appending its own. Also reports the
+history load/append latency that each turn pays.
+
+    python -m benchmarks.session_store_multiprocess --backend sqlite --workers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.session_store import get_session_store
+
+
+def open_store(args):
+    return get_session_store(
+        args.backend,
+        max_sessions=10000,
+        idle_ttl=3600,
+        max_turns=args.turns,
+        max_tokens=1_000_000,
+        sqlite_path=args.path,
+        redis_url=args.redis_url,
+    )
+
+
+def handle_turn(job):
+    args, session_id, turn = job
+    store = _worker_store(args)
+
+    start = time.perf_counter()
+    history = store.get(session_id)
+    messages = history.messages
+    load_ms = (time.perf_counter() - start) * 1000
+
+    expected = [f"question {i}" for i in range(turn)]
+    seen = [m.content for m in messages if m.type == "human"]
+    assert seen == expected, f"pid {os.getpid()} saw {seen} for {session_id}"
+
+    start = time.perf_counter()
+    history.add_messages(
+        [HumanMessage(content=f"question {turn}"), AIMessage(content=f"answer {turn}")]
+    )
+    append_ms = (time.perf_counter() - start) * 1000
+    return os.getpid(), load_ms, append_ms
+
+
+_store = None
+
+
+def _worker_store(args):
+    global _store
+    if _store is None:
+        _store = open_store(args)
+    return _store
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main(args):
+    open_store(args)  # create the schema once before the workers race for it
+    sessions = [f"session-{i}" for i in range(args.sessions)]
+    pids_per_session = {s: set() for s in sessions}
+    load_times, append_times = [], []
+
+    with multiprocessing.Pool(args.workers) as pool:
+        for turn in range(args.turns):
+            # chunksize=1 hands each turn to whichever worker is free, so a
+            # session's turns are spread over several processes
+            jobs = [(args, s, turn) for s in sessions]
+            results = pool.map(handle_turn, jobs, chunksize=1)
+            for session_id, (pid, load_ms, append_ms) in zip(sessions, results):
+                pids_per_session[session_id].add(pid)
+                load_times.append(load_ms)
+                append_times.append(append_ms)
+
+    spread = statistics.mean(len(p) for p in pids_per_session.values())
+    print(f"backend={args.backend} workers={args.workers} sessions={args.sessions}")
+    print(f"history verified on every turn; avg workers per session: {spread:.1f}")
+    print(
+        f"load   p50={percentile(load_times, 50):.3f}ms "
+        f"p99={percentile(load_times, 99):.3f}ms"
+    )
+    print(
+        f"append p50={percentile(append_times, 50):.3f}ms "
+        f"p99={percentile(append_times, 99):.3f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=["sqlite", "redis"], default="sqlite")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument(
+        "--path", default=os.path.join(tempfile.mkdtemp(), "sessions.sqlite3")
+    )
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    main(parser.parse_args())
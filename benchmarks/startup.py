@@ -0,0 +1,135 @@
+"""
+Cold-start cost of the chat app: import time and time-to-first-request.
+
+Runs `python -X importtime -c "import app"` and summarizes where the import
+time goes, then starts uvicorn and polls /healthz to measure when the
+server first answers, when every component is warm, and how long the
+first real request takes. Uses the same environment (.env, VECTOR_STORE,
+APP_WARMUP, ...) the app would.
+
+    python -m benchmarks.startup --top 10
+    python -m benchmarks.startup --warmup lazy --message "What is acne?"
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+
+def import_profile(top):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise SystemExit("import app failed")
+
+    by_package = defaultdict(int)
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        by_package[name.strip().split(".")[0]] += int(self_us)
+        if name.strip() == "app":
+            total_us = int(cumulative_us)
+
+    print(f"import app: {total_us / 1e6:.2f}s (process wall time {wall:.2f}s)")
+    for package, self_us in sorted(by_package.items(), key=lambda x: -x[1])[:top]:
+        print(f"  {package:<28} {self_us / 1e6:6.2f}s")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_startup(args):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "APP_WARMUP": args.warmup}
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    first_response = ready = None
+    health = {}
+    try:
+        with httpx.Client(timeout=5) as client:
+            while time.perf_counter() - start < args.timeout:
+                try:
+                    response = client.get(f"{base}/healthz")
+                except httpx.TransportError:
+                    time.sleep(0.02)
+                    continue
+                now = time.perf_counter() - start
+                first_response = first_response or now
+                health = response.json()
+                if response.status_code == 200 or args.warmup == "lazy":
+                    ready = now if response.status_code == 200 else None
+                    break
+                if health["status"] == "failed":
+                    break
+                time.sleep(0.05)
+
+            if first_response is None:
+                raise SystemExit(f"server did not answer within {args.timeout}s")
+            print(f"first /healthz response: {first_response:.2f}s after launch")
+            if ready is not None:
+                print(f"all components warm:     {ready:.2f}s after launch")
+            else:
+                print(f"not ready ({health.get('status')}):")
+            for name, status in health["components"].items():
+                print(f"  {name:<14} {status}")
+
+            request_start = time.perf_counter()
+            if args.message:
+                response = client.post(
+                    f"{base}/chat",
+                    json={"message": args.message, "session_id": "startup-bench"},
+                    timeout=args.timeout,
+                )
+            else:
+                response = client.get(f"{base}/chat")
+            elapsed = time.perf_counter() - request_start
+            print(
+                f"first request: {elapsed * 1000:.0f}ms "
+                f"(HTTP {response.status_code}, "
+                f"{time.perf_counter() - start:.2f}s after launch)"
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(args):
+    import_profile(args.top)
+    print()
+    server_startup(args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top", type=int, default=10, help="packages to list")
+    parser.add_argument(
+        "--warmup", default="background", choices=["background", "eager", "lazy"]
+    )
+    parser.add_argument(
+        "--message", help="POST this to /chat as the first request (needs API keys)"
+    )
+    parser.add_argument("--timeout", type=float, default=120)
+    main(parser.parse_args())
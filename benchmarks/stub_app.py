@@ -0,0 +1,58 @@
+"""
+The chat app with OpenAI, Pinecone and MiniLM replaced by local stubs.
+
+Everything else (limiter, caches, sessions, coalescing, context packing,
+metrics) is the real code path. Stub behaviour is set with environment
+variables so the app can be served by uvicorn:
+
+    STUB_LLM_LATENCY=0.3 STUB_LLM_TOKENS_PER_SEC=50 STUB_VECTOR_LATENCY=0.05 \\
+        uvicorn benchmarks.stub_app:app --port 8001
+"""
+
+import os
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import app as chat_app
+from benchmarks.stubs import StubChatModel, StubVectorStore
+from src.config import MODEL_TIERING_ENABLED
+from src.embeddings import EmbeddingService
+from src.tiering import MAIN_TIER, ModelRouter
+
+STUB_LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0.3"))
+STUB_LLM_TOKENS_PER_SEC = float(os.getenv("STUB_LLM_TOKENS_PER_SEC", "50"))
+STUB_VECTOR_LATENCY = float(os.getenv("STUB_VECTOR_LATENCY", "0.05"))
+
+components = chat_app.components
+components.register(
+    "embeddings", lambda: EmbeddingService(DeterministicFakeEmbedding(size=384))
+)
+components.register(
+    "vector_store",
+    lambda: StubVectorStore(components.get("embeddings"), latency=STUB_VECTOR_LATENCY),
+)
+components.register(
+    "llm",
+    lambda: StubChatModel(
+        latency=STUB_LLM_LATENCY, tokens_per_sec=STUB_LLM_TOKENS_PER_SEC or None
+    ),
+)
+
+
+def build_stub_model_router():
+    # The config's tiers, with a stub "fast" model twice as quick as the main one
+    if not MODEL_TIERING_ENABLED:
+        return None
+    llms = {MAIN_TIER: components.get("llm")}
+    for tier in chat_app.configured_model_tiers():
+        if tier.name != MAIN_TIER:
+            llms[tier.name] = StubChatModel(
+                latency=STUB_LLM_LATENCY / 2,
+                tokens_per_sec=2 * STUB_LLM_TOKENS_PER_SEC or None,
+            )
+    return ModelRouter(chat_app.configured_model_tiers(), llms)
+
+
+components.register("model_router", build_stub_model_router)
+
+app = chat_app.app
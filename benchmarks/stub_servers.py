@@ -0,0 +1,147 @@
+"""
+Local HTTP stand-ins for the OpenAI chat completions and Pinecone query APIs.
+
+Unlike benchmarks/stubs.py, these are real servers, so the real ChatOpenAI
+and Pinecone clients (connection pools, timeouts, retries) are exercised.
+Each server injects latency from its `faults` settings, which can be
+changed while it runs, and counts the TCP connections clients opened.
+"""
+
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.stubs import STUB_REPLY
+
+
+class StubServer:
+    """A FastAPI app served by uvicorn on a free local port in a thread."""
+
+    def __init__(self, app: FastAPI):
+        self.app = app
+        self.faults = {"latency": 0.0, "slow_rate": 0.0, "slow_latency": 0.0}
+        self.requests = 0
+        self._peers = set()
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(
+            uvicorn.Config(app, port=self.port, log_level="warning")
+        )
+
+    @property
+    def connections(self) -> int:
+        return len(self._peers)
+
+    async def delay(self, request: Request):
+        self.requests += 1
+        self._peers.add(request.client.port)
+        latency = self.faults["latency"]
+        if random.random() < self.faults["slow_rate"]:
+            latency = self.faults["slow_latency"]
+        await asyncio.sleep(latency)
+
+    def start(self):
+        threading.Thread(target=self._server.run, daemon=True).start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+
+
+def openai_server() -> StubServer:
+    app = FastAPI()
+    server = StubServer(app)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await server.delay(request)
+        usage = {"prompt_tokens": 500, "completion_tokens": 30, "total_tokens": 530}
+        base = {
+            "id": "chatcmpl-stub",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+        }
+        if not body.get("stream"):
+            return JSONResponse(
+                {
+                    **base,
+                    "object": "chat.completion",
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": STUB_REPLY},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        async def chunks():
+            words = STUB_REPLY.split(" ")
+            for i, word in enumerate(words):
+                delta = {"content": word if i == 0 else " " + word}
+                if i == 0:
+                    delta["role"] = "assistant"
+                chunk = {
+                    **base,
+                    "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            done = {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            if body.get("stream_options", {}).get("include_usage"):
+                final = {**base, "object": "chat.completion.chunk", "choices": []}
+                yield f"data: {json.dumps({**final, 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return server
+
+
+def pinecone_server() -> StubServer:
+    app = FastAPI()
+    server = StubServer(app)
+
+    @app.post("/query")
+    async def query(request: Request):
+        body = await request.json()
+        await server.delay(request)
+        return JSONResponse(
+            {
+                "matches": [
+                    {
+                        "id": f"chunk-{i}",
+                        "score": 0.9 - i * 0.05,
+                        "values": [],
+                        "metadata": {
+                            "text": f"Stub chunk {i} about diabetes and blood sugar.",
+                            "source": "medical_book.pdf",
+                        },
+                    }
+                    for i in range(body.get("topK", 3))
+                ],
+                "namespace": body.get("namespace", ""),
+                "usage": {"readUnits": 1},
+            }
+        )
+
+    return server
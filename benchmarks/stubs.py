@@ -0,0 +1,246 @@
+"""
+Local stand-ins for the retriever and chat model used by the benchmarks.
+
+They mimic the latency profile of Pinecone and GPT-4o without any network
+access, so the request path can be measured deterministically.
+"""
+
+import asyncio
+import random
+import threading
+import time
+import typing
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+STUB_REPLY = (
+    "Diabetes is a long-term condition where the body has trouble controlling "
+    "blood sugar. In simple terms, sugar builds up in the blood instead of "
+    "being used for energy."
+)
+
+
+class StubRetriever(BaseRetriever):
+    """Sync-only retriever, like the Pinecone client, with a fixed delay."""
+
+    latency: float = 0.05
+    k: int = 3
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> typing.List[Document]:
+        time.sleep(self.latency)
+        return [
+            Document(
+                page_content=f"Stub chunk {i} about {query}",
+                metadata={"source": "medical_book.pdf"},
+            )
+            for i in range(self.k)
+        ]
+
+
+class StubVectorStore(VectorStore):
+    """
+    Vector store that embeds the query, then waits `latency` seconds like a
+    Pinecone query and returns `k` deterministic chunks about it.
+    """
+
+    def __init__(self, embedding: Embeddings, latency: float = 0.05):
+        self.embedding = embedding
+        self.latency = latency
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def _results(self, query: str, k: int) -> typing.List[Document]:
+        return [
+            Document(
+                page_content=f"Stub chunk {i} about {query}. " * 20,
+                metadata={"source": "medical_book.pdf", "page": i},
+            )
+            for i in range(k)
+        ]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs):
+        self.embedding.embed_query(query)
+        time.sleep(self.latency)
+        return self._results(query, k)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs):
+        await self.embedding.aembed_query(query)
+        await asyncio.sleep(self.latency)
+        return self._results(query, k)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        documents = self.similarity_search(query, k)
+        return [(doc, 0.8 - 0.05 * i) for i, doc in enumerate(documents)]
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        documents = await self.asimilarity_search(query, k)
+        return [(doc, 0.8 - 0.05 * i) for i, doc in enumerate(documents)]
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError("StubVectorStore is read-only")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        return cls(embedding)
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Chat model that answers with a canned reply after a fixed delay.
+
+    With `tokens_per_sec` set, the reply's words are generated at that rate
+    after the first one, whether streamed or not; otherwise the whole reply
+    arrives after `latency`.
+    """
+
+    latency: float = 0.2
+    reply: str = STUB_REPLY
+    tokens_per_sec: typing.Optional[float] = None
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def _generate(
+        self,
+        messages: typing.List[BaseMessage],
+        stop=None,
+        run_manager=None,
+        **kwargs,
+    ) -> ChatResult:
+        self.calls += 1
+        time.sleep(self.latency + self._generation_time())
+        message = AIMessage(self.reply, usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: typing.List[BaseMessage],
+        stop=None,
+        run_manager=None,
+        **kwargs,
+    ) -> ChatResult:
+        self.calls += 1
+        await asyncio.sleep(self.latency + self._generation_time())
+        message = AIMessage(self.reply, usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generation_time(self) -> float:
+        if not self.tokens_per_sec:
+            return 0.0
+        return (len(self._tokens()) - 1) / self.tokens_per_sec
+
+    def _tokens(self):
+        words = self.reply.split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    def _usage(self, messages):
+        prompt = sum(len(str(m.content)) for m in messages) // 4
+        completion = len(self._tokens())
+        return {
+            "input_tokens": prompt,
+            "output_tokens": completion,
+            "total_tokens": prompt + completion,
+        }
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        tokens = self._tokens()
+        for i, token in enumerate(tokens):
+            if i and self.tokens_per_sec:
+                time.sleep(1 / self.tokens_per_sec)
+            usage = self._usage(messages) if i == len(tokens) - 1 else None
+            chunk = ChatGenerationChunk(
+                message=AIMessageChunk(content=token, usage_metadata=usage)
+            )
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        tokens = self._tokens()
+        for i, token in enumerate(tokens):
+            if i and self.tokens_per_sec:
+                await asyncio.sleep(1 / self.tokens_per_sec)
+            usage = self._usage(messages) if i == len(tokens) - 1 else None
+            chunk = ChatGenerationChunk(
+                message=AIMessageChunk(content=token, usage_metadata=usage)
+            )
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class StubChatMessageHistory(BaseChatMessageHistory):
+    """Session history where every read and write costs a Redis-like round trip."""
+
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self._messages = []
+
+    @property
+    def messages(self) -> typing.List[BaseMessage]:
+        time.sleep(self.latency)
+        return list(self._messages)
+
+    def add_messages(self, messages: typing.Sequence[BaseMessage]) -> None:
+        time.sleep(self.latency)
+        self._messages.extend(messages)
+
+    def clear(self) -> None:
+        self._messages = []
+
+
+class StubVectorIndex:
+    """
+    In-memory stand-in for a Pinecone index used as an ingestion sink.
+
+    Every call sleeps for `latency` seconds and upserts fail with probability
+    `failure_rate`, to exercise the retry path.
+    """
+
+    def __init__(self, latency: float = 0.02, failure_rate: float = 0.0, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.vectors = {}
+        self.upsert_calls = 0
+        self.existing_ids_calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def existing_ids(self, ids):
+        time.sleep(self.latency)
+        with self._lock:
+            self.existing_ids_calls += 1
+            return {i for i in ids if i in self.vectors}
+
+    def upsert(self, ids, vectors, documents):
+        time.sleep(self.latency)
+        with self._lock:
+            self.upsert_calls += 1
+            if self._random.random() < self.failure_rate:
+                raise ConnectionError("stub index: injected upsert failure")
+            for vector_id, vector, doc in zip(ids, vectors, documents):
+                self.vectors[vector_id] = (vector, doc)
+
+    def delete(self, ids):
+        time.sleep(self.latency)
+        with self._lock:
+            for vector_id in ids:
+                self.vectors.pop(vector_id, None)
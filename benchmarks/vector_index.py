@@ -0,0 +1,92 @@
+"""
+Recall@k and latency of the local vector index against exact brute force.
+
+Builds a synthetic clustered corpus (or uses an index built by
+store_index.py via --index-dir), then queries the memory-mapped exact scan
+and the HNSW graph and compares them with the brute-force top-k.
+
+    python -m benchmarks.vector_index --chunks 20000 --queries 500 --k 3
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from langchain.schema import Document
+
+from src.vector_store import LocalVectorStore
+
+
+def synthetic_corpus(n, dim, clusters, rng):
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, n)] + 0.3 * rng.normal(size=(n, dim))
+    vectors = vectors.astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    documents = [Document(page_content=f"chunk {i}", metadata={}) for i in range(n)]
+    return vectors, documents
+
+
+def brute_force(vectors, query, k):
+    return set(np.argsort(-(vectors @ query))[:k].tolist())
+
+
+def measure(store, queries, truth, k):
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        indices, _ = store.search_by_vector(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected & set(indices.tolist()))
+    latencies.sort()
+    return (
+        hits / (k * len(queries)),
+        statistics.median(latencies),
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    )
+
+
+def main(args):
+    rng = np.random.default_rng(args.seed)
+    index_dir = args.index_dir
+    if index_dir is None:
+        index_dir = tempfile.mkdtemp()
+        vectors, documents = synthetic_corpus(args.chunks, args.dim, 64, rng)
+        LocalVectorStore(None, vectors, documents).save(index_dir, hnsw=True)
+
+    exact = LocalVectorStore.load(index_dir, None)
+    vectors = np.asarray(exact.vectors)
+    # Queries are perturbed copies of corpus chunks, like paraphrased questions
+    picks = rng.integers(0, len(vectors), args.queries)
+    queries = vectors[picks] + 0.2 * rng.normal(size=(args.queries, vectors.shape[1]))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(
+        np.float32
+    )
+    truth = [brute_force(vectors, q, args.k) for q in queries]
+
+    print(
+        f"chunks={len(vectors)} dim={vectors.shape[1]} queries={args.queries} k={args.k}"
+    )
+    print(f"{'index':>12} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    recall, p50, p99 = measure(exact, queries, truth, args.k)
+    print(f"{'exact/mmap':>12} {recall:>9.3f} {p50:>8.3f} {p99:>8.3f}")
+
+    if os.path.exists(os.path.join(index_dir, "hnsw.bin")):
+        for ef in args.ef:
+            hnsw = LocalVectorStore.load(index_dir, None, use_hnsw=True, ef=ef)
+            recall, p50, p99 = measure(hnsw, queries, truth, args.k)
+            print(f"{f'hnsw ef={ef}':>12} {recall:>9.3f} {p50:>8.3f} {p99:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--index-dir", help="existing local index to benchmark")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 64, 128])
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
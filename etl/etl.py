@@ -1,79 +1,239 @@
+import argparse
 import os
+import shutil
 import tempfile
+import time
 import typing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 import boto3
+import pypdf
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
+from src.bm25 import BM25_INDEX_KEY, BM25Index
+from src.chunk_format import COMPACT_DOCUMENT_KEY, LEGACY_DOCUMENT_KEY, write_chunks
 from src.config import (
+    ETL_OUTPUT_FORMAT,
+    ETL_PAGES_PER_SHARD,
+    ETL_WORKERS,
     S3_BUCKET_NAME,
 )
 from src.logger import setup_logger
 
-from etl.load import inject_data_to_s3
+from etl.load import (
+    TRANSFER_CONFIG,
+    inject_data_to_s3,
+    iter_pdf_pages,
+    upload_file_to_s3,
+)
 
 logger = setup_logger(__name__)
 
 s3 = boto3.client("s3")
 
 
+def download_pdf_from_s3(Bucket, s3_key, dest_path):
+    # boto3's managed (multipart) download streams the object to disk
+    s3.download_file(Bucket, s3_key, dest_path, Config=TRANSFER_CONFIG)
+
+
 def get_object_from_s3(Bucket, s3_key):
-    try:
-        response = s3.get_object(Bucket=Bucket, Key=s3_key)
-        pdf_bytes = response["Body"].read()
+    """
+    Download a PDF from S3 to a temporary file and parse it lazily.
 
+    The object is streamed to disk rather than read into memory. Returns an
+    iterator over the pages that removes the temporary file once exhausted,
+    or None on failure.
+    """
+    temp_file_path = None
+    try:
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            temp_file.write(pdf_bytes)
             temp_file_path = temp_file.name
+        download_pdf_from_s3(Bucket, s3_key, temp_file_path)
         logger.info(f"Temporary file created at {temp_file_path}")
-        loader = PyPDFLoader(temp_file_path)
-        document = loader.load()
 
     except Exception as e:
         logger.error(f"Error downloading {s3_key} from s3 bucket {Bucket}: {e}")
+        if temp_file_path and os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
         return None
 
-    finally:
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-            logger.info(f"Temporary {temp_file_path} removed")
+    return iter_pdf_pages(
+        temp_file_path, source=os.path.basename(s3_key), remove_when_done=True
+    )
+
+
+def list_pdf_keys(Bucket, prefix):
+    paginator = s3.get_paginator("list_objects_v2")
+    keys = []
+    for page in paginator.paginate(Bucket=Bucket, Prefix=prefix):
+        keys.extend(
+            obj["Key"]
+            for obj in page.get("Contents", [])
+            if obj["Key"].lower().endswith(".pdf")
+        )
+    return sorted(keys)
+
+
+def extract_page_range(job):
+    """
+    Extract and split pages [start, end) of one PDF; runs in a worker process.
+
+    Pages are parsed and split one at a time, so a worker holds one page of
+    text plus its shard's chunks. Chunk IDs are positional
+    ("<source>:p<page>:c<n>"), so they do not depend on how the pages were
+    sharded across workers.
+    """
+    pdf_path, source, start, end = job
+    began = time.perf_counter()
+    pages = iter_pdf_pages(pdf_path, source=source, start=start, end=end)
+    chunks = []
+    per_page = defaultdict(int)
+    for chunk in split_docs(pages):
+        page_number = chunk.metadata["page"]
+        chunk.metadata["chunk_id"] = f"{source}:p{page_number}:c{per_page[page_number]}"
+        per_page[page_number] += 1
+        chunks.append(chunk)
+
+    return source, start, chunks, end - start, time.perf_counter() - began, os.getpid()
+
+
+def parallel_extract(pdfs, workers=None, pages_per_shard=25):
+    """
+    Shard the pages of several PDFs across a process pool.
+
+    Args:
+        pdfs: List of (local pdf path, source name) pairs, in output order
+        workers: Number of worker processes (defaults to the CPU count)
+        pages_per_shard: Pages handed to a worker per task
+
+    Returns:
+        list[Document]: Chunks of every PDF, ordered by PDF, page and position
+    """
+    jobs = []
+    order = {}
+    for i, (pdf_path, source) in enumerate(pdfs):
+        order[source] = i
+        total_pages = len(pypdf.PdfReader(pdf_path).pages)
+        logger.info(f"{source}: {total_pages} pages")
+        for start in range(0, total_pages, pages_per_shard):
+            jobs.append(
+                (pdf_path, source, start, min(start + pages_per_shard, total_pages))
+            )
+
+    began = time.perf_counter()
+    results = []
+    pages_per_worker = defaultdict(int)
+    seconds_per_worker = defaultdict(float)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for source, start, chunks, pages, seconds, pid in pool.map(
+            extract_page_range, jobs
+        ):
+            results.append((order[source], start, chunks))
+            pages_per_worker[pid] += pages
+            seconds_per_worker[pid] += seconds
+
+    elapsed = time.perf_counter() - began
+    total_pages = sum(pages_per_worker.values())
+    for pid, pages in sorted(pages_per_worker.items()):
+        logger.info(
+            f"Worker {pid}: {pages} pages at "
+            f"{pages / seconds_per_worker[pid]:.1f} pages/sec"
+        )
+    logger.info(
+        f"Extracted {total_pages} pages from {len(pdfs)} PDFs in {elapsed:.1f}s "
+        f"({total_pages / elapsed:.1f} pages/sec overall)"
+    )
 
-    return document
+    results.sort(key=lambda result: (result[0], result[1]))
+    return [chunk for _, _, chunks in results for chunk in chunks]
 
 
 def process_relevant_doc(docs: list[Document]) -> typing.List[Document]:
     relevant_docs = []
     for doc in docs:
-        doc.metadata.get("source")
-        relevant_docs.append(
-            Document(
-                page_content=doc.page_content, metadata={"source": "medical_book.pdf"}
-            )
-        )
+        metadata = {"source": doc.metadata.get("source", "medical_book.pdf")}
+        for key in ("page", "chunk_id"):
+            if key in doc.metadata:
+                metadata[key] = doc.metadata[key]
+        relevant_docs.append(Document(page_content=doc.page_content, metadata=metadata))
 
     return relevant_docs
 
 
 def split_docs(clean_pdf):
+    """Split pages into chunks lazily; accepts any iterable of page Documents."""
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=50,
     )
-    split_documents = text_splitter.split_documents(clean_pdf)
-    return split_documents
+    for page in clean_pdf:
+        yield from text_splitter.split_documents([page])
+
+
+def upload_compact_chunks(Bucket, documents, with_embeddings=False):
+    """Write chunks as processed_document.jsonl.gz and upload it to S3 (doc/)."""
+    vectors = None
+    if with_embeddings:
+        from src.helper import get_embeddings
+
+        logger.info("Precomputing chunk embeddings...")
+        vectors = get_embeddings().embed_documents([d.page_content for d in documents])
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".jsonl.gz") as temp_file:
+        temp_path = temp_file.name
+    try:
+        count = write_chunks(temp_path, documents, vectors)
+        logger.info(
+            f"Compact chunk file: {count} chunks, {os.path.getsize(temp_path)} bytes"
+        )
+        return upload_file_to_s3(
+            Bucket,
+            COMPACT_DOCUMENT_KEY,
+            temp_path,
+            content_type="application/gzip",
+        )
+    finally:
+        os.remove(temp_path)
+
 
+def upload_bm25_index(Bucket, documents):
+    """Build the keyword index for hybrid retrieval from the same chunks."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".json.gz") as temp_file:
+        temp_path = temp_file.name
+    try:
+        BM25Index.build(documents).save(temp_path)
+        return upload_file_to_s3(
+            Bucket, BM25_INDEX_KEY, temp_path, content_type="application/gzip"
+        )
+    finally:
+        os.remove(temp_path)
 
-def main():
+
+def main(s3_keys=None, prefix=None, workers=None, with_embeddings=False):
+    temp_dir = None
     try:
         logger.info("Starting transformation process...")
         Bucket = S3_BUCKET_NAME
-        s3_key = "data/medical_book.pdf"
-        document = get_object_from_s3(Bucket, s3_key)
-        if document is None:
-            return logger.error("Failed to retrieve document from S3.")
+        if prefix:
+            s3_keys = list_pdf_keys(Bucket, prefix)
+        s3_keys = s3_keys or ["data/medical_book.pdf"]
+        logger.info(f"PDFs to process: {s3_keys}")
+
+        temp_dir = tempfile.mkdtemp()
+        pdfs = []
+        for s3_key in s3_keys:
+            source = os.path.basename(s3_key)
+            pdf_path = os.path.join(temp_dir, f"{len(pdfs)}-{source}")
+            download_pdf_from_s3(Bucket, s3_key, pdf_path)
+            pdfs.append((pdf_path, source))
 
-        document_chunks = split_docs(document)
+        document_chunks = parallel_extract(
+            pdfs, workers=workers or ETL_WORKERS, pages_per_shard=ETL_PAGES_PER_SHARD
+        )
+        if not document_chunks:
+            return logger.error("No document chunks extracted from S3 PDFs.")
         logger.info(document_chunks[0])
         logger.info(f"Total document chunks after splitting: {len(document_chunks)}")
 
@@ -82,16 +242,38 @@ def main():
 
         logger.info(f"Total relevant documents processed: {len(relevant_docs)}")
 
-        inject_data_to_s3(
-            Bucket,
-            s3_key="processed_document.json",
-            file_type="application/json",
-            json_data=relevant_docs,
-        )
+        if ETL_OUTPUT_FORMAT == "json":
+            inject_data_to_s3(
+                Bucket,
+                s3_key=LEGACY_DOCUMENT_KEY,
+                file_type="application/json",
+                json_data=relevant_docs,
+            )
+        else:
+            upload_compact_chunks(Bucket, relevant_docs, with_embeddings)
+        upload_bm25_index(Bucket, relevant_docs)
         logger.info("Transformation process completed successfully...")
     except Exception as e:
         logger.error(f"Transformation process failed: {e}")
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Split PDFs into document chunks")
+    parser.add_argument("--keys", nargs="+", help="S3 keys of the PDFs to process")
+    parser.add_argument("--prefix", help="process every PDF under this S3 prefix")
+    parser.add_argument("--workers", type=int, help="worker processes")
+    parser.add_argument(
+        "--with-embeddings",
+        action="store_true",
+        help="store precomputed vectors in the compact chunk file",
+    )
+    args = parser.parse_args()
+    main(
+        s3_keys=args.keys,
+        prefix=args.prefix,
+        workers=args.workers,
+        with_embeddings=args.with_embeddings,
+    )
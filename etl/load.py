@@ -1,11 +1,12 @@
-from io import BytesIO
+import itertools
 import os
 import tempfile
 import json
 import boto3
+import pypdf
 import requests
+from boto3.s3.transfer import TransferConfig
 from langchain.schema import Document
-from langchain_community.document_loaders import PyPDFLoader
 from src.config import (
     S3_BUCKET_NAME,
     URL,
@@ -19,66 +20,122 @@ Bucket = S3_BUCKET_NAME
 s3_key = "data/medical_book.pdf"
 
 
-def get_pdf_file(URL):
-    temp_path = None
-    try:
-        logger.info("Extracting PDF file from URL....")
-        response = requests.get(URL, headers={"User-Agent": USER_AGENT})
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Multipart upload straight from disk; only a few parts are in memory at once
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+)
+
+
+def download_pdf(URL, dest_path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """Stream a PDF from URL to dest_path in fixed-size chunks; returns bytes written."""
+    file_size = 0
+    with requests.get(
+        URL, headers={"User-Agent": USER_AGENT}, stream=True, timeout=60
+    ) as response:
         response.raise_for_status()
 
         # Validate response
         content_type = response.headers.get("Content-Type", "").lower()
-        file_size = len(response.content)
         logger.info(f"Response Content-Type: {content_type}")
-        # logger.info(f"File size: {file_size} bytes")
 
-        if not file_size:
-            raise ValueError("Downloaded file is empty.")
+        with open(dest_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if not chunk:
+                    continue
+                # Check if it's a PDF by examining the file header (magic bytes)
+                # PDF files start with %PDF
+                if file_size == 0 and not chunk.startswith(b"%PDF"):
+                    raise ValueError("URL did not return a valid PDF file.")
+                f.write(chunk)
+                file_size += len(chunk)
+
+    if not file_size:
+        raise ValueError("Downloaded file is empty.")
+    logger.info(f"File size: {file_size} bytes ({file_size / (1024*1024):.2f} MB)")
+    return file_size
+
+
+def iter_pdf_pages(pdf_path, source=None, remove_when_done=False, start=0, end=None):
+    """
+    Parse a PDF on disk one page at a time.
+
+    Yields one Document per page of [start, end) (the whole PDF by default),
+    so callers can split and discard pages as they go instead of holding
+    the whole book in memory. If `remove_when_done` is set, the file is
+    deleted once iteration finishes.
+    """
+    try:
+        reader = pypdf.PdfReader(pdf_path)
+        end = len(reader.pages) if end is None else end
+        for page_number in range(start, end):
+            text = reader.pages[page_number].extract_text(extraction_mode="plain")
+            yield Document(
+                page_content=text.strip(),
+                metadata={"source": source or pdf_path, "page": page_number},
+            )
+    finally:
+        if remove_when_done and os.path.exists(pdf_path):
+            os.remove(pdf_path)
+            logger.info(f"Temporary {pdf_path} removed")
+
 
-        # Check if it's a PDF by examining the file header (magic bytes)
-        # PDF files start with %PDF
-        if not response.content.startswith(b"%PDF"):
-            raise ValueError("URL did not return a valid PDF file.")
+def get_pdf_file(URL):
+    """
+    Download the PDF at URL to a temporary file without buffering it in memory.
 
-        # Save to a temporary file
+    Returns:
+        tuple: (path of the downloaded PDF, lazy iterator over its pages).
+            The caller owns the file and should remove it when done.
+    """
+    temp_path = None
+    try:
+        logger.info("Extracting PDF file from URL....")
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp:
-            temp.write(response.content)
-            temp.flush()
             temp_path = temp.name
+        download_pdf(URL, temp_path)
 
-        # Check if file was written correctly
-        if os.path.getsize(temp_path) == 0:
-            raise ValueError("Temporary file is empty after writing.")
-
-        # Load using LangChain
-        py_loader = PyPDFLoader(temp_path)
-        docs = py_loader.load()
-
-        # Update metadata
         file_name = URL.split("/")[-1] or "medical_book.pdf"
-        for d in docs:
-            d.metadata["source"] = file_name
-
-        # Return BytesIO for S3 upload
-        content = BytesIO(response.content)
+        docs = iter_pdf_pages(temp_path, source=file_name)
 
         logger.info("PDF file extracted successfully.")
-        return content, docs
+        return temp_path, docs
 
     except Exception as e:
         logger.error(f"Error extracting the PDF file: {e}")
-        raise
-
-    finally:
         if temp_path and os.path.exists(temp_path):
             os.remove(temp_path)
-            # logger.info(f"Temporary file {temp_path} removed.")
+        raise
+
+
+def upload_file_to_s3(Bucket, s3_key, file_path, content_type="application/pdf"):
+    try:
+        s3 = boto3.client("s3")
+        file_size = os.path.getsize(file_path)
+        logger.info(
+            f"Uploading {file_size} bytes ({file_size / (1024*1024):.2f} MB) to S3..."
+        )
+        s3.upload_file(
+            file_path,
+            Bucket,
+            s3_key,
+            ExtraArgs={"ContentType": content_type},
+            Config=TRANSFER_CONFIG,
+        )
+        return True
+
+    except Exception as e:
+        logger.error(f"Error uploading file to S3: {e}")
+        return False
 
 
 #
 
 
-def inject_data_to_s3(Bucket, s3_key, file_obj, file_type, json_data=None):
+def inject_data_to_s3(Bucket, s3_key, file_obj=None, file_type=None, json_data=None):
     data = None
     try:
         s3 = boto3.client("s3")
@@ -142,23 +199,19 @@ def inject_data_to_s3(Bucket, s3_key, file_obj, file_type, json_data=None):
 
 
 def main():
+    pdf_path = None
     try:
         logger.info("data extraction process started....")
-        pdf_file, docs = get_pdf_file(URL)
+        pdf_path, docs = get_pdf_file(URL)
 
-        for c, doc in enumerate(docs[:2], start=1):
+        for c, doc in enumerate(itertools.islice(docs, 2), start=1):
             logger.info(f"\n --- SAMPLE PAGE {c} ---")
             logger.info(f"Metadata: {doc.metadata}")
             logger.info(f"Content: {doc.page_content[:500]}...")
+        docs.close()
 
         logger.info("Starting S3 upload...")
-        # Pass pdf_file as the file_obj parameter
-        success = inject_data_to_s3(
-            Bucket=Bucket,
-            s3_key=s3_key,
-            file_obj=pdf_file,  # ← Add this parameter
-            file_type="application/pdf",
-        )
+        success = upload_file_to_s3(Bucket=Bucket, s3_key=s3_key, file_path=pdf_path)
 
         if success:
             logger.info(f"File uploaded successfully to S3 bucket {Bucket}")
@@ -172,6 +225,10 @@ def main():
 
         logger.error(f"Traceback: {traceback.format_exc()}")
 
+    finally:
+        if pdf_path and os.path.exists(pdf_path):
+            os.remove(pdf_path)
+
 
 if __name__ == "__main__":
     main()
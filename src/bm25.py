@@ -0,0 +1,175 @@
+import asyncio
+import gzip
+import json
+import math
+import re
+import typing
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+from src.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Where the ETL uploads the index in S3 and where the app downloads it from
+BM25_INDEX_KEY = "doc/bm25_index.json.gz"
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its "
+    "me my of on or so than that the their them there these this to was what "
+    "when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> typing.List[str]:
+    # Keep digits and hyphenated names together ("covid-19", "beta-blocker")
+    return [
+        t
+        for t in re.findall(r"[a-z0-9]+(?:-[a-z0-9]+)*", text.lower())
+        if t not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """
+    Inverted BM25 index over document chunks.
+
+    The BM25 weight of every (term, chunk) posting is computed at build time,
+    so a query only sums precomputed weights over the postings of its terms.
+    """
+
+    def __init__(self, documents: typing.List[Document], postings: dict):
+        self.documents = documents
+        self.postings = postings  # term -> (chunk indices, weights)
+
+    @classmethod
+    def build(
+        cls, documents: typing.List[Document], k1: float = 1.5, b: float = 0.75
+    ) -> "BM25Index":
+        term_counts = [Counter(tokenize(doc.page_content)) for doc in documents]
+        lengths = np.array([sum(c.values()) for c in term_counts], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(lengths) else 0.0
+
+        raw = defaultdict(list)
+        for i, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                raw[term].append((i, tf))
+
+        n = len(documents)
+        postings = {}
+        for term, entries in raw.items():
+            idf = math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            ids = np.array([i for i, _ in entries], dtype=np.int32)
+            tfs = np.array([tf for _, tf in entries], dtype=np.float32)
+            norm = k1 * (1 - b + b * lengths[ids] / (avg_length or 1.0))
+            postings[term] = (
+                ids,
+                (idf * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32),
+            )
+
+        logger.info(f"Built BM25 index: {n} chunks, {len(postings)} terms")
+        return cls(list(documents), postings)
+
+    def search(self, query: str, k: int = 10):
+        """Return [(chunk index, score)] for the k best-scoring chunks."""
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+                matched = True
+        if not matched:
+            return []
+
+        k = min(k, len(self.documents))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+    def save(self, path: str):
+        data = {
+            "documents": [
+                {"page_content": d.page_content, "metadata": d.metadata}
+                for d in self.documents
+            ],
+            "postings": {
+                term: [ids.tolist(), [round(float(w), 4) for w in weights]]
+                for term, (ids, weights) in self.postings.items()
+            },
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        documents = [
+            Document(page_content=d["page_content"], metadata=d["metadata"])
+            for d in data["documents"]
+        ]
+        postings = {
+            term: (np.array(ids, dtype=np.int32), np.array(weights, dtype=np.float32))
+            for term, (ids, weights) in data["postings"].items()
+        }
+        logger.info(f"Loaded BM25 index with {len(documents)} chunks from {path}")
+        return cls(documents, postings)
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: typing.List[typing.List[Document]], k: int, rrf_k: int = 60
+) -> typing.List[Document]:
+    """Merge ranked result lists; a chunk scores sum(1 / (rrf_k + rank))."""
+    scores = defaultdict(float)
+    by_key = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = doc.page_content
+            scores[key] += 1.0 / (rrf_k + rank)
+            by_key.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [by_key[key] for key in best]
+
+
+class HybridRetriever(BaseRetriever):
+    """Vector search and BM25 run concurrently, fused with reciprocal-rank fusion."""
+
+    vector_retriever: BaseRetriever
+    bm25_index: typing.Any
+    k: int = 3
+    candidates: int = 10
+    rrf_k: int = 60
+
+    def _bm25_documents(self, query: str) -> typing.List[Document]:
+        return [
+            self.bm25_index.documents[i]
+            for i, _ in self.bm25_index.search(query, self.candidates)
+        ]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> typing.List[Document]:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            keyword = pool.submit(self._bm25_documents, query)
+            vector = self.vector_retriever.invoke(
+                query, config={"callbacks": run_manager.get_child()}
+            )
+            return reciprocal_rank_fusion(
+                [vector, keyword.result()], self.k, self.rrf_k
+            )
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager):
+        loop = asyncio.get_running_loop()
+        vector, keyword = await asyncio.gather(
+            self.vector_retriever.ainvoke(
+                query, config={"callbacks": run_manager.get_child()}
+            ),
+            loop.run_in_executor(None, self._bm25_documents, query),
+        )
+        return reciprocal_rank_fusion([vector, keyword], self.k, self.rrf_k)
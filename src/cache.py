@@ -0,0 +1,258 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+import numpy as np
+
+from src.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class InMemoryCacheBackend:
+    """LRU-ordered cache entries with a lazily rebuilt embedding matrix."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (vector, question, answer, created)
+        self._matrix = None
+        self._keys = []
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def _rebuild(self):
+        self._keys = list(self._entries)
+        self._matrix = (
+            np.stack([self._entries[k][0] for k in self._keys]) if self._keys else None
+        )
+
+    def search(self, vector: np.ndarray, threshold: float, ttl: float):
+        with self._lock:
+            self._expire(ttl)
+            if self._matrix is None:
+                self._rebuild()
+            if self._matrix is None:
+                return None
+
+            scores = self._matrix @ vector
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < threshold:
+                return None
+
+            key = self._keys[best]
+            self._entries.move_to_end(key)
+            return self._entries[key][2], score
+
+    def put(self, vector: np.ndarray, question: str, answer: str):
+        with self._lock:
+            self._entries[self._next_key] = (vector, question, answer, time.time())
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def _expire(self, ttl: float):
+        cutoff = time.time() - ttl
+        expired = [k for k, entry in self._entries.items() if entry[3] < cutoff]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """
+    Cache entries in a local SQLite file, shared by every worker on the host.
+
+    Each process keeps the vectors in memory and only reads the rows added
+    since its last lookup; a hit reads its answer by ID. Expired and evicted
+    rows are deleted when an entry is written, and the in-memory vectors are
+    reloaded every `sync_interval` seconds to drop rows deleted by other
+    workers.
+    """
+
+    def __init__(
+        self, path: str, max_entries: int, ttl: float = 86400, sync_interval=60.0
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._created = np.zeros(0)
+        self._matrix = None
+        self._synced = 0.0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS semantic_cache ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, vector BLOB NOT NULL, "
+                "question TEXT NOT NULL, answer TEXT NOT NULL, "
+                "created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS semantic_cache_created "
+                "ON semantic_cache (created)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS semantic_cache_last_used "
+                "ON semantic_cache (last_used)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _sync(self, conn):
+        # IDs only grow (AUTOINCREMENT), so new rows are those past the last one
+        if time.monotonic() - self._synced >= self.sync_interval:
+            self._ids, self._created = np.zeros(0, np.int64), np.zeros(0)
+            self._matrix = None
+            self._synced = time.monotonic()
+        last_id = int(self._ids[-1]) if len(self._ids) else 0
+        rows = conn.execute(
+            "SELECT id, vector, created FROM semantic_cache WHERE id > ? ORDER BY id",
+            (last_id,),
+        ).fetchall()
+        if not rows:
+            return
+
+        vectors = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+        self._ids = np.concatenate([self._ids, [row[0] for row in rows]])
+        self._created = np.concatenate([self._created, [row[2] for row in rows]])
+        self._matrix = (
+            vectors if self._matrix is None else np.vstack([self._matrix, vectors])
+        )
+
+    def search(self, vector: np.ndarray, threshold: float, ttl: float):
+        conn = self._connect()
+        with self._lock:
+            self._sync(conn)
+            if self._matrix is None:
+                return None
+
+            scores = self._matrix @ vector
+            # Expired rows stay until the next write deletes them
+            scores[self._created < time.time() - ttl] = -np.inf
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < threshold:
+                return None
+            row_id = int(self._ids[best])
+
+        row = conn.execute(
+            "SELECT answer FROM semantic_cache WHERE id = ?", (row_id,)
+        ).fetchone()
+        if row is None:
+            return None  # evicted by another worker since the last sync
+        conn.execute(
+            "UPDATE semantic_cache SET last_used = ? WHERE id = ?",
+            (time.time(), row_id),
+        )
+        return row[0], score
+
+    def put(self, vector: np.ndarray, question: str, answer: str):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT INTO semantic_cache (vector, question, answer, created, last_used) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (vector.astype(np.float32).tobytes(), question, answer, now, now),
+        )
+        conn.execute("DELETE FROM semantic_cache WHERE created < ?", (now - self.ttl,))
+        conn.execute(
+            "DELETE FROM semantic_cache WHERE id NOT IN ("
+            "SELECT id FROM semantic_cache ORDER BY last_used DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def __len__(self):
+        return (
+            self._connect().execute("SELECT COUNT(*) FROM semantic_cache").fetchone()[0]
+        )
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on the query embedding.
+
+    A question is served from cache when its cosine similarity to a stored
+    question is at least `threshold`. Only history-independent turns (the
+    first message of a session) should be looked up or stored, because a
+    follow-up question's answer depends on the conversation so far.
+    """
+
+    def __init__(
+        self, embeddings, backend, threshold: float = 0.95, ttl: float = 86400
+    ):
+        self.embeddings = embeddings
+        self.backend = backend
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def alookup(self, question: str, threshold: typing.Optional[float] = None):
+        vector = _normalize(await self.embeddings.aembed_query(question))
+        # The backends scan every stored vector (and may hit the disk), so
+        # keep them off the event loop
+        result = await asyncio.get_running_loop().run_in_executor(
+            None,
+            self.backend.search,
+            vector,
+            self.threshold if threshold is None else threshold,
+            self.ttl,
+        )
+        if result is None:
+            self.misses += 1
+            return None
+
+        answer, score = result
+        self.hits += 1
+        logger.info(f"Semantic cache hit (similarity={score:.3f})")
+        return answer
+
+    async def astore(self, question: str, answer: str):
+        vector = _normalize(await self.embeddings.aembed_query(question))
+        await asyncio.get_running_loop().run_in_executor(
+            None, self.backend.put, vector, question, answer
+        )
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self.backend),
+        }
+
+
+def get_semantic_cache(
+    embeddings, backend: str, path: str, threshold, ttl, max_entries
+):
+    if backend == "sqlite":
+        store = SQLiteCacheBackend(path, max_entries, ttl=ttl)
+    else:
+        store = InMemoryCacheBackend(max_entries)
+    logger.info(f"Semantic cache backend: {backend}")
+    return SemanticCache(embeddings, store, threshold=threshold, ttl=ttl)
@@ -0,0 +1,272 @@
+import re
+
+from langchain.chains import create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import (
+    RunnableBranch,
+    RunnableLambda,
+    RunnablePassthrough,
+)
+from langchain_core.runnables.history import RunnableWithMessageHistory
+
+from src.prompt import sys_prompt
+
+# Phrases that only make sense with the earlier turns
+REFERS_BACK = re.compile(
+    r"\b(what about|how about|and what about|the same|you said|you mentioned|"
+    r"you told me|as mentioned|mentioned earlier|earlier|previous(ly)?|"
+    r"that one|those ones)\b",
+    re.IGNORECASE,
+)
+PERSONAL_PRONOUNS = frozenset(
+    "it its they them their theirs he him his she her".split()
+)
+DEMONSTRATIVES = frozenset("this that these those".split())
+# Words that can't be what a pronoun refers to
+FUNCTION_WORDS = frozenset(
+    "a an the and or but if so of for to in on at by with from about after "
+    "before during than as i me my we us our you your is are was were be been "
+    "being am do does did doing done have has had can could should would will "
+    "shall may might must not no what which who whom whose when where why how "
+    "long much many often there here any some more most mean means".split()
+)
+# "is that serious?": the demonstrative is the subject, not a determiner
+PREDICATES = frozenset(
+    "serious dangerous normal common contagious infectious curable treatable "
+    "safe bad harmful painful hereditary genetic fatal permanent".split()
+)
+REWRITE_HISTORY_MESSAGES = 4
+
+rewrite_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "Rewrite the user's last message as a standalone question that can "
+            "be understood without the conversation. Reply with the question only.",
+        ),
+        ("placeholder", "{chat_history}"),
+        ("human", "{input}"),
+    ]
+)
+
+
+def refers_back(question: str) -> bool:
+    """
+    Whether the question needs the earlier turns to be understood.
+
+    Besides explicit phrases ("what about", "you said"), a pronoun refers
+    back only when nothing it could stand for comes before it in the
+    question ("is it contagious?", but not "my son has a fever, should he
+    see a doctor?"). A demonstrative followed by a noun ("this rash") is a
+    noun phrase of its own. "It ... to" ("is it safe to ...") is left alone.
+    """
+    if REFERS_BACK.search(question):
+        return True
+
+    words = re.findall(r"[a-z]+", question.lower())
+    for i, word in enumerate(words):
+        if word not in PERSONAL_PRONOUNS and word not in DEMONSTRATIVES:
+            continue
+        after = words[i + 1 :]
+        antecedent = any(w not in FUNCTION_WORDS for w in words[:i])
+        if word in PERSONAL_PRONOUNS:
+            if word == "it" and "to" in after:
+                continue
+            if not antecedent:
+                return True
+        elif not after:
+            return True  # "what causes this?"
+        elif not antecedent and (after[0] in FUNCTION_WORDS or after[0] in PREDICATES):
+            return True
+    return False
+
+
+def build_answer_chain(llm):
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", sys_prompt),
+            ("placeholder", "{chat_history}"),
+            ("human", "{input}"),
+        ]
+    )
+    return create_stuff_documents_chain(llm=llm, prompt=prompt)
+
+
+def build_tiered_answer(model_router):
+    """
+    Choose the turn's model tier from the packed inputs, then answer with it.
+
+    Adds the decision as `model_tier` next to `answer` in the output.
+    """
+    answer_chains = {
+        name: build_answer_chain(llm) for name, llm in model_router.llms.items()
+    }
+
+    def select_tier(inputs):
+        decision = model_router.select(
+            inputs["input"], inputs["context"], inputs.get("chat_history")
+        )
+        return decision.as_dict()
+
+    async def aselect_tier(inputs):
+        return select_tier(inputs)
+
+    def tier_answer(inputs):
+        return answer_chains[inputs["model_tier"]["tier"]]
+
+    async def atier_answer(inputs):
+        return tier_answer(inputs)
+
+    return RunnablePassthrough.assign(
+        model_tier=RunnableLambda(select_tier, aselect_tier, name="select_model")
+    ) | RunnablePassthrough.assign(answer=RunnableLambda(tier_answer, atier_answer))
+
+
+def build_retrieval_chain(retriever, llm, context_packer=None):
+    query_answer_chain = build_answer_chain(llm)
+    if context_packer is None:
+        return create_retrieval_chain(
+            retriever=retriever, combine_docs_chain=query_answer_chain
+        )
+
+    # Same shape as create_retrieval_chain, with the packer trimming the
+    # retrieved chunks and history to the token budget before the prompt
+    retrieve_documents = (lambda x: x["input"]) | retriever
+    return (
+        RunnablePassthrough.assign(
+            context=retrieve_documents.with_config(run_name="retrieve_documents")
+        )
+        | RunnableLambda(context_packer).with_config(run_name="pack_context")
+        | RunnablePassthrough.assign(answer=query_answer_chain)
+    ).with_config(run_name="retrieval_chain")
+
+
+def build_chain_with_memory(retrieval_chain, get_session_history):
+    return RunnableWithMessageHistory(
+        retrieval_chain,
+        get_session_history,
+        input_messages_key="input",
+        history_messages_key="chat_history",
+        output_messages_key="answer",
+    )
+
+
+def build_history_loader(get_session_history):
+    def load_history(inputs, config):
+        return get_session_history(config["configurable"]["session_id"]).messages
+
+    async def aload_history(inputs, config):
+        history = get_session_history(config["configurable"]["session_id"])
+        return await history.aget_messages()
+
+    # Named like RunnableWithMessageHistory's step so StageTimingHandler
+    # times it the same way
+    return RunnableLambda(load_history, aload_history).with_config(
+        run_name="load_history"
+    )
+
+
+def build_concurrent_chain(
+    retriever,
+    llm,
+    get_session_history,
+    context_packer,
+    rewrite_llm=None,
+    model_router=None,
+):
+    """
+    Chat chain that fetches the session history and retrieves chunks at once.
+
+    Same inputs, outputs and config as build_chain_with_memory
+    ({"input"} with a configurable `session_id`). The history fetch runs
+    concurrently with query embedding and vector search instead of before
+    them, and the finished turn is written back in one add_messages call.
+
+    With `rewrite_llm`, a follow-up that refers back to earlier turns is
+    first rewritten into a standalone question for retrieval; that waits
+    for the history, so only those turns give up the concurrency.
+
+    With `model_router` (src.tiering.ModelRouter), each turn is answered by
+    the model tier it picks instead of `llm`.
+    """
+    load_history = build_history_loader(get_session_history)
+    retrieve_documents = ((lambda x: x["input"]) | retriever).with_config(
+        run_name="retrieve_documents"
+    )
+    prepare = RunnablePassthrough.assign(
+        chat_history=load_history, context=retrieve_documents
+    ).with_config(run_name="prepare_turn")
+
+    if rewrite_llm is not None:
+        rewrite_query = (
+            RunnableLambda(
+                lambda x: {
+                    "input": x["input"],
+                    "chat_history": x["chat_history"][-REWRITE_HISTORY_MESSAGES:],
+                }
+            )
+            | rewrite_prompt
+            | rewrite_llm.with_config(tags=["query_rewrite"])
+            | StrOutputParser()
+        ).with_config(run_name="rewrite_query")
+
+        def standalone_query(inputs):
+            # Nothing to rewrite against on a first turn
+            return rewrite_query if inputs["chat_history"] else inputs["input"]
+
+        rewrite_then_retrieve = (
+            RunnablePassthrough.assign(chat_history=load_history)
+            | RunnablePassthrough.assign(
+                context=(RunnableLambda(standalone_query) | retriever).with_config(
+                    run_name="retrieve_documents"
+                )
+            )
+        ).with_config(run_name="prepare_turn")
+        prepare = RunnableBranch(
+            (lambda x: refers_back(x["input"]), rewrite_then_retrieve), prepare
+        )
+
+    if model_router is None:
+        answer = RunnablePassthrough.assign(answer=build_answer_chain(llm))
+    else:
+        answer = build_tiered_answer(model_router)
+
+    chain = (
+        prepare
+        | RunnableLambda(context_packer).with_config(run_name="pack_context")
+        | answer
+    ).with_config(run_name="retrieval_chain")
+
+    def save_turn(run, config):
+        get_session_history(config["configurable"]["session_id"]).add_messages(
+            [
+                HumanMessage(content=run.inputs["input"]),
+                AIMessage(content=run.outputs["answer"]),
+            ]
+        )
+
+    async def asave_turn(run, config):
+        history = get_session_history(config["configurable"]["session_id"])
+        await history.aadd_messages(
+            [
+                HumanMessage(content=run.inputs["input"]),
+                AIMessage(content=run.outputs["answer"]),
+            ]
+        )
+
+    # Like RunnableWithMessageHistory, pick the listener by how we're called
+    chain_sync = chain.with_listeners(on_end=save_turn)
+    chain_async = chain.with_alisteners(on_end=asave_turn)
+
+    def select_sync(_):
+        return chain_sync
+
+    async def select_async(_):
+        return chain_async
+
+    return RunnableLambda(select_sync, select_async).with_config(
+        run_name="chat_with_memory"
+    )
@@ -0,0 +1,76 @@
+import gzip
+import io
+import json
+import typing
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# processed_document.json holds every chunk in one JSON array;
+# processed_document.jsonl.gz holds one gzip-compressed JSON object per line
+# and can be read chunk by chunk.
+COMPACT_SUFFIX = ".jsonl.gz"
+LEGACY_SUFFIX = ".json"
+
+# Where the ETL uploads the chunks in S3 and where indexing reads them from
+COMPACT_DOCUMENT_KEY = "doc/processed_document" + COMPACT_SUFFIX
+LEGACY_DOCUMENT_KEY = "doc/processed_document" + LEGACY_SUFFIX
+
+
+def write_chunks(path, documents: typing.Iterable[Document], vectors=None) -> int:
+    """
+    Write chunks as gzip-compressed JSON lines, optionally with their vectors.
+
+    Returns:
+        int: Number of chunks written
+    """
+    vectors = iter(vectors) if vectors is not None else None
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+        for doc in documents:
+            record = {"page_content": doc.page_content, "metadata": doc.metadata}
+            if vectors is not None:
+                record["embedding"] = [round(float(v), 6) for v in next(vectors)]
+            f.write(json.dumps(record, separators=(",", ":")))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def iter_chunks(fileobj, key: str):
+    """
+    Yield chunk dicts from a binary file object (a local file or an S3 body).
+
+    Compact files are decompressed and parsed one line at a time; legacy
+    .json files have to be parsed whole.
+    """
+    if key.endswith(COMPACT_SUFFIX):
+        with gzip.GzipFile(fileobj=fileobj) as gz:
+            for line in io.TextIOWrapper(gz, encoding="utf-8"):
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from json.load(fileobj)
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """Serve vectors stored alongside the chunks; embed anything else with `base`."""
+
+    def __init__(self, base: Embeddings, vectors_by_text: dict):
+        self.base = base
+        self.vectors_by_text = vectors_by_text
+
+    def embed_documents(
+        self, texts: typing.List[str]
+    ) -> typing.List[typing.List[float]]:
+        missing = [t for t in texts if t not in self.vectors_by_text]
+        computed = (
+            dict(zip(missing, self.base.embed_documents(missing))) if missing else {}
+        )
+        return [
+            self.vectors_by_text[t] if t in self.vectors_by_text else computed[t]
+            for t in texts
+        ]
+
+    def embed_query(self, text: str) -> typing.List[float]:
+        return self.base.embed_query(text)
@@ -0,0 +1,113 @@
+"""
+Lazily initialized application components.
+
+Loading the embedding model, connecting to the vector store and building
+the chains takes seconds, so app.py registers them here as factories
+instead of building them at import time. They are built on first use (at
+most once, even under concurrent requests) or warmed up in the background
+from the FastAPI lifespan, and /healthz reports which ones are ready.
+"""
+
+import asyncio
+import threading
+import time
+import typing
+
+from src.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class LazyComponent:
+    """A value built once, on first use, from a zero-argument factory."""
+
+    def __init__(self, name: str, factory: typing.Callable[[], typing.Any]):
+        self.name = name
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value = None
+        self.state = "cold"  # cold -> loading -> ready | failed
+        self.error = None
+        self.load_ms = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def get(self):
+        if self.ready:
+            return self._value
+        with self._lock:
+            # A failed build is retried by the next caller
+            if not self.ready:
+                self.state = "loading"
+                start = time.perf_counter()
+                try:
+                    self._value = self._factory()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    logger.error(f"Failed to initialize {self.name}: {e}")
+                    raise
+                self.load_ms = round((time.perf_counter() - start) * 1000, 1)
+                self.state = "ready"
+                self.error = None
+                logger.info(f"Initialized {self.name} in {self.load_ms:.0f}ms")
+        return self._value
+
+    def peek(self):
+        """The value if it has been built, otherwise None; never blocks."""
+        return self._value if self.ready else None
+
+    def status(self) -> dict:
+        return {"state": self.state, "load_ms": self.load_ms, "error": self.error}
+
+
+class ComponentRegistry:
+    """Named LazyComponents, warmed up in registration order."""
+
+    def __init__(self):
+        self._components: typing.Dict[str, LazyComponent] = {}
+
+    def register(self, name: str, factory: typing.Callable[[], typing.Any]):
+        self._components[name] = LazyComponent(name, factory)
+
+    def get(self, name: str):
+        return self._components[name].get()
+
+    async def aget(self, name: str):
+        """Like get(), but builds a cold component off the event loop."""
+        component = self._components[name]
+        if component.ready:
+            return component.peek()
+        return await asyncio.get_running_loop().run_in_executor(None, component.get)
+
+    def peek(self, name: str):
+        return self._components[name].peek()
+
+    def warm_up(self):
+        """Build every component; failures are logged and retried on first use."""
+        start = time.perf_counter()
+        for component in self._components.values():
+            try:
+                component.get()
+            except Exception:
+                pass
+        logger.info(
+            f"Warm-up finished in {time.perf_counter() - start:.1f}s "
+            f"({'ready' if self.ready else 'not ready'})"
+        )
+
+    def start_background_warm_up(self) -> threading.Thread:
+        thread = threading.Thread(
+            target=self.warm_up, name="component-warm-up", daemon=True
+        )
+        thread.start()
+        return thread
+
+    @property
+    def ready(self) -> bool:
+        return all(c.ready for c in self._components.values())
+
+    def status(self) -> dict:
+        return {name: c.status() for name, c in self._components.items()}
@@ -0,0 +1,218 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+
+class QueueFullError(Exception):
+    """Raised when a request cannot get a slot within the admission limits."""
+
+    def __init__(self, message, retry_after=1.0, reason="queue_full"):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class RateLimitedError(QueueFullError):
+    """Raised when a client has used up its request rate."""
+
+
+class ConcurrencyLimiter:
+    """
+    Bounded admission for async request handlers.
+
+    At most `max_concurrency` requests run at once, at most `max_queue` wait
+    for a slot, and a waiter gives up after `queue_timeout` seconds. Anything
+    beyond that is rejected straight away so the caller can shed load instead
+    of letting latency grow without bound.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self, timeout=None):
+        """Take a slot; `timeout` overrides queue_timeout (e.g. a shorter deadline)."""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError("Chat queue is full")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(
+                self._semaphore.acquire(),
+                timeout=self.queue_timeout if timeout is None else timeout,
+            )
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueueFullError(
+                "Timed out waiting for a chat slot", reason="queue_timeout"
+            )
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self, timeout=None):
+        """Hold a slot for the duration of the block."""
+        await self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limit per key (a session ID, a client IP).
+
+    Each key may make `burst` requests at once and then `rate` per second.
+    Buckets of the least recently seen keys are dropped beyond `max_keys`,
+    which only ever gives a client a fresh, full bucket.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, last refill)
+        self.rejected = 0
+
+    def _tokens(self, key, now: float) -> float:
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def retry_after(self, key) -> float:
+        """Seconds until `key` may make a request; 0 if it may now."""
+        missing = 1 - self._tokens(key, time.monotonic())
+        return max(0.0, missing / self.rate)
+
+    def take(self, key):
+        now = time.monotonic()
+        self._buckets[key] = (self._tokens(key, now) - 1, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def stats(self):
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "keys": len(self._buckets),
+            "rejected": self.rejected,
+        }
+
+
+def check_rate_limits(limits):
+    """
+    Take a token for each (name, limiter, key) in `limits`, or none at all.
+
+    Raises RateLimitedError, with the longest wait and the limit that set it,
+    if any key is over its rate. Limits or keys that are None are skipped.
+    """
+    limits = [
+        (name, limiter, key)
+        for name, limiter, key in limits
+        if limiter is not None and key is not None
+    ]
+    waits = [(limiter.retry_after(key), name, limiter) for name, limiter, key in limits]
+    if waits:
+        wait, name, limiter = max(waits, key=lambda w: w[0])
+        if wait > 0:
+            limiter.rejected += 1
+            raise RateLimitedError(
+                f"Rate limit exceeded for {name}", retry_after=wait, reason=name
+            )
+    for _, limiter, key in limits:
+        limiter.take(key)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent work for the same key into a single execution.
+
+    The first caller for a key (the leader) does the work; callers that
+    arrive while it is in flight (followers) wait for and share its result.
+    If the leader fails, each follower falls back to doing the work itself.
+    Nothing is cached once the leader finishes.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def join(self, key):
+        """Return (future, is_leader); a leader must call finish() for the key."""
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.followers += 1
+            return future, False
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self.leaders += 1
+        return future, True
+
+    def finish(self, key, result=None, error=None):
+        future = self._in_flight.pop(key, None)
+        if future is None or future.done():
+            return
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+            future.exception()  # followers may be gone; don't warn if unread
+
+    async def follow(self, future):
+        """A follower's wait: the leader's result, or None if the leader failed."""
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            return None
+
+    async def run(self, key, work):
+        """
+        Run `work()` once per in-flight key.
+
+        Returns (result, shared), where `shared` is True when the result
+        came from another caller's execution.
+        """
+        future, leader = self.join(key)
+        if not leader:
+            result = await self.follow(future)
+            if result is not None:
+                return result, True
+            return await work(), False
+
+        try:
+            result = await work()
+        except BaseException as e:
+            # A cancelled leader still has to release its followers
+            self.finish(key, error=e if isinstance(e, Exception) else RuntimeError(e))
+            raise
+        self.finish(key, result=result)
+        return result, False
+
+    def stats(self):
+        return {
+            "in_flight": len(self._in_flight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
@@ -13,3 +13,120 @@ REFERER = os.getenv("REFERER")
 FILE_ID = os.getenv("FILE_ID")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# /chat concurrency and backpressure
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "16"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "10"))
+CHAT_EXECUTOR_WORKERS = int(os.getenv("CHAT_EXECUTOR_WORKERS", "32"))
+CHAT_COALESCE_ENABLED = os.getenv("CHAT_COALESCE_ENABLED", "true").lower() == "true"
+
+# Per-client rate limits (token buckets): requests per second after a burst;
+# a rate of 0 turns the limit off. The IP limit is off by default: behind a
+# proxy every client shares its address unless TRUST_FORWARDED_FOR is set.
+CHAT_SESSION_RATE_LIMIT = float(os.getenv("CHAT_SESSION_RATE_LIMIT", "0.2"))
+CHAT_SESSION_BURST = int(os.getenv("CHAT_SESSION_BURST", "3"))
+CHAT_IP_RATE_LIMIT = float(os.getenv("CHAT_IP_RATE_LIMIT", "0"))
+CHAT_IP_BURST = int(os.getenv("CHAT_IP_BURST", "10"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Take the client IP from X-Forwarded-For (only behind a trusted proxy)
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "false").lower() == "true"
+
+# Time budgets (seconds): the whole chat request, and the stages within it
+CHAT_DEADLINE = float(os.getenv("CHAT_DEADLINE", "20"))
+RETRIEVAL_TIMEOUT = float(os.getenv("RETRIEVAL_TIMEOUT", "3"))
+RETRIEVAL_HEDGE_AFTER = float(os.getenv("RETRIEVAL_HEDGE_AFTER", "0.5"))
+LLM_FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+# On a timeout, answers this close to the question may come from the cache.
+# Same as SEMANTIC_CACHE_THRESHOLD by default: a looser match can be a
+# different condition (hypo- vs hyperthyroidism) and the reply wouldn't say so
+DEGRADED_CACHE_THRESHOLD = float(os.getenv("DEGRADED_CACHE_THRESHOLD", "0.95"))
+
+# Shared keep-alive connection pools for OpenAI and Pinecone
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "64"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+PINECONE_HOST = os.getenv("PINECONE_HOST")
+
+# Semantic answer cache
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_BACKEND = os.getenv("SEMANTIC_CACHE_BACKEND", "memory")
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "semantic_cache.sqlite3")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+# Session memory
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "sessions.sqlite3")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "10"))
+SESSION_MAX_TOKENS = int(os.getenv("SESSION_MAX_TOKENS", "2000"))
+
+# Query embedding service
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_INT8_FILE = os.getenv(
+    "EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx"
+)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+
+# Vector store
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "data/local_index")
+LOCAL_INDEX_HNSW = os.getenv("LOCAL_INDEX_HNSW", "false").lower() == "true"
+
+# Index ingestion
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+INGEST_UPSERT_BATCH_SIZE = int(os.getenv("INGEST_UPSERT_BATCH_SIZE", "100"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "5"))
+
+# ETL
+ETL_WORKERS = int(os.getenv("ETL_WORKERS", str(os.cpu_count() or 1)))
+ETL_PAGES_PER_SHARD = int(os.getenv("ETL_PAGES_PER_SHARD", "25"))
+ETL_OUTPUT_FORMAT = os.getenv("ETL_OUTPUT_FORMAT", "jsonl.gz")
+
+# Retrieval
+RETRIEVER_MODE = os.getenv("RETRIEVER_MODE", "vector")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "data/bm25_index.json.gz")
+
+# Startup: "background" warms components up after the server starts
+# listening, "eager" finishes warm-up before it does, "lazy" waits for the
+# first request that needs them.
+APP_WARMUP = os.getenv("APP_WARMUP", "background")
+
+# Logging
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "1000"))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.1"))
+
+# Prompt context packing
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_HISTORY_TOKENS = int(os.getenv("CONTEXT_HISTORY_TOKENS", "800"))
+
+# Follow-ups that refer back to earlier turns ("how is it treated?") can be
+# rewritten into a standalone question before retrieval, at the cost of a
+# small LLM call that has to wait for the history
+QUERY_REWRITE_ENABLED = os.getenv("QUERY_REWRITE_ENABLED", "false").lower() == "true"
+QUERY_REWRITE_MODEL = os.getenv("QUERY_REWRITE_MODEL", "gpt-4o-mini")
+
+# Model tiering: simple questions go to a smaller model from config.yml
+MODEL_TIERING_ENABLED = os.getenv("MODEL_TIERING_ENABLED", "true").lower() == "true"
+MODEL_CONFIG_PATH = os.getenv("MODEL_CONFIG_PATH", "config/config.yml")
+
+# Intent routing: greetings and off-topic questions get the canned replies
+# from config/config.yml without retrieval or an LLM call
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+ROUTER_CONFIG_PATH = os.getenv("ROUTER_CONFIG_PATH", "config/config.yml")
+ROUTER_RAILS_PATH = os.getenv("ROUTER_RAILS_PATH", "safety_rails.co")
+ROUTER_THRESHOLD = float(os.getenv("ROUTER_THRESHOLD", "0.6"))
+ROUTER_MARGIN = float(os.getenv("ROUTER_MARGIN", "0.05"))
@@ -0,0 +1,179 @@
+"""
+Token-budgeted context assembly for the stuff-documents prompt.
+
+ContextPacker sits between retrieval and the prompt. It removes the
+overlap the text splitter leaves between neighbouring chunks (and chunks
+retrieved twice), keeps the most recent history turns that fit a history
+budget - replacing older ones with a one-line recap - and fills the rest
+of the budget with chunks in rank order.
+"""
+
+import typing
+from functools import lru_cache
+
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from src.logger import setup_logger
+from src.metrics import PROMPT_TOKENS
+from src.session_store import estimate_tokens, message_text
+
+logger = setup_logger(__name__)
+
+MIN_CHUNK_TOKENS = 50  # don't bother adding a truncated chunk smaller than this
+RECAP_QUESTION_CHARS = 80
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # gpt-4o's tokenizer; tiktoken downloads it on first use, so fall back to
+    # the 4-characters-per-token estimate when that isn't possible
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, estimating prompt tokens: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _overlap(a: str, b: str, max_overlap: int) -> int:
+    """Length of the longest suffix of `a` that is also a prefix of `b`."""
+    for n in range(min(len(a), len(b), max_overlap), 0, -1):
+        if a.endswith(b[:n]):
+            return n
+    return 0
+
+
+def dedupe_chunks(
+    documents: typing.List[Document], min_overlap: int = 20, max_overlap: int = 100
+) -> typing.List[Document]:
+    """
+    Drop repeated chunks and trim text shared with a chunk kept earlier.
+
+    RecursiveCharacterTextSplitter repeats up to chunk_overlap characters
+    between neighbouring chunks; when both neighbours are retrieved the
+    shared text would otherwise be sent twice.
+    """
+    kept = []
+    for doc in documents:
+        text = doc.page_content.strip()
+        if not text or any(text in k.page_content for k in kept):
+            continue
+        for k in kept:
+            n = _overlap(k.page_content, text, max_overlap)
+            if n >= min_overlap:
+                text = text[n:].lstrip()
+            n = _overlap(text, k.page_content, max_overlap)
+            if n >= min_overlap:
+                text = text[:-n].rstrip()
+        if text:
+            kept.append(Document(page_content=text, metadata=doc.metadata))
+    return kept
+
+
+def _recap(dropped: typing.List[BaseMessage]) -> typing.Optional[SystemMessage]:
+    questions = [
+        message_text(m)[:RECAP_QUESTION_CHARS]
+        for m in dropped
+        if isinstance(m, HumanMessage)
+    ]
+    if not questions:
+        return None
+    return SystemMessage(
+        content="Earlier in this conversation the user asked: " + "; ".join(questions)
+    )
+
+
+class ContextPacker:
+    """
+    Fit retrieved chunks and chat history into a prompt token budget.
+
+    Called with the retrieval chain's dict ({"input", "chat_history",
+    "context"}), it returns the same dict with a packed `context` and
+    `chat_history` and the estimated `prompt_tokens`.
+    """
+
+    def __init__(self, system_prompt: str, token_budget: int, history_budget: int):
+        self.fixed_tokens = count_tokens(system_prompt.replace("{context}", ""))
+        self.token_budget = token_budget
+        self.history_budget = history_budget
+
+    def pack_history(self, messages: typing.List[BaseMessage], budget: int):
+        # Walk back from the newest turn, keeping whole turns while they fit
+        kept, tokens = [], 0
+        i = len(messages)
+        while i > 0:
+            start = i - 1
+            if i >= 2 and isinstance(messages[i - 2], HumanMessage):
+                start = i - 2
+            turn = messages[start:i]
+            turn_tokens = sum(count_tokens(message_text(m)) for m in turn)
+            if tokens + turn_tokens > budget:
+                break
+            kept = turn + kept
+            tokens += turn_tokens
+            i = start
+
+        recap = _recap(messages[:i])
+        if recap is not None:
+            recap_tokens = count_tokens(recap.content)
+            if tokens + recap_tokens <= budget:
+                kept = [recap] + kept
+                tokens += recap_tokens
+        return kept, tokens, i
+
+    def pack_documents(self, documents: typing.List[Document], budget: int):
+        packed, tokens = [], 0
+        for doc in documents:
+            doc_tokens = count_tokens(doc.page_content)
+            remaining = budget - tokens
+            if doc_tokens > remaining:
+                if remaining < MIN_CHUNK_TOKENS:
+                    break
+                # Character cut proportional to the tokens that still fit
+                cut = int(len(doc.page_content) * remaining / doc_tokens)
+                doc = Document(
+                    page_content=doc.page_content[:cut], metadata=doc.metadata
+                )
+                doc_tokens = count_tokens(doc.page_content)
+            packed.append(doc)
+            tokens += doc_tokens
+        return packed, tokens
+
+    def __call__(self, inputs: dict) -> dict:
+        question_tokens = count_tokens(inputs["input"])
+        available = max(0, self.token_budget - self.fixed_tokens - question_tokens)
+
+        history = inputs.get("chat_history") or []
+        history, history_tokens, dropped = self.pack_history(
+            history, min(self.history_budget, available)
+        )
+        retrieved = inputs.get("context") or []
+        documents = dedupe_chunks(retrieved)
+        documents, context_tokens = self.pack_documents(
+            documents, available - history_tokens
+        )
+
+        prompt_tokens = (
+            self.fixed_tokens + question_tokens + history_tokens + context_tokens
+        )
+        PROMPT_TOKENS.observe(prompt_tokens)
+        logger.info(
+            f"Prompt tokens: {prompt_tokens} (context {context_tokens} from "
+            f"{len(documents)}/{len(retrieved)} chunks, history {history_tokens} "
+            f"with {dropped} older messages dropped)"
+        )
+        return {
+            **inputs,
+            "context": documents,
+            "chat_history": history,
+            "prompt_tokens": prompt_tokens,
+        }
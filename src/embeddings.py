@@ -0,0 +1,194 @@
+import asyncio
+import queue
+import re
+import threading
+import time
+import typing
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.logger import setup_logger
+from src.metrics import CACHE_REQUESTS, record_stage
+
+logger = setup_logger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def check_embedding_parity(
+    candidate: Embeddings,
+    reference: Embeddings,
+    texts: typing.List[str],
+    min_cosine: float = 0.99,
+):
+    """
+    Compare two embedding backends text by text.
+
+    Returns:
+        tuple: (passed, min_cosine, mean_cosine) over all texts
+    """
+    a = np.asarray(candidate.embed_documents(texts), dtype=np.float32)
+    b = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    cosines = (a * b).sum(axis=1) / (
+        np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    )
+    worst = float(cosines.min())
+    return worst >= min_cosine, worst, float(cosines.mean())
+
+
+class EmbeddingService(Embeddings):
+    """
+    Shared query-embedding layer in front of a loaded embedding model.
+
+    Queries are answered from an LRU cache keyed by normalized text; misses
+    from concurrent requests are collected for up to `batch_window_ms` (or
+    `max_batch_size` texts) and embedded in a single model call by a
+    background thread. Document embedding goes straight to the model.
+    """
+
+    def __init__(
+        self,
+        base: Embeddings,
+        max_batch_size: int = 32,
+        batch_window_ms: float = 5,
+        cache_size: int = 4096,
+    ):
+        self.base = base
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window_ms / 1000
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()
+        self._pending = {}  # normalized text -> Future shared by identical misses
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+
+        self._started = time.monotonic()
+        self.queries = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self._latencies = deque(maxlen=1000)
+
+    # Embeddings interface
+
+    def embed_documents(
+        self, texts: typing.List[str]
+    ) -> typing.List[typing.List[float]]:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> typing.List[float]:
+        start = time.perf_counter()
+        cached, future = self._lookup(text)
+        vector = cached if cached is not None else future.result()
+        self._record(start)
+        return vector
+
+    async def aembed_query(self, text: str) -> typing.List[float]:
+        start = time.perf_counter()
+        cached, future = self._lookup(text)
+        vector = cached if cached is not None else await asyncio.wrap_future(future)
+        self._record(start)
+        return vector
+
+    # Cache and batching
+
+    def _lookup(self, text: str):
+        key = normalize_query(text)
+        with self._lock:
+            self.queries += 1
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                CACHE_REQUESTS.inc(cache="embedding", result="hit")
+                return vector, None
+            CACHE_REQUESTS.inc(cache="embedding", result="miss")
+
+            future = self._pending.get(key)
+            if future is None:
+                future = Future()
+                self._pending[key] = future
+                self._queue.put((key, future))
+                self._ensure_worker()
+            return None, future
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._run, name="embedding-batcher", daemon=True
+            )
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._embed_batch(batch)
+
+    def _embed_batch(self, batch):
+        # MiniLM's tokenizer is uncased, so embedding the normalized key gives
+        # the same vector as the original text
+        keys = [key for key, _ in batch]
+        try:
+            vectors = self.base.embed_documents(keys)
+        except Exception as e:
+            logger.error(f"Error embedding query batch of {len(keys)}: {e}")
+            with self._lock:
+                for key, future in batch:
+                    self._pending.pop(key, None)
+                    future.set_exception(e)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.batched_texts += len(keys)
+            for (key, future), vector in zip(batch, vectors):
+                self._pending.pop(key, None)
+                self._cache[key] = vector
+                future.set_result(vector)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # Stats
+
+    def _record(self, start: float):
+        elapsed = time.perf_counter() - start
+        self._latencies.append(elapsed * 1000)
+        record_stage("embed", elapsed)
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+        elapsed = time.monotonic() - self._started
+
+        def pct(p):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 3)
+
+        return {
+            "queries": self.queries,
+            "cache_hits": self.cache_hits,
+            "cache_entries": len(self._cache),
+            "batches": self.batches,
+            "avg_batch_size": (
+                round(self.batched_texts / self.batches, 2) if self.batches else 0.0
+            ),
+            "queries_per_sec": round(self.queries / elapsed, 2) if elapsed else 0.0,
+            "latency_p50_ms": pct(0.50),
+            "latency_p99_ms": pct(0.99),
+        }
@@ -2,16 +2,28 @@
 # import warnings
 # from pinecone import ServerlessSpec
 import json
+import os
+from functools import lru_cache
+
 import boto3
-from langchain.schema import Document
+from langchain_core.documents import Document
 from dotenv import load_dotenv
 import typing
 # from langchain_pinecone import PineconeVectorStore
 
 from src import S3_BUCKET_NAME
+from src.config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_BATCH_WINDOW_MS,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_ONNX_INT8_FILE,
+    ETL_OUTPUT_FORMAT,
+)
+from src.chunk_format import COMPACT_DOCUMENT_KEY, LEGACY_DOCUMENT_KEY, iter_chunks
+from src.embeddings import EmbeddingService
 
 # from langchain.schema import Document
-from langchain_huggingface import HuggingFaceEmbeddings
 from src.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -20,7 +32,9 @@ logger = setup_logger(__name__)
 load_dotenv()
 s3 = boto3.client("s3")
 Bucket = S3_BUCKET_NAME
-Key = "doc/processed_document.json"
+Key = LEGACY_DOCUMENT_KEY
+CompactKey = COMPACT_DOCUMENT_KEY
+ManifestKey = "doc/chunk_manifest.json"
 
 
 def get_object_from_s3(Bucket, s3_key):
@@ -36,37 +50,162 @@ def get_object_from_s3(Bucket, s3_key):
         return None
 
 
-def load_doc_from_s3():
-    document_chunks = get_object_from_s3(Bucket, Key)
+def chunks_to_documents(document_chunks, vectors_by_text=None):
+    document = []
+    for doc in document_chunks:
+        document.append(
+            Document(
+                page_content=doc["page_content"],
+                metadata=dict(doc["metadata"]),
+            )
+        )
+        # Vectors precomputed at ETL time, if the file carries them
+        if vectors_by_text is not None and "embedding" in doc:
+            vectors_by_text[doc["page_content"]] = doc["embedding"]
+    return document
+
+
+def iter_doc_chunks_from_s3():
+    """
+    Yield chunk dicts lazily from the file the ETL writes (ETL_OUTPUT_FORMAT).
+
+    The other format is only read when the expected file is missing, with a
+    warning: it is left over from an older ETL run and may be stale.
+    """
+    keys = (Key, CompactKey) if ETL_OUTPUT_FORMAT == "json" else (CompactKey, Key)
+    for s3_key in keys:
+        try:
+            response = s3.get_object(Bucket=Bucket, Key=s3_key)
+        except s3.exceptions.NoSuchKey:
+            continue
+        if s3_key != keys[0]:
+            logger.warning(
+                f"s3://{Bucket}/{keys[0]} not found, falling back to {s3_key}; "
+                "it may be stale, re-run the ETL"
+            )
+        logger.info(f"Reading document chunks from s3://{Bucket}/{s3_key}")
+        yield from iter_chunks(response["Body"], s3_key)
+        return
+    logger.error(f"No processed document found in s3 bucket {Bucket}")
 
-    if not document_chunks:
+
+def load_doc_from_s3(vectors_by_text=None):
+    try:
+        return chunks_to_documents(iter_doc_chunks_from_s3(), vectors_by_text)
+    except Exception as e:
+        logger.error(f"Error loading document chunks from s3 bucket {Bucket}: {e}")
         return []
 
-    document = [
-        Document(
-            page_content=doc["page_content"],
-            metadata={**doc["metadata"], "source": "Medical-books.pdf"},
-        )
-        for doc in document_chunks
-    ]
-    return document
 
+def load_doc_from_file(path, vectors_by_text=None):
+    # Local copy of processed_document.json(l.gz), for offline indexing
+    with open(path, "rb") as f:
+        return chunks_to_documents(iter_chunks(f, path), vectors_by_text)
+
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def load_embedding_model(backend: str = "torch"):
+    """
+    Load MiniLM with the selected sentence-transformers inference backend.
+
+    Args:
+        backend: "torch" (default), "onnx" for ONNX Runtime, or "onnx-int8"
+            for the dynamically quantized ONNX export (both need
+            `sentence-transformers[onnx]`)
+
+    Returns:
+        HuggingFaceEmbeddings: The loaded embedding model
+    """
+    if backend == "onnx":
+        model_kwargs = {"backend": "onnx"}
+    elif backend == "onnx-int8":
+        model_kwargs = {
+            "backend": "onnx",
+            "model_kwargs": {"file_name": EMBEDDING_ONNX_INT8_FILE},
+        }
+    elif backend == "torch":
+        model_kwargs = {}
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    # Imported here: sentence-transformers/torch take seconds to import
+    from langchain_huggingface import HuggingFaceEmbeddings
 
+    logger.info(f"Loading {EMBEDDING_MODEL_NAME} with the {backend} backend")
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME, model_kwargs=model_kwargs
+    )
+
+
+def load_manifest(chunks_path=None):
+    """
+    Load the chunk manifest written by the last indexing run.
+
+    It lives next to processed_document.json: in the same local directory
+    when indexing from a local file, otherwise under the same S3 prefix.
+    Returns None when no run has written one yet.
+    """
+    if chunks_path:
+        path = os.path.join(os.path.dirname(chunks_path), "chunk_manifest.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    try:
+        response = s3.get_object(Bucket=Bucket, Key=ManifestKey)
+    except s3.exceptions.NoSuchKey:
+        return None
+    return json.loads(response["Body"].read().decode("utf-8"))
+
+
+def save_manifest(manifest, chunks_path=None):
+    body = json.dumps(manifest, separators=(",", ":"))
+    if chunks_path:
+        path = os.path.join(os.path.dirname(chunks_path), "chunk_manifest.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(body)
+        return path
+
+    s3.put_object(
+        Bucket=Bucket, Key=ManifestKey, Body=body, ContentType="application/json"
+    )
+    return f"s3://{Bucket}/{ManifestKey}"
+
+
+def load_bm25_index(path):
+    """Load the BM25 index built by the ETL, fetching it from S3 on first use."""
+    from src.bm25 import BM25_INDEX_KEY, BM25Index
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        logger.info(f"Downloading s3://{Bucket}/{BM25_INDEX_KEY} to {path}")
+        s3.download_file(Bucket, BM25_INDEX_KEY, path)
+    return BM25Index.load(path)
+
+
+@lru_cache(maxsize=1)
 def get_embeddings():
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
+    # Loading MiniLM is the slow part, so every caller shares one instance
+    embeddings = load_embedding_model(EMBEDDING_BACKEND)
+    return EmbeddingService(
+        embeddings,
+        max_batch_size=EMBEDDING_BATCH_SIZE,
+        batch_window_ms=EMBEDDING_BATCH_WINDOW_MS,
+        cache_size=EMBEDDING_CACHE_SIZE,
     )
-    return embeddings
 
 
 def process_relevant_doc(docs: list[Document]) -> typing.List[Document]:
     relevant_docs = []
     for doc in docs:
-        doc.metadata.get("source")
-        relevant_docs.append(
-            Document(
-                page_content=doc.page_content, metadata={"source": "medical_book.pdf"}
-            )
-        )
+        # Keep the source, page and chunk_id the ETL recorded for each chunk
+        metadata = {"source": doc.metadata.get("source", "medical_book.pdf")}
+        for key in ("page", "chunk_id"):
+            if key in doc.metadata:
+                metadata[key] = doc.metadata[key]
+        relevant_docs.append(Document(page_content=doc.page_content, metadata=metadata))
 
     return relevant_docs
@@ -0,0 +1,244 @@
+import hashlib
+import random
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain.schema import Document
+
+from src.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def chunk_id(doc: Document) -> str:
+    """
+    Stable vector ID: the ETL's `chunk_id` when the chunk carries one,
+    otherwise a hash of the chunk's source and text.
+    """
+    if doc.metadata.get("chunk_id"):
+        return str(doc.metadata["chunk_id"])
+    source = doc.metadata.get("source", "")
+    return hashlib.sha256(f"{source}\0{doc.page_content}".encode("utf-8")).hexdigest()
+
+
+def content_hash(doc: Document) -> str:
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+def build_manifest(documents: typing.Iterable[Document]) -> dict:
+    """Map each chunk's content hash to the vector ID it is indexed under."""
+    return {content_hash(doc): chunk_id(doc) for doc in documents}
+
+
+def diff_manifest(previous: dict, current: dict):
+    """
+    Compare the manifest of the last indexed run with the current chunks.
+
+    Returns:
+        tuple: (content hashes to embed and upsert, vector IDs to delete)
+    """
+    changed = [h for h, vector_id in current.items() if previous.get(h) != vector_id]
+    live_ids = set(current.values())
+    stale = sorted({v for v in previous.values() if v not in live_ids})
+    return changed, stale
+
+
+def retry_with_backoff(fn, *args, retries: int = 5, base_delay: float = 0.5):
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = base_delay * (2**attempt) * (0.5 + random.random())
+            logger.warning(
+                f"{getattr(fn, '__name__', 'call')} failed ({e}); "
+                f"retry {attempt + 1}/{retries} in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+
+def batched(items: typing.Iterable, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class PineconeSink:
+    """Pinecone index wrapper with the operations the ingestion pipeline needs."""
+
+    # Pinecone's limit on IDs per fetch request
+    fetch_batch_size = 1000
+
+    def __init__(self, index, text_key: str = "text"):
+        self.index = index
+        self.text_key = text_key
+
+    def existing_ids(self, ids: typing.List[str]) -> set:
+        found = set()
+        for batch in batched(ids, self.fetch_batch_size):
+            found.update(self.index.fetch(ids=batch).vectors.keys())
+        return found
+
+    def upsert(self, ids, vectors, documents):
+        self.index.upsert(
+            vectors=[
+                {
+                    "id": vector_id,
+                    "values": vector,
+                    # PineconeVectorStore reads the chunk text back from this key
+                    "metadata": {**doc.metadata, self.text_key: doc.page_content},
+                }
+                for vector_id, vector, doc in zip(ids, vectors, documents)
+            ]
+        )
+
+    def delete(self, ids: typing.List[str]):
+        for batch in batched(ids, self.fetch_batch_size):
+            self.index.delete(ids=batch)
+
+    def delete_all(self):
+        self.index.delete(delete_all=True)
+
+
+def ingest_documents(
+    documents: typing.Iterable[Document],
+    embeddings,
+    sink,
+    batch_size: int = 256,
+    upsert_batch_size: int = 100,
+    max_workers: int = 4,
+    max_retries: int = 5,
+    skip_existing: bool = True,
+):
+    """
+    Embed and upsert chunks in batches with a bounded pool of upload workers.
+
+    Chunks are streamed in batches of `batch_size`; IDs already present in
+    the sink are skipped (unless `skip_existing` is False because the caller
+    already knows what is indexed), so a rerun after a failure resumes where
+    the last run stopped. Uploads run concurrently with embedding of the next batch,
+    with at most `max_workers * 2` upserts in flight.
+
+    Returns:
+        dict: Counts of total, skipped, upserted and failed chunks, the failed
+            IDs, and throughput
+    """
+    report = {"total": 0, "skipped": 0, "upserted": 0, "failed": 0}
+    failed_ids = []
+    lock = threading.Lock()
+    in_flight = threading.BoundedSemaphore(max_workers * 2)
+    start = time.perf_counter()
+
+    def upload(ids, vectors, docs):
+        try:
+            retry_with_backoff(sink.upsert, ids, vectors, docs, retries=max_retries)
+            with lock:
+                report["upserted"] += len(ids)
+        except Exception as e:
+            logger.error(f"Upsert of {len(ids)} chunks failed after retries: {e}")
+            with lock:
+                report["failed"] += len(ids)
+                failed_ids.extend(ids)
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        seen = set()
+        for batch in batched(documents, batch_size):
+            ids = [chunk_id(doc) for doc in batch]
+            report["total"] += len(batch)
+
+            existing = (
+                retry_with_backoff(sink.existing_ids, ids, retries=max_retries)
+                if skip_existing
+                else set()
+            )
+            todo = []
+            for vector_id, doc in zip(ids, batch):
+                if vector_id in existing or vector_id in seen:
+                    report["skipped"] += 1
+                    continue
+                seen.add(vector_id)
+                todo.append((vector_id, doc))
+
+            if todo:
+                todo_docs = [doc for _, doc in todo]
+                vectors = embeddings.embed_documents(
+                    [doc.page_content for doc in todo_docs]
+                )
+                for i in range(0, len(todo), upsert_batch_size):
+                    in_flight.acquire()
+                    pool.submit(
+                        upload,
+                        [vector_id for vector_id, _ in todo[i : i + upsert_batch_size]],
+                        vectors[i : i + upsert_batch_size],
+                        todo_docs[i : i + upsert_batch_size],
+                    )
+
+            elapsed = time.perf_counter() - start
+            logger.info(
+                f"Processed {report['total']} chunks "
+                f"({report['skipped']} already indexed) "
+                f"at {report['total'] / elapsed:.1f} chunks/sec"
+            )
+
+    elapsed = time.perf_counter() - start
+    report["seconds"] = round(elapsed, 2)
+    report["chunks_per_sec"] = round(report["total"] / elapsed, 1) if elapsed else 0.0
+    logger.info(f"Ingestion finished: {report}")
+    report["failed_ids"] = failed_ids
+    return report
+
+
+def sync_documents(
+    documents: typing.List[Document],
+    embeddings,
+    sink,
+    previous_manifest: typing.Optional[dict],
+    **ingest_kwargs,
+):
+    """
+    Bring the index in line with `documents`, touching only what changed.
+
+    With a manifest from the previous run, only new or changed chunks are
+    embedded and upserted and chunks that disappeared are deleted. Without
+    one (first run), everything is ingested with the usual skip-existing
+    check so an interrupted first run can still resume.
+
+    Returns:
+        tuple: (ingestion report, manifest to store for the next run)
+    """
+    current = build_manifest(documents)
+
+    if previous_manifest is None:
+        report = ingest_documents(documents, embeddings, sink, **ingest_kwargs)
+        stale = []
+    else:
+        changed, stale = diff_manifest(previous_manifest, current)
+        changed = set(changed)
+        todo = [doc for doc in documents if content_hash(doc) in changed]
+        logger.info(
+            f"Manifest diff: {len(todo)} new or changed chunks, "
+            f"{len(stale)} stale, {len(current) - len(changed)} unchanged"
+        )
+        report = ingest_documents(
+            todo, embeddings, sink, skip_existing=False, **ingest_kwargs
+        )
+
+    if stale:
+        retry_with_backoff(sink.delete, stale)
+        logger.info(f"Deleted {len(stale)} stale chunks from the index")
+    report["deleted"] = len(stale)
+
+    # Leave failed chunks out so the next run retries them
+    failed = set(report["failed_ids"])
+    manifest = {h: v for h, v in current.items() if v not in failed}
+    return report, manifest
@@ -1,6 +1,24 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import os
+import queue
+import random
 import sys
+import threading
 import warnings
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from src.config import (
+    LOG_ASYNC,
+    LOG_FORMAT,
+    LOG_PAYLOAD_MAX_CHARS,
+    LOG_PAYLOAD_SAMPLE_RATE,
+    LOG_QUEUE_SIZE,
+)
 
 try:
     from langchain_core._api.deprecation import LangChainDeprecationWarning
@@ -17,10 +35,223 @@ except ImportError:
     COLORLOG_AVAILABLE = False
 
 
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Set per HTTP request by src.metrics.RequestIdMiddleware
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request ID to every record as `request_id`."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class PayloadSampler:
+    """
+    Keep large messages (full user inputs, RAG answers) for a sample only.
+
+    Messages longer than `max_chars` are logged in full for `sample_rate`
+    of the records and truncated otherwise; truncated records carry the
+    original `length` so the JSON output still shows how big they were.
+    Handlers apply it to their own copy of the record, since the logger
+    passes the same record to every handler.
+    """
+
+    def __init__(self, max_chars: int, sample_rate: float):
+        self.max_chars = max_chars
+        self.sample_rate = sample_rate
+        self.truncated = 0
+
+    def apply(self, record):
+        message = record.getMessage()
+        if len(message) > self.max_chars and random.random() >= self.sample_rate:
+            record.length = len(message)
+            record.truncated = True
+            message = message[: self.max_chars] + "..."
+            self.truncated += 1
+        record.msg, record.args = message, None
+        return record
+
+
+class SamplingStreamHandler(logging.StreamHandler):
+    """StreamHandler that truncates large messages on a copy of each record."""
+
+    def __init__(self, stream, sampler: PayloadSampler):
+        super().__init__(stream)
+        self.sampler = sampler
+
+    def format(self, record):
+        return super().format(self.sampler.apply(copy.copy(record)))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for CloudWatch Logs Insights."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if getattr(record, "truncated", False):
+            entry["truncated"] = True
+            entry["length"] = record.length
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler over a bounded queue that drops records instead of blocking."""
+
+    def __init__(self, log_queue: queue.Queue, sampler: PayloadSampler = None):
+        super().__init__(log_queue)
+        self.sampler = sampler
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self.direct = None  # handler to write through synchronously instead
+
+    def prepare(self, record):
+        # Leave formatting to the listener thread; only what can't cross
+        # threads (exception tracebacks) is rendered here, on a copy so other
+        # handlers of the same record still see exc_info, the raw args and
+        # the untruncated message.
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if self.sampler is not None:
+            return self.sampler.apply(record)
+        record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record):
+        if self.direct is not None:
+            self.direct.handle(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+def build_formatter(log_format: str, use_color: bool = True) -> logging.Formatter:
+    if log_format == "json":
+        return JsonFormatter()
+    if use_color and COLORLOG_AVAILABLE:
+        return ColoredFormatter(
+            "%(log_color)s" + TEXT_FORMAT + "%(reset)s",
+            datefmt=DATE_FORMAT,
+            log_colors={
+                "DEBUG": "cyan",
+                "INFO": "green",
+                "WARNING": "yellow",
+                "ERROR": "red",
+                "CRITICAL": "red,bg_white",
+            },
+        )
+    return logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT)
+
+
+class AsyncLogPipeline:
+    """
+    Bounded queue between the loggers and a background writer thread.
+
+    Callers only tag, sample and enqueue records; formatting and the
+    (possibly blocking) write to the stream happen on the listener thread.
+    When the queue is full new records are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        stream=None,
+        log_format: str = "json",
+        use_color: bool = False,
+        queue_size: int = 10000,
+        max_chars: int = 1000,
+        sample_rate: float = 0.1,
+    ):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.sampler = PayloadSampler(max_chars, sample_rate)
+        self.handler = DroppingQueueHandler(self.queue, self.sampler)
+        self.handler.addFilter(RequestIdFilter())
+
+        self.stream_handler = logging.StreamHandler(stream or sys.stdout)
+        self.stream_handler.setFormatter(build_formatter(log_format, use_color))
+        self.listener = QueueListener(self.queue, self.stream_handler)
+
+    def start(self):
+        self.listener.start()
+
+    def stop(self):
+        # Flushes everything already queued before the thread exits
+        if self.handler.direct is None and self.listener._thread is not None:
+            self.listener.stop()
+
+    def write_through(self):
+        # A forked child (e.g. an ETL worker) has no listener thread and may
+        # exit without running atexit, so it writes synchronously instead.
+        self.handler.direct = self.stream_handler
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "truncated": self.sampler.truncated,
+        }
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_log_pipeline() -> AsyncLogPipeline:
+    """The process-wide pipeline, started on first use and flushed at exit."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = AsyncLogPipeline(
+                log_format=LOG_FORMAT,
+                use_color=sys.stdout.isatty(),
+                queue_size=LOG_QUEUE_SIZE,
+                max_chars=LOG_PAYLOAD_MAX_CHARS,
+                sample_rate=LOG_PAYLOAD_SAMPLE_RATE,
+            )
+            _pipeline.start()
+            atexit.register(_pipeline.stop)
+        return _pipeline
+
+
+def _after_fork_in_child():
+    if _pipeline is not None:
+        _pipeline.write_through()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def log_stats():
+    return _pipeline.stats() if _pipeline else None
+
+
 def setup_logger(name: str, level=logging.INFO, use_color: bool = True):
     """
     Set up a logger with console handler for CloudWatch and colored terminal output
 
+    With LOG_ASYNC (the default) the logger writes through the shared
+    AsyncLogPipeline instead of a synchronous stdout handler.
+
     Args:
         name: Logger name (usually __name__ of the module)
         level: Logging level
@@ -36,29 +267,20 @@ def setup_logger(name: str, level=logging.INFO, use_color: bool = True):
     if logger.handlers:
         return logger
 
-    # Create formatter
-    if use_color and COLORLOG_AVAILABLE:
-        formatter = ColoredFormatter(
-            "%(log_color)s%(asctime)s - %(name)s - %(levelname)s - %(message)s%(reset)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-            log_colors={
-                "DEBUG": "cyan",
-                "INFO": "green",
-                "WARNING": "yellow",
-                "ERROR": "red",
-                "CRITICAL": "red,bg_white",
-            },
-        )
-    else:
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-        )
+    # Records are handled here; don't emit them again via the root logger
+    logger.propagate = False
+
+    if LOG_ASYNC:
+        logger.addHandler(get_log_pipeline().handler)
+        return logger
 
     # Console handler (CloudWatch captures stdout/stderr)
-    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler = SamplingStreamHandler(
+        sys.stdout, PayloadSampler(LOG_PAYLOAD_MAX_CHARS, LOG_PAYLOAD_SAMPLE_RATE)
+    )
     console_handler.setLevel(level)
-    console_handler.setFormatter(formatter)
+    console_handler.setFormatter(build_formatter(LOG_FORMAT, use_color))
+    console_handler.addFilter(RequestIdFilter())
     logger.addHandler(console_handler)
 
     return logger
@@ -0,0 +1,498 @@
+"""
+Prometheus-style metrics and per-request stage tracing.
+
+A small, dependency-free implementation of counters, gauges and
+histograms that renders the Prometheus text exposition format for
+`GET /metrics`. Stage timings (embed, intent routing, retrieve, history
+load, LLM first token, LLM total) are observed into the
+`chat_stage_seconds` histogram and, when a request trace is active,
+collected per request so they can be logged with the request ID.
+"""
+
+import contextvars
+import threading
+import time
+import typing
+import uuid
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.logger import log_stats, request_id_var, setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> typing.List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, or one read from `function`."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._function = function
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        if self._function:
+            return [f"{self.name} {_format_value(self._function())}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in items
+        ]
+
+
+class Gauge(_Metric):
+    """A settable value, or one read from `function` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, function=None):
+        super().__init__(name, documentation)
+        self._value = 0
+        self._function = function
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set_function(self, function: typing.Callable[[], float]):
+        self._function = function
+
+    def _samples(self):
+        value = self._function() if self._function else self._value
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}  # label values -> [bucket counts, sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(
+                (key, (list(counts), total, count))
+                for key, (counts, total, count) in self._series.items()
+            )
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                labels = _format_labels(
+                    self.labelnames, key, [("le", _format_value(bound))]
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+CHAT_REQUESTS = REGISTRY.register(
+    Counter(
+        "chat_requests_total",
+        "Chat requests by endpoint and outcome.",
+        ["endpoint", "status"],
+    )
+)
+CHAT_COALESCED = REGISTRY.register(
+    Counter(
+        "chat_coalesced_requests_total",
+        "First-turn questions answered by an identical in-flight request.",
+        ["endpoint"],
+    )
+)
+CHAT_IN_FLIGHT = REGISTRY.register(
+    Gauge("chat_in_flight_requests", "Chat turns currently running the chain.")
+)
+CHAT_QUEUED = REGISTRY.register(
+    Gauge("chat_queued_requests", "Chat turns waiting for a concurrency slot.")
+)
+ADMISSION_REJECTIONS = REGISTRY.register(
+    Counter(
+        "chat_admission_rejections_total",
+        "Chat requests turned away by rate limits or a full queue.",
+        ["endpoint", "reason"],
+    )
+)
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "chat_stage_seconds",
+        "Latency of each stage of a chat turn.",
+        ["stage"],
+    )
+)
+PROMPT_TOKENS = REGISTRY.register(
+    Histogram(
+        "chat_prompt_tokens",
+        "Prompt tokens per chat turn after context packing.",
+        buckets=(250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000),
+    )
+)
+LLM_TOKENS = REGISTRY.register(
+    Counter("chat_llm_tokens_total", "LLM tokens by kind.", ["kind"])
+)
+CACHE_REQUESTS = REGISTRY.register(
+    Counter(
+        "chat_cache_requests_total",
+        "Cache lookups by cache and result.",
+        ["cache", "result"],
+    )
+)
+ROUTE_DECISIONS = REGISTRY.register(
+    Counter(
+        "chat_route_decisions_total",
+        "Intent router decisions by route and best-matching intent.",
+        ["route", "intent"],
+    )
+)
+DEADLINE_EXCEEDED = REGISTRY.register(
+    Counter(
+        "chat_deadline_exceeded_total",
+        "Chat stages that ran out of their time budget.",
+        ["stage"],
+    )
+)
+RETRIEVAL_HEDGES = REGISTRY.register(
+    Counter(
+        "chat_retrieval_hedges_total",
+        "Hedged retrieval requests sent, and whether the hedge won.",
+        ["result"],
+    )
+)
+MODEL_TIER_DECISIONS = REGISTRY.register(
+    Counter(
+        "chat_model_tier_decisions_total",
+        "Model tier chosen per chat turn, and why a smaller tier wasn't used.",
+        ["tier", "reason"],
+    )
+)
+MODEL_TIER_LLM_SECONDS = REGISTRY.register(
+    Histogram(
+        "chat_model_tier_llm_seconds", "LLM call latency by model tier.", ["tier"]
+    )
+)
+MODEL_TIER_COST = REGISTRY.register(
+    Histogram(
+        "chat_model_tier_cost_usd",
+        "Token cost of each LLM call by model tier.",
+        ["tier"],
+        buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05),
+    )
+)
+MODEL_TIER_TOKENS = REGISTRY.register(
+    Counter(
+        "chat_model_tier_tokens_total", "LLM tokens by model tier.", ["tier", "kind"]
+    )
+)
+
+SESSIONS = REGISTRY.register(
+    Gauge("chat_sessions", "Chat sessions currently held by the session store.")
+)
+SESSION_BYTES = REGISTRY.register(
+    Gauge("chat_session_bytes", "Size of the chat histories in the session store.")
+)
+
+LOG_RECORDS_DROPPED = REGISTRY.register(
+    Counter(
+        "log_records_dropped_total",
+        "Log records dropped because the log queue was full.",
+        function=lambda: (log_stats() or {}).get("dropped", 0),
+    )
+)
+LOG_QUEUE_DEPTH = REGISTRY.register(
+    Gauge(
+        "log_queue_depth",
+        "Log records waiting for the background writer.",
+        function=lambda: (log_stats() or {}).get("queued", 0),
+    )
+)
+
+
+def cached_stats(function: typing.Callable[[], dict], seconds: float = 5.0):
+    """
+    Wrap a stats() method so the gauges reading it share one call per scrape.
+
+    A failed call is logged and reads as an empty dict (NaN in the gauges).
+    """
+    state = {"at": float("-inf"), "value": {}}
+    lock = threading.Lock()
+
+    def stats() -> dict:
+        with lock:
+            if time.monotonic() - state["at"] >= seconds:
+                try:
+                    state["value"] = function()
+                except Exception as e:
+                    logger.error(f"Reading stats for /metrics failed: {e}")
+                    state["value"] = {}
+                state["at"] = time.monotonic()
+            return state["value"]
+
+    return stats
+
+
+# Per-request tracing
+
+
+class RequestTrace:
+    """Stage timings collected for one request."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def summary(self) -> str:
+        stages = " ".join(f"{k}={v * 1000:.0f}ms" for k, v in self.stages.items())
+        total = (time.perf_counter() - self.started) * 1000
+        return f"{stages} total={total:.0f}ms".strip()
+
+
+current_trace: contextvars.ContextVar[typing.Optional[RequestTrace]] = (
+    contextvars.ContextVar("current_trace", default=None)
+)
+
+
+def record_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def trace_request():
+    """Collect stage timings for the current request until the block exits."""
+    trace = RequestTrace(request_id_var.get())
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+        record_stage("total", time.perf_counter() - trace.started)
+
+
+# Chain steps (by run name) timed as stages
+CHAIN_STAGES = {
+    "load_history": "history_load",
+    "prepare_turn": "prepare",
+    "rewrite_query": "rewrite",
+}
+
+
+class StageTimingHandler(BaseCallbackHandler):
+    """
+    LangChain callbacks that time the retrieval chain's stages.
+
+    Create one per request: retrieval, the "load_history" step, the
+    "prepare_turn" step that runs both (its time against their sum is the
+    critical-path saving), the optional query rewrite, time to the first
+    streamed token, the whole answer LLM call and its token usage are
+    recorded through record_stage.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._starts = {}
+        self._first_token_seen = set()
+
+    def _start(self, run_id, stage):
+        self._starts[run_id] = (time.perf_counter(), stage)
+
+    def _finish(self, run_id):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            record_stage(start[1], time.perf_counter() - start[0])
+
+    def on_chain_start(self, serialized, inputs, *, run_id, **kwargs):
+        stage = CHAIN_STAGES.get(kwargs.get("name"))
+        if stage is not None:
+            self._start(run_id, stage)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._starts.pop(run_id, None)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id, "retrieve")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def _start_llm(self, run_id, tags):
+        # The query rewrite is timed as its own stage, not as the answer
+        if "query_rewrite" not in (tags or []):
+            self._start(run_id, "llm_total")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start_llm(run_id, kwargs.get("tags"))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start_llm(run_id, kwargs.get("tags"))
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if run_id not in self._first_token_seen and run_id in self._starts:
+            self._first_token_seen.add(run_id)
+            record_stage(
+                "llm_first_token", time.perf_counter() - self._starts[run_id][0]
+            )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._first_token_seen.discard(run_id)
+        self._finish(run_id)
+        for usage in _token_usage(response):
+            LLM_TOKENS.inc(usage.get("input_tokens", 0), kind="prompt")
+            LLM_TOKENS.inc(usage.get("output_tokens", 0), kind="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._first_token_seen.discard(run_id)
+        self._starts.pop(run_id, None)
+
+
+def _token_usage(response):
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            if usage:
+                yield usage
+
+
+# Request IDs
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware that gives every HTTP request an ID.
+
+    The ID comes from the X-Request-ID header when the caller sends one,
+    is exposed to log records through src.logger.request_id_var and is
+    echoed back in the response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = dict(scope["headers"]).get(b"x-request-id", b"").decode()
+        request_id = request_id[:64] or uuid.uuid4().hex[:16]
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode())
+                ]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
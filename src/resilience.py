@@ -0,0 +1,264 @@
+"""
+Deadlines, hedged retrieval and pooled HTTP clients for the chat path.
+
+Each chat request runs under a Deadline (kept in a contextvar, like the
+request trace), and every stage may use at most its own timeout or what
+is left of the request's budget, whichever is smaller. Retrieval is
+hedged: when a query is still running after the retriever's recent p95
+latency, an identical query is sent and the first answer wins.
+"""
+
+import asyncio
+import contextvars
+import time
+import typing
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+
+import httpx
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, PrivateAttr
+
+from src.logger import setup_logger
+from src.metrics import DEADLINE_EXCEEDED, RETRIEVAL_HEDGES
+
+logger = setup_logger(__name__)
+
+
+class DeadlineExceeded(TimeoutError):
+    """A stage ran out of time; `stage` names it."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def budget(self, stage_timeout: typing.Optional[float] = None) -> float:
+        """Time a stage may take: its own timeout, capped by what is left."""
+        remaining = self.remaining()
+        return remaining if stage_timeout is None else min(stage_timeout, remaining)
+
+
+current_deadline: contextvars.ContextVar[typing.Optional[Deadline]] = (
+    contextvars.ContextVar("current_deadline", default=None)
+)
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """Give the current request `seconds` to finish."""
+    deadline = Deadline(seconds)
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
+
+
+def stage_budget(stage_timeout: typing.Optional[float] = None):
+    """The current stage's time budget, or None when nothing limits it."""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return stage_timeout
+    return deadline.budget(stage_timeout)
+
+
+@asynccontextmanager
+async def stage_deadline(stage: str, stage_timeout: typing.Optional[float] = None):
+    """
+    Run the block within the stage's budget or raise DeadlineExceeded.
+
+    Yields the asyncio.Timeout, so a caller can lift the limit part-way
+    (e.g. once a stream's first token has arrived) with reschedule(None).
+    """
+    try:
+        async with asyncio.timeout(stage_budget(stage_timeout)) as timeout:
+            yield timeout
+    except TimeoutError as e:
+        if isinstance(e, DeadlineExceeded):
+            raise  # an inner stage's, already counted
+        DEADLINE_EXCEEDED.inc(stage=stage)
+        raise DeadlineExceeded(stage) from None
+
+
+class LatencyWindow:
+    """Recent latencies of one operation, for percentile estimates."""
+
+    def __init__(self, size: int = 200):
+        self._values = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._values.append(seconds)
+
+    def __len__(self):
+        return len(self._values)
+
+    def percentile(self, p: float) -> typing.Optional[float]:
+        if not self._values:
+            return None
+        values = sorted(self._values)
+        return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class HedgedRetriever(BaseRetriever):
+    """
+    Retriever wrapper with a stage timeout and hedged requests.
+
+    A query that hasn't returned after the wrapped retriever's recent p95
+    latency (or `hedge_after` until `min_samples` queries have been seen)
+    is sent a second time; whichever copy finishes first is used. The whole
+    call is bounded by `timeout` and the request's Deadline.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    retriever: BaseRetriever
+    timeout: float = 2.0
+    hedge_after: float = 0.5
+    hedge_percentile: float = 0.95
+    min_samples: int = 20
+
+    _latencies: LatencyWindow = PrivateAttr(default_factory=LatencyWindow)
+
+    def hedge_delay(self) -> float:
+        if len(self._latencies) < self.min_samples:
+            return self.hedge_after
+        return self._latencies.percentile(self.hedge_percentile)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> typing.List[Document]:
+        # Sync callers (scripts, evaluation) get the plain retriever
+        return self.retriever.invoke(query)
+
+    async def _timed(self, query: str):
+        start = time.perf_counter()
+        documents = await self.retriever.ainvoke(query)
+        self._latencies.add(time.perf_counter() - start)
+        return documents
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> typing.List[Document]:
+        # The attempts run without callbacks, so the stage is timed once
+        budget = stage_budget(self.timeout)
+        deadline = time.monotonic() + budget
+        attempts = [asyncio.ensure_future(self._timed(query))]
+        try:
+            done, _ = await asyncio.wait(
+                attempts, timeout=min(budget, self.hedge_delay())
+            )
+            if not done and time.monotonic() < deadline:
+                RETRIEVAL_HEDGES.inc(result="sent")
+                attempts.append(asyncio.ensure_future(self._timed(query)))
+
+            pending, error = set(attempts), None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=max(0.0, deadline - time.monotonic()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        if len(attempts) > 1:
+                            won = task is attempts[1]
+                            RETRIEVAL_HEDGES.inc(result="won" if won else "lost")
+                        return task.result()
+                    error = task.exception()
+                    logger.warning(f"Retrieval attempt failed: {error}")
+            if not pending and error is not None:
+                raise error
+            DEADLINE_EXCEEDED.inc(stage="retrieve")
+            raise DeadlineExceeded("retrieve")
+        finally:
+            for task in attempts:
+                task.cancel()
+
+
+UPSTREAM_ERROR_MODULES = ("openai", "pinecone", "urllib3", "httpx", "httpcore")
+# Client error classes (and their bases) that mean a timeout or a broken
+# connection rather than a bad request
+TRANSIENT_ERROR_NAMES = frozenset(
+    {
+        "APITimeoutError",  # openai
+        "APIConnectionError",
+        "TimeoutException",  # httpx, httpcore
+        "NetworkError",
+        "RemoteProtocolError",
+        "TimeoutError",  # urllib3
+        "ProtocolError",
+        "MaxRetryError",
+        "PineconeProtocolError",
+    }
+)
+
+
+def _status_code(error: BaseException) -> typing.Optional[int]:
+    # openai: status_code; pinecone: status; httpx: response.status_code
+    for status in (
+        getattr(error, "status_code", None),
+        getattr(error, "status", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+    ):
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_upstream_error(error: BaseException) -> bool:
+    """
+    Transient OpenAI/Pinecone/network failures, which a turn can degrade on:
+    timeouts, connection errors, 429s and 5xx. Other client errors (a bad
+    key, a malformed request) are not, so they surface as errors.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__module__.split(".")[0] not in UPSTREAM_ERROR_MODULES:
+        return False
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def build_http_clients(
+    pool_size: int, keepalive_expiry: float, connect_timeout: float, read_timeout: float
+):
+    """Sync and async httpx clients sharing one keep-alive pool configuration."""
+    limits = httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=keepalive_expiry,
+    )
+    timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+    return (
+        httpx.Client(limits=limits, timeout=timeout),
+        httpx.AsyncClient(limits=limits, timeout=timeout),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_http_clients(
+    pool_size: int, keepalive_expiry: float, connect_timeout: float, read_timeout: float
+):
+    # Every OpenAI model shares the same connections
+    return build_http_clients(
+        pool_size, keepalive_expiry, connect_timeout, read_timeout
+    )
@@ -0,0 +1,185 @@
+"""
+Local intent routing ahead of the retrieval chain.
+
+Intents and their example utterances come from `user_messages` in
+config/config.yml, replies from `bot_messages`, and the intent -> reply
+mapping from the flows in safety_rails.co. The examples are embedded once
+into a normalized matrix, so classifying a message is one query embedding
+(usually an EmbeddingService cache hit or batch) and one matrix product.
+
+An intent whose reply is a fixed message (a greeting, the off-topic
+refusal) is answered directly. Replies with a placeholder such as
+"{medical_info}", and anything that doesn't clearly match, go to RAG.
+"""
+
+import re
+import time
+import typing
+from dataclasses import dataclass
+
+import numpy as np
+import yaml
+from langchain_core.embeddings import Embeddings
+
+from src.embeddings import normalize_query
+from src.logger import setup_logger
+from src.metrics import ROUTE_DECISIONS, record_stage
+
+logger = setup_logger(__name__)
+
+RAG_ROUTE = "rag"
+CANNED_ROUTE = "canned"
+
+
+@dataclass
+class RouteDecision:
+    route: str  # CANNED_ROUTE or RAG_ROUTE
+    intent: typing.Optional[str]
+    score: float
+    elapsed_ms: float
+    reply: typing.Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "route": self.route,
+            "intent": self.intent,
+            "score": round(self.score, 3),
+            "ms": round(self.elapsed_ms, 2),
+        }
+
+
+def parse_flows(text: str) -> typing.Dict[str, str]:
+    """
+    Map user intents to bot intents from Colang `define flow` blocks.
+
+    Only the simple two-line form is understood: a `user <intent>` line
+    followed by a `bot <intent>` line.
+    """
+    flows = {}
+    user_intent = None
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line.startswith("define flow"):
+            user_intent = None
+        elif line.startswith("user "):
+            user_intent = line[len("user ") :].strip()
+        elif line.startswith("bot ") and user_intent is not None:
+            flows[user_intent] = line[len("bot ") :].strip()
+            user_intent = None
+    return flows
+
+
+def load_intents(config_path: str, rails_path: str):
+    """
+    Returns:
+        tuple: (user_messages, replies) where replies maps each user intent
+            to its canned reply, or None when it should go to RAG
+    """
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    with open(rails_path, "r", encoding="utf-8") as f:
+        flows = parse_flows(f.read())
+
+    user_messages = config.get("user_messages") or {}
+    bot_messages = config.get("bot_messages") or {}
+    replies = {}
+    for intent in user_messages:
+        messages = bot_messages.get(flows.get(intent), [])
+        reply = messages[0] if messages else None
+        # A template to be filled in by the chain is not a canned reply
+        replies[intent] = None if reply is None or re.search(r"{\w+}", reply) else reply
+    return user_messages, replies
+
+
+class IntentRouter:
+    """
+    Nearest-neighbour intent classifier over the configured examples.
+
+    A message gets a canned reply only when its best intent scores at
+    least `threshold` and beats the best RAG-bound intent by `margin`, so
+    a greeting followed by a real question still reaches the chain.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        user_messages: typing.Dict[str, typing.List[str]],
+        replies: typing.Dict[str, typing.Optional[str]],
+        threshold: float = 0.6,
+        margin: float = 0.05,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.margin = margin
+        self.intents = [i for i, examples in user_messages.items() if examples]
+        self.replies = [replies.get(i) for i in self.intents]
+        self.canned = np.array([r is not None for r in self.replies])
+
+        # Examples are grouped by intent so per-intent maxima are one
+        # np.maximum.reduceat over the score vector
+        examples, self._offsets = [], []
+        for intent in self.intents:
+            self._offsets.append(len(examples))
+            examples.extend(normalize_query(e) for e in user_messages[intent])
+        matrix = np.asarray(embeddings.embed_documents(examples), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = matrix / np.where(norms == 0, 1, norms)
+        logger.info(
+            f"Intent router ready: {len(self.intents)} intents, "
+            f"{len(examples)} examples, "
+            f"canned replies for {[i for i, r in zip(self.intents, self.replies) if r]}"
+        )
+
+    def score(self, vector) -> np.ndarray:
+        """Best example similarity for each intent."""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        scores = self.matrix @ (vector / norm if norm else vector)
+        return np.maximum.reduceat(scores, self._offsets)
+
+    def decide(self, vector, start: float) -> RouteDecision:
+        scores = self.score(vector)
+        best = int(np.argmax(scores))
+        best_score = float(scores[best])
+        rag_scores = scores[~self.canned]
+        rag_best = float(rag_scores.max()) if rag_scores.size else -1.0
+
+        route = RAG_ROUTE
+        if (
+            self.canned[best]
+            and best_score >= self.threshold
+            and best_score - rag_best >= self.margin
+        ):
+            route = CANNED_ROUTE
+
+        elapsed = time.perf_counter() - start
+        record_stage("route", elapsed)
+        ROUTE_DECISIONS.inc(route=route, intent=self.intents[best])
+        return RouteDecision(
+            route=route,
+            intent=self.intents[best],
+            score=best_score,
+            elapsed_ms=elapsed * 1000,
+            reply=self.replies[best] if route == CANNED_ROUTE else None,
+        )
+
+    def route(self, message: str) -> RouteDecision:
+        start = time.perf_counter()
+        return self.decide(self.embeddings.embed_query(message), start)
+
+    async def aroute(self, message: str) -> RouteDecision:
+        start = time.perf_counter()
+        return self.decide(await self.embeddings.aembed_query(message), start)
+
+
+def build_intent_router(
+    embeddings: Embeddings,
+    config_path: str,
+    rails_path: str,
+    threshold: float,
+    margin: float,
+) -> IntentRouter:
+    user_messages, replies = load_intents(config_path, rails_path)
+    return IntentRouter(
+        embeddings, user_messages, replies, threshold=threshold, margin=margin
+    )
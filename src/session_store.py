@@ -0,0 +1,365 @@
+import json
+import sqlite3
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+from langchain_core.chat_history import (
+    BaseChatMessageHistory,
+    InMemoryChatMessageHistory,
+)
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from src.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; cheap enough to run per turn
+    return max(1, len(text) // 4)
+
+
+def message_text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+
+def trim_history(
+    messages: typing.List[BaseMessage], max_turns: int, max_tokens: int
+) -> typing.List[BaseMessage]:
+    # A turn is a human message plus the reply, so drop in pairs to keep
+    # the history starting on a human message.
+    messages = messages[-max_turns * 2 :]
+    tokens = sum(estimate_tokens(message_text(m)) for m in messages)
+    while len(messages) > 2 and tokens > max_tokens:
+        tokens -= sum(estimate_tokens(message_text(m)) for m in messages[:2])
+        messages = messages[2:]
+    return messages
+
+
+class BoundedChatMessageHistory(InMemoryChatMessageHistory):
+    """Chat history that keeps only the most recent turns within a token budget."""
+
+    max_turns: int = 10
+    max_tokens: int = 2000
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+    def add_messages(self, messages: typing.Sequence[BaseMessage]) -> None:
+        self.messages.extend(messages)
+        self.trim()
+
+    def trim(self):
+        self.messages = trim_history(self.messages, self.max_turns, self.max_tokens)
+
+    def token_count(self) -> int:
+        return sum(estimate_tokens(message_text(m)) for m in self.messages)
+
+    def size_bytes(self) -> int:
+        return sum(len(message_text(m).encode("utf-8")) for m in self.messages)
+
+
+class SessionStore:
+    """
+    In-process session histories with idle expiry and LRU eviction.
+
+    Sessions are kept in least-recently-used order, so idle sessions are always
+    at the front and both expiry and eviction only touch the entries they drop.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        idle_ttl: float = 3600,
+        max_turns: int = 10,
+        max_tokens: int = 2000,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self._sessions = OrderedDict()  # session_id -> (history, last_access)
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def get(self, session_id: str) -> BoundedChatMessageHistory:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+
+            entry = self._sessions.pop(session_id, None)
+            history = (
+                entry[0]
+                if entry
+                else BoundedChatMessageHistory(
+                    max_turns=self.max_turns, max_tokens=self.max_tokens
+                )
+            )
+            self._sessions[session_id] = (history, now)
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+
+        return history
+
+    def _expire(self, now: float):
+        cutoff = now - self.idle_ttl
+        while self._sessions:
+            _, (_, last_access) = next(iter(self._sessions.items()))
+            if last_access >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            histories = [history for history, _ in self._sessions.values()]
+        return {
+            "sessions": len(histories),
+            "bytes": sum(history.size_bytes() for history in histories),
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+
+# Compact wire format shared by the remote backends: one-letter type + text
+_TYPE_CODES = {"human": "h", "ai": "a", "system": "s"}
+_MESSAGE_TYPES = {"h": HumanMessage, "a": AIMessage, "s": SystemMessage}
+
+
+def dump_message(message: BaseMessage) -> str:
+    code = _TYPE_CODES.get(message.type, "h")
+    return json.dumps([code, message_text(message)], separators=(",", ":"))
+
+
+def load_message(raw) -> BaseMessage:
+    code, content = json.loads(raw)
+    return _MESSAGE_TYPES[code](content=content)
+
+
+class RemoteChatMessageHistory(BaseChatMessageHistory):
+    """Chat history view over a shared backend; reads and writes go straight through."""
+
+    def __init__(self, session_id: str, store):
+        self.session_id = session_id
+        self.store = store
+
+    @property
+    def messages(self) -> typing.List[BaseMessage]:
+        return self.store.load(self.session_id)
+
+    def add_messages(self, messages: typing.Sequence[BaseMessage]) -> None:
+        # RunnableWithMessageHistory hands over the question and the answer
+        # together, so a turn is always a single batched write.
+        self.store.append(self.session_id, messages)
+
+    def clear(self) -> None:
+        self.store.delete(self.session_id)
+
+
+class SQLiteSessionStore:
+    """
+    Session histories in a local SQLite database in WAL mode.
+
+    Every uvicorn worker (or container sharing the volume) sees the same
+    histories. Each thread keeps its own pooled connection, and a turn is
+    appended in one transaction.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        idle_ttl: float = 3600,
+        max_turns: int = 10,
+        max_tokens: int = 2000,
+    ):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self._local = threading.local()
+        self._last_purge = 0.0
+
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "session_id TEXT NOT NULL, message TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_messages_session "
+            "ON chat_messages (session_id, id)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_sessions ("
+            "session_id TEXT PRIMARY KEY, last_access REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> RemoteChatMessageHistory:
+        return RemoteChatMessageHistory(session_id, self)
+
+    def load(self, session_id: str) -> typing.List[BaseMessage]:
+        rows = (
+            self._connect()
+            .execute(
+                "SELECT message FROM chat_messages WHERE session_id = ? "
+                "ORDER BY id DESC LIMIT ?",
+                (session_id, self.max_turns * 2),
+            )
+            .fetchall()
+        )
+        messages = [load_message(row[0]) for row in reversed(rows)]
+        return trim_history(messages, self.max_turns, self.max_tokens)
+
+    def append(self, session_id: str, messages: typing.Sequence[BaseMessage]):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO chat_messages (session_id, message) VALUES (?, ?)",
+                [(session_id, dump_message(m)) for m in messages],
+            )
+            conn.execute(
+                "DELETE FROM chat_messages WHERE session_id = ? AND id NOT IN ("
+                "SELECT id FROM chat_messages WHERE session_id = ? "
+                "ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_turns * 2),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (session_id, last_access) "
+                "VALUES (?, ?)",
+                (session_id, now),
+            )
+        self._purge_idle(now)
+
+    def delete(self, session_id: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "DELETE FROM chat_messages WHERE session_id = ?", (session_id,)
+            )
+            conn.execute(
+                "DELETE FROM chat_sessions WHERE session_id = ?", (session_id,)
+            )
+
+    def _purge_idle(self, now: float):
+        # Expiry is a table scan, so run it at most once a minute per worker
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        cutoff = now - self.idle_ttl
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "DELETE FROM chat_messages WHERE session_id IN ("
+                "SELECT session_id FROM chat_sessions WHERE last_access < ?)",
+                (cutoff,),
+            )
+            conn.execute("DELETE FROM chat_sessions WHERE last_access < ?", (cutoff,))
+
+    def stats(self):
+        conn = self._connect()
+        sessions = conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+        size = conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(message)), 0) FROM chat_messages"
+        ).fetchone()[0]
+        return {"backend": "sqlite", "sessions": sessions, "bytes": size}
+
+
+class RedisSessionStore:
+    """
+    Session histories in Redis, shared by every worker and node.
+
+    Each session is a list of compact messages; a turn is appended, trimmed and
+    given a fresh idle TTL in one pipelined round trip.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        idle_ttl: float = 3600,
+        max_turns: int = 10,
+        max_tokens: int = 2000,
+        prefix: str = "chat:session:",
+    ):
+        import redis
+
+        self.client = redis.Redis(
+            connection_pool=redis.ConnectionPool.from_url(url, max_connections=64)
+        )
+        self.idle_ttl = int(idle_ttl)
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.prefix = prefix
+
+    def get(self, session_id: str) -> RemoteChatMessageHistory:
+        return RemoteChatMessageHistory(session_id, self)
+
+    def load(self, session_id: str) -> typing.List[BaseMessage]:
+        raw = self.client.lrange(self.prefix + session_id, -self.max_turns * 2, -1)
+        messages = [load_message(item) for item in raw]
+        return trim_history(messages, self.max_turns, self.max_tokens)
+
+    def append(self, session_id: str, messages: typing.Sequence[BaseMessage]):
+        key = self.prefix + session_id
+        pipe = self.client.pipeline(transaction=False)
+        pipe.rpush(key, *[dump_message(m) for m in messages])
+        pipe.ltrim(key, -self.max_turns * 2, -1)
+        pipe.expire(key, self.idle_ttl)
+        pipe.execute()
+
+    def delete(self, session_id: str):
+        self.client.delete(self.prefix + session_id)
+
+    def stats(self):
+        sessions = 0
+        size = 0
+        for key in self.client.scan_iter(match=self.prefix + "*", count=500):
+            sessions += 1
+            size += self.client.memory_usage(key) or 0
+        return {"backend": "redis", "sessions": sessions, "bytes": size}
+
+
+def get_session_store(
+    backend: str,
+    max_sessions: int,
+    idle_ttl: float,
+    max_turns: int,
+    max_tokens: int,
+    sqlite_path: str = "sessions.sqlite3",
+    redis_url: str = "redis://localhost:6379/0",
+):
+    logger.info(f"Session store backend: {backend}")
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            sqlite_path, idle_ttl=idle_ttl, max_turns=max_turns, max_tokens=max_tokens
+        )
+    if backend == "redis":
+        return RedisSessionStore(
+            redis_url, idle_ttl=idle_ttl, max_turns=max_turns, max_tokens=max_tokens
+        )
+    return SessionStore(
+        max_sessions=max_sessions,
+        idle_ttl=idle_ttl,
+        max_turns=max_turns,
+        max_tokens=max_tokens,
+    )
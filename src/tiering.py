@@ -0,0 +1,259 @@
+"""
+Model tiering: answer simple questions with a smaller, cheaper model.
+
+The tiers are the OpenAI entries of `models` in config/config.yml. The
+`main` model answers by default; another tier answers a turn only when
+the turn is within all of that tier's limits:
+
+- the question is short and has no cue that it needs reasoning
+  (comparisons, "why", doses, interactions, several questions at once),
+- the best retrieved chunk is similar enough to the question, so the
+  answer is mostly in the context (low retrieval confidence goes to the
+  bigger model),
+- the conversation so far is short.
+
+Each tier's LLM calls are timed and priced from its token usage, so the
+latency and cost distribution per tier shows up in /metrics, /stats and
+the logs.
+"""
+
+import re
+import time
+import typing
+from dataclasses import dataclass
+
+import yaml
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+
+from src.logger import setup_logger
+from src.metrics import (
+    MODEL_TIER_COST,
+    MODEL_TIER_DECISIONS,
+    MODEL_TIER_LLM_SECONDS,
+    MODEL_TIER_TOKENS,
+)
+from src.resilience import LatencyWindow
+
+logger = setup_logger(__name__)
+
+MAIN_TIER = "main"
+
+# Questions that need more than a definition from the retrieved text
+COMPLEX_QUESTION = re.compile(
+    r"\b(compare|comparison|differen(ce|ces|t)|versus|vs|why|explain|mechanism|"
+    r"interact(ion|ions)?|combin(e|ed|ing)|side effects?|risks?|dos(e|es|age)|"
+    r"pregnan(t|cy)|should i|can i|safe)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class ModelTier:
+    name: str  # the entry's `type`
+    model: str
+    max_query_words: typing.Optional[int] = None
+    min_retrieval_score: typing.Optional[float] = None
+    max_history_messages: typing.Optional[int] = None
+    cost_per_1k_input_tokens: float = 0.0
+    cost_per_1k_output_tokens: float = 0.0
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        return (
+            input_tokens * self.cost_per_1k_input_tokens
+            + output_tokens * self.cost_per_1k_output_tokens
+        ) / 1000
+
+    def rejections(self, words, complex_question, top_score, history) -> list:
+        """Why a turn is outside this tier's limits; empty if it's within them."""
+        reasons = []
+        if complex_question:
+            reasons.append("complex_query")
+        if self.max_query_words is not None and words > self.max_query_words:
+            reasons.append("long_query")
+        if self.min_retrieval_score is not None and (
+            top_score is None or top_score < self.min_retrieval_score
+        ):
+            reasons.append("low_confidence")
+        if (
+            self.max_history_messages is not None
+            and history > self.max_history_messages
+        ):
+            reasons.append("long_history")
+        return reasons
+
+
+def load_model_tiers(config_path: str) -> typing.List[ModelTier]:
+    """The OpenAI chat models configured in `models`, in config order."""
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    fields = set(ModelTier.__dataclass_fields__) - {"name", "model"}
+    return [
+        ModelTier(
+            name=entry["type"],
+            model=entry["model"],
+            **{key: value for key, value in entry.items() if key in fields},
+        )
+        for entry in config.get("models") or []
+        if entry.get("engine") == "openai"
+    ]
+
+
+def top_retrieval_score(documents: typing.List[Document]) -> typing.Optional[float]:
+    """Best similarity among the chunks; None when no chunk carries a score."""
+    scores = [d.metadata["score"] for d in documents if "score" in d.metadata]
+    return max(scores) if scores else None
+
+
+@dataclass
+class TierDecision:
+    tier: ModelTier
+    reason: str  # "simple", or why a smaller tier wasn't used
+    words: int
+    top_score: typing.Optional[float]
+    history: int
+
+    def as_dict(self) -> dict:
+        return {
+            "tier": self.tier.name,
+            "model": self.tier.model,
+            "reason": self.reason,
+            "top_score": None if self.top_score is None else round(self.top_score, 3),
+        }
+
+
+class TierUsage:
+    """Latency and cost of one tier's recent LLM calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cost = 0.0
+        self.latency = LatencyWindow()
+        self.costs = LatencyWindow()
+
+    def add(self, seconds: float, cost: float):
+        self.calls += 1
+        self.cost += cost
+        self.latency.add(seconds)
+        self.costs.add(cost)
+
+    def stats(self):
+        def ms(p):
+            value = self.latency.percentile(p)
+            return None if value is None else round(value * 1000, 1)
+
+        def usd(p):
+            value = self.costs.percentile(p)
+            return None if value is None else round(value, 6)
+
+        return {
+            "calls": self.calls,
+            "latency_ms": {"p50": ms(0.5), "p95": ms(0.95)},
+            "cost_usd": {
+                "p50": usd(0.5),
+                "p95": usd(0.95),
+                "total": round(self.cost, 6),
+            },
+        }
+
+
+class TierUsageHandler(BaseCallbackHandler):
+    """Times and prices one tier's LLM calls; attached to that tier's model."""
+
+    run_inline = True
+
+    def __init__(self, tier: ModelTier, usage: TierUsage):
+        self.tier = tier
+        self.usage = usage
+        self._starts = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is None:
+            return
+        seconds = time.perf_counter() - start
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        cost = self.tier.cost(input_tokens, output_tokens)
+
+        self.usage.add(seconds, cost)
+        MODEL_TIER_LLM_SECONDS.observe(seconds, tier=self.tier.name)
+        MODEL_TIER_COST.observe(cost, tier=self.tier.name)
+        MODEL_TIER_TOKENS.inc(input_tokens, tier=self.tier.name, kind="prompt")
+        MODEL_TIER_TOKENS.inc(output_tokens, tier=self.tier.name, kind="completion")
+        logger.info(
+            f"Model tier {self.tier.name} ({self.tier.model}): "
+            f"{seconds * 1000:.0f}ms, {input_tokens}+{output_tokens} tokens, "
+            f"${cost:.5f}"
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._starts.pop(run_id, None)
+        logger.warning(
+            f"Model tier {self.tier.name} ({self.tier.model}) failed: {error}"
+        )
+
+
+class ModelRouter:
+    """
+    Picks the model tier for each turn and holds each tier's LLM.
+
+    `llms` maps tier names to chat models; a smaller tier's model falls
+    back to the main one if its call fails.
+    """
+
+    def __init__(self, tiers: typing.List[ModelTier], llms: dict):
+        by_name = {tier.name: tier for tier in tiers}
+        if MAIN_TIER not in by_name:
+            raise ValueError(f"No '{MAIN_TIER}' model configured")
+        self.main = by_name[MAIN_TIER]
+        self.smaller = [t for t in tiers if t.name != MAIN_TIER and t.name in llms]
+        self.usage = {tier.name: TierUsage() for tier in [self.main, *self.smaller]}
+
+        main_llm = self._instrument(self.main, llms[MAIN_TIER])
+        self.llms = {MAIN_TIER: main_llm}
+        for tier in self.smaller:
+            self.llms[tier.name] = self._instrument(
+                tier, llms[tier.name]
+            ).with_fallbacks([main_llm])
+
+    def _instrument(self, tier: ModelTier, llm):
+        handler = TierUsageHandler(tier, self.usage[tier.name])
+        return llm.with_config(callbacks=[handler])
+
+    def select(
+        self, question: str, context: typing.List[Document], chat_history: list
+    ) -> TierDecision:
+        words = len(question.split())
+        complex_question = bool(COMPLEX_QUESTION.search(question)) or (
+            question.count("?") > 1
+        )
+        top_score = top_retrieval_score(context)
+        history = len(chat_history or [])
+
+        tier, reason = self.main, "no_smaller_tier"
+        for candidate in self.smaller:
+            rejections = candidate.rejections(
+                words, complex_question, top_score, history
+            )
+            if not rejections:
+                tier, reason = candidate, "simple"
+                break
+            reason = rejections[0]
+
+        MODEL_TIER_DECISIONS.inc(tier=tier.name, reason=reason)
+        return TierDecision(tier, reason, words, top_score, history)
+
+    def stats(self):
+        return {
+            tier.name: {"model": tier.model, **self.usage[tier.name].stats()}
+            for tier in [self.main, *self.smaller]
+        }
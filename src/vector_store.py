@@ -0,0 +1,309 @@
+import asyncio
+import json
+import os
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore, VectorStoreRetriever
+
+from src.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+DOCUMENTS_FILE = "documents.json"
+HNSW_FILE = "hnsw.bin"
+
+
+def _normalize_rows(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LocalVectorStore(VectorStore):
+    """
+    On-disk vector index searched in process, without a network round trip.
+
+    Vectors are stored L2-normalized in a .npy file that is memory-mapped on
+    load, so cosine similarity is a single matrix-vector product. If the
+    index was built with `hnsw=True` and hnswlib is installed, queries can
+    use the approximate HNSW graph instead of the exact scan.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        vectors: np.ndarray,
+        documents: typing.List[Document],
+        hnsw_index=None,
+    ):
+        self.embedding = embedding
+        self.vectors = vectors
+        self.documents = documents
+        self.hnsw_index = hnsw_index
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    # Search
+
+    def search_by_vector(self, vector, k: int = 4):
+        """Return (indices, cosine similarities) of the k nearest chunks."""
+        k = min(k, len(self.documents))
+        if k == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+        query = _normalize_rows(vector)
+        if self.hnsw_index is not None:
+            labels, distances = self.hnsw_index.knn_query(query, k=k)
+            return labels[0].astype(np.int64), 1.0 - distances[0]
+
+        scores = self.vectors @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: typing.List[float], k: int = 4, **kwargs
+    ) -> typing.List[typing.Tuple[Document, float]]:
+        indices, scores = self.search_by_vector(embedding, k)
+        return [(self.documents[i], float(s)) for i, s in zip(indices, scores)]
+
+    def similarity_search_by_vector(
+        self, embedding: typing.List[float], k: int = 4, **kwargs
+    ) -> typing.List[Document]:
+        return [
+            doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)
+        ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs
+    ) -> typing.List[typing.Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(
+            self.embedding.embed_query(query), k
+        )
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs
+    ) -> typing.List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    async def asimilarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs
+    ) -> typing.List[typing.Tuple[Document, float]]:
+        vector = await self.embedding.aembed_query(query)
+        return self.similarity_search_with_score_by_vector(vector, k)
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, **kwargs
+    ) -> typing.List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    # Building and persistence
+
+    def add_texts(
+        self,
+        texts: typing.Iterable[str],
+        metadatas: typing.Optional[typing.List[dict]] = None,
+        **kwargs,
+    ) -> typing.List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        start = len(self.documents)
+        new_vectors = _normalize_rows(self.embedding.embed_documents(texts))
+        self.vectors = np.vstack([self.vectors, new_vectors]) if start else new_vectors
+        self.documents.extend(
+            Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)
+        )
+        self.hnsw_index = None  # stale; rebuilt on save(hnsw=True)
+        return [str(i) for i in range(start, len(self.documents))]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: typing.List[str],
+        embedding: Embeddings,
+        metadatas: typing.Optional[typing.List[dict]] = None,
+        **kwargs,
+    ) -> "LocalVectorStore":
+        store = cls(embedding, np.zeros((0, 0), dtype=np.float32), [])
+        store.add_texts(texts, metadatas)
+        return store
+
+    def save(self, path: str, hnsw: bool = False):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, VECTORS_FILE), np.ascontiguousarray(self.vectors))
+        with open(os.path.join(path, DOCUMENTS_FILE), "w") as f:
+            json.dump(
+                [
+                    {"page_content": d.page_content, "metadata": d.metadata}
+                    for d in self.documents
+                ],
+                f,
+            )
+
+        if hnsw:
+            import hnswlib
+
+            index = hnswlib.Index(space="cosine", dim=self.vectors.shape[1])
+            index.init_index(
+                max_elements=len(self.documents), ef_construction=200, M=16
+            )
+            index.add_items(self.vectors, np.arange(len(self.documents)))
+            index.save_index(os.path.join(path, HNSW_FILE))
+
+        logger.info(f"Saved local index with {len(self.documents)} chunks to {path}")
+
+    @classmethod
+    def load(
+        cls, path: str, embedding: Embeddings, use_hnsw: bool = False, ef: int = 64
+    ) -> "LocalVectorStore":
+        vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(path, DOCUMENTS_FILE)) as f:
+            documents = [
+                Document(page_content=d["page_content"], metadata=d["metadata"])
+                for d in json.load(f)
+            ]
+
+        hnsw_index = None
+        hnsw_path = os.path.join(path, HNSW_FILE)
+        if use_hnsw:
+            if os.path.exists(hnsw_path):
+                import hnswlib
+
+                hnsw_index = hnswlib.Index(space="cosine", dim=vectors.shape[1])
+                hnsw_index.load_index(hnsw_path, max_elements=len(documents))
+                hnsw_index.set_ef(ef)
+            else:
+                logger.warning(f"No HNSW graph in {path}, using exact search")
+
+        logger.info(f"Loaded local index with {len(documents)} chunks from {path}")
+        return cls(embedding, vectors, documents, hnsw_index=hnsw_index)
+
+
+class ScoredVectorStoreRetriever(VectorStoreRetriever):
+    """
+    Similarity search that keeps each chunk's score as metadata["score"].
+
+    The raw similarity from the store (cosine for Pinecone and the local
+    index) tells later steps how confident retrieval was.
+    """
+
+    @staticmethod
+    def _with_scores(results) -> typing.List[Document]:
+        # Copies: the local store returns its own Document objects
+        return [
+            Document(
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "score": float(score)},
+            )
+            for doc, score in results
+        ]
+
+    def _get_relevant_documents(self, query: str, *, run_manager, **kwargs):
+        return self._with_scores(
+            self.vectorstore.similarity_search_with_score(
+                query, **{**self.search_kwargs, **kwargs}
+            )
+        )
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager, **kwargs):
+        return self._with_scores(
+            await self.vectorstore.asimilarity_search_with_score(
+                query, **{**self.search_kwargs, **kwargs}
+            )
+        )
+
+
+def build_local_index(
+    documents: typing.List[Document],
+    embeddings: Embeddings,
+    path: str,
+    batch_size: int = 256,
+    hnsw: bool = False,
+) -> LocalVectorStore:
+    """Embed document chunks in batches and write a local index to `path`."""
+    vectors = []
+    for i in range(0, len(documents), batch_size):
+        batch = documents[i : i + batch_size]
+        vectors.append(embeddings.embed_documents([d.page_content for d in batch]))
+        logger.info(f"Embedded {min(i + batch_size, len(documents))}/{len(documents)}")
+
+    store = LocalVectorStore(
+        embeddings, _normalize_rows(np.vstack(vectors)), list(documents)
+    )
+    store.save(path, hnsw=hnsw)
+    return store
+
+
+def get_vector_store(
+    embeddings: Embeddings,
+    backend: str,
+    index_name: str,
+    local_dir: str,
+    use_hnsw: bool = False,
+    pool_size: int = 64,
+    host: typing.Optional[str] = None,
+) -> VectorStore:
+    logger.info(f"Vector store backend: {backend}")
+    if backend == "local":
+        return LocalVectorStore.load(local_dir, embeddings, use_hnsw=use_hnsw)
+
+    from langchain_pinecone import PineconeVectorStore
+    from pinecone import Pinecone
+
+    # PineconeVectorStore's async searches open (and close) an aiohttp
+    # session per query; run the sync query on the shared pool instead, in
+    # threads of its own so stalled queries can't starve the default executor.
+    executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="pinecone")
+
+    class PooledPineconeVectorStore(PineconeVectorStore):
+        async def asimilarity_search_by_vector_with_score(
+            self, embedding, *, k: int = 4, **kwargs
+        ):
+            return await asyncio.get_running_loop().run_in_executor(
+                executor,
+                partial(
+                    self.similarity_search_by_vector_with_score,
+                    embedding,
+                    k=k,
+                    **kwargs,
+                ),
+            )
+
+        async def amax_marginal_relevance_search_by_vector(
+            self, embedding, k: int = 4, fetch_k: int = 20, lambda_mult=0.5, **kwargs
+        ):
+            return await asyncio.get_running_loop().run_in_executor(
+                executor,
+                partial(
+                    self.max_marginal_relevance_search_by_vector,
+                    embedding,
+                    k=k,
+                    fetch_k=fetch_k,
+                    lambda_mult=lambda_mult,
+                    **kwargs,
+                ),
+            )
+
+    # Size the keep-alive pool for concurrent chat requests (urllib3 keeps
+    # only 10 connections per host by default); with `host` set the index
+    # host isn't looked up through the control plane.
+    index = Pinecone(pool_threads=pool_size).Index(
+        name=index_name,
+        host=host or "",
+        pool_threads=pool_size,
+        connection_pool_maxsize=pool_size,
+    )
+    return PooledPineconeVectorStore(index=index, embedding=embeddings)
@@ -1,3 +1,5 @@
+import argparse
+
 from pinecone import Pinecone
 
 # import warnings
@@ -7,10 +9,28 @@ from pinecone import ServerlessSpec
 # import boto3
 # from langchain.schema import Document
 # from dotenv import load_dotenv
-from langchain_pinecone import PineconeVectorStore
 
 from src import PINECONE_API_KEY
-from src.helper import load_doc_from_s3, get_embeddings, process_relevant_doc
+from src.config import (
+    INGEST_BATCH_SIZE,
+    INGEST_MAX_RETRIES,
+    INGEST_UPSERT_BATCH_SIZE,
+    INGEST_WORKERS,
+    LOCAL_INDEX_DIR,
+    LOCAL_INDEX_HNSW,
+    VECTOR_STORE,
+)
+from src.helper import (
+    load_doc_from_s3,
+    load_doc_from_file,
+    load_manifest,
+    save_manifest,
+    get_embeddings,
+    process_relevant_doc,
+)
+from src.chunk_format import PrecomputedEmbeddings
+from src.ingest import PineconeSink, sync_documents
+from src.vector_store import build_local_index
 
 # from langchain.schema import Document
 # from langchain_huggingface import HuggingFaceEmbeddings
@@ -67,8 +87,8 @@ logger = setup_logger(__name__)
 #     return document
 
 
-# Initialize Pinecone client
-pc = Pinecone(api_key=PINECONE_API_KEY)
+# Initialize Pinecone client (not needed when building the local index)
+pc = Pinecone(api_key=PINECONE_API_KEY) if VECTOR_STORE == "pinecone" else None
 
 index_name = "nne-medical-chatbot-system"
 
@@ -105,22 +125,65 @@ def create_pinecone_index(index_name, pc, dimension=384):
 # )
 
 
-def main():
+def main(chunks_path=None, reset=False):
     try:
-        document_chunks = load_doc_from_s3()
+        vectors_by_text = {}
+        if chunks_path:
+            document_chunks = load_doc_from_file(chunks_path, vectors_by_text)
+        else:
+            document_chunks = load_doc_from_s3(vectors_by_text)
         document_chunks = process_relevant_doc(document_chunks)
         logger.info(document_chunks[:1])
+
+        embeddings = get_embeddings()
+        if vectors_by_text:
+            logger.info(f"Using {len(vectors_by_text)} precomputed chunk vectors")
+            embeddings = PrecomputedEmbeddings(embeddings, vectors_by_text)
+
+        if VECTOR_STORE == "local":
+            build_local_index(
+                document_chunks,
+                embeddings,
+                LOCAL_INDEX_DIR,
+                hnsw=LOCAL_INDEX_HNSW,
+            )
+            logger.info(
+                f"sucessfully loaded {len(document_chunks)} document chunks into local index."
+            )
+            return
+
         create_pinecone_index(index_name, pc, dimension=384)
-        pc.Index(index_name)
+        index = pc.Index(index_name)
         logger.info(f"Pinecone index '{index_name}' created successfully.")
-        embeddings = get_embeddings()
-        PineconeVectorStore.from_documents(
-            documents=document_chunks, embedding=embeddings, index_name=index_name
+        sink = PineconeSink(index)
+        previous_manifest = None
+        if reset:
+            # Vectors from older runs used other IDs; start from an empty index
+            logger.warning(f"Deleting every vector in '{index_name}' before indexing")
+            sink.delete_all()
+        else:
+            previous_manifest = load_manifest(chunks_path)
+        report, manifest = sync_documents(
+            document_chunks,
+            embeddings,
+            sink,
+            previous_manifest,
+            batch_size=INGEST_BATCH_SIZE,
+            upsert_batch_size=INGEST_UPSERT_BATCH_SIZE,
+            max_workers=INGEST_WORKERS,
+            max_retries=INGEST_MAX_RETRIES,
         )
-        logger.info("pinecone vectostore created successfully.")
+        manifest_location = save_manifest(manifest, chunks_path)
+        logger.info(f"Chunk manifest saved to {manifest_location}")
+        if report["failed"]:
+            logger.error(
+                f"{report['failed']} chunks failed to upload; rerun to resume."
+            )
 
         logger.info(
-            f"sucessfully loaded {len(document_chunks)} document chunks into pinecone index."
+            f"sucessfully loaded {report['upserted']} new document chunks into pinecone index "
+            f"({report['skipped']} already indexed, {report['deleted']} stale removed, "
+            f"{report['chunks_per_sec']} chunks/sec)."
         )
     except Exception as e:
         logger.error(
@@ -129,8 +192,19 @@ def main():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index processed document chunks")
+    parser.add_argument(
+        "--chunks",
+        help="local processed_document.json(l.gz) instead of the S3 copy",
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="delete every vector in the index and ignore the manifest first",
+    )
+    args = parser.parse_args()
     try:
-        main()
+        main(args.chunks, reset=args.reset)
         logger.info("Document chunks loaded successfully into pinecone index.")
     except Exception as e:
         logger.error(
@@ -5,14 +5,19 @@ Logging configuration for SANDI system.
 import logging
 import warnings
 
+from src.logger import get_log_pipeline
+
 
 def setup_logging():
     """Configure logging and suppress warnings."""
 
-    # Configure basic logging
-    logging.basicConfig(
-        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-    )
+    # Route the root logger through the shared non-blocking pipeline
+    # (bounded queue, background writer, JSON output) used by src.logger
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    handler = get_log_pipeline().handler
+    if handler not in root.handlers:
+        root.addHandler(handler)
 
     # Suppress various warnings
     warnings.filterwarnings("ignore", category=UserWarning)